@@ -20,6 +20,9 @@ if [ "$current_file_count" -gt "$initial_file_count" ]; then
 fi
 # Upgrade the database to the latest migration
 alembic -c alembic.ini upgrade head
+# Metrics of all gunicorn and celery worker processes are merged from this directory
+export PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus_multiproc
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 # Start the Gunicorn server
 celery -A tasks_celery.celery_app worker --loglevel=info &
 celery -A tasks_celery.celery_app beat --loglevel=info &
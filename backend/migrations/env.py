@@ -15,6 +15,7 @@ from base import Base
 from user.models import User
 from vacancy.models import Vacancy
 from resume.models import Resume
+from mail.models import EmailOutbox
 
 # sys.path.append(os.path.join(sys.path[0], 'src'))
 # this is the Alembic Config object, which provides
@@ -0,0 +1,58 @@
+import os
+import tracemalloc
+
+from fastapi import HTTPException
+from sqladmin import BaseView, expose
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from memory import memory_tracer, KEY_TYPES
+from config import settings
+
+
+memory_settings = settings.memory
+
+
+def _int_param(request: Request, name: str, default: int, maximum: int) -> int:
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    if not 0 < value <= maximum:
+        raise HTTPException(status_code=400, detail=f"{name} must be in [1, {maximum}]")
+    return value
+
+
+class MemoryAdmin(BaseView):
+    """tracemalloc snapshots of the worker serving the admin request, guarded by AdminAuth"""
+    name = "Memory"
+    icon = "fa-solid fa-memory"
+
+    @expose("/memory", methods=["GET"])
+    async def memory_diff(self, request: Request) -> Response:
+        """Top ?top= allocation diffs by ?key_type= since the previous diff (or the start with ?baseline=1)"""
+        if not memory_tracer.is_tracing:
+            raise HTTPException(status_code=409, detail="Memory tracing is not started in this worker")
+        key_type = request.query_params.get("key_type", "lineno")
+        if key_type not in KEY_TYPES:
+            raise HTTPException(status_code=400, detail=f"key_type must be one of {', '.join(KEY_TYPES)}")
+        top = _int_param(request, "top", memory_settings.DEFAULT_TOP, memory_settings.MAX_TOP)
+        from_baseline = request.query_params.get("baseline") in ("1", "true")
+        # taking and comparing snapshots of a large heap takes seconds, off the event loop
+        return JSONResponse(await run_in_threadpool(memory_tracer.diff, key_type, top, from_baseline))
+
+    @expose("/memory/start", methods=["POST"])
+    async def start_tracing(self, request: Request) -> Response:
+        """Start tracing allocations with ?frames= frames per traceback and take the baseline snapshot"""
+        frames = _int_param(
+            request, "frames", memory_settings.TRACEMALLOC_FRAMES, memory_settings.MAX_TRACEMALLOC_FRAMES
+        )
+        memory_tracer.start(frames)
+        # frames of a tracing started before are kept
+        return JSONResponse({"pid": os.getpid(), "tracing": True, "frames": tracemalloc.get_traceback_limit()})
+
+    @expose("/memory/stop", methods=["POST"])
+    async def stop_tracing(self, request: Request) -> Response:
+        memory_tracer.stop()
+        return JSONResponse({"pid": os.getpid(), "tracing": False})
@@ -0,0 +1,47 @@
+from fastapi import HTTPException
+from sqladmin import BaseView, expose
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from profiler import profile_worker, create_profile_token, get_request_profile
+from config import settings
+
+
+profiler_settings = settings.profiler
+
+
+class ProfilerAdmin(BaseView):
+    """Profiles of the worker serving the admin request, guarded by AdminAuth like the model views"""
+    name = "Profiler"
+    icon = "fa-solid fa-fire"
+
+    @expose("/profiler", methods=["GET"])
+    async def profile_worker(self, request: Request) -> Response:
+        """Speedscope profile of this worker over the next ?seconds="""
+        try:
+            seconds = float(request.query_params.get("seconds", profiler_settings.DEFAULT_SECONDS))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid seconds")
+        if not 0 < seconds <= profiler_settings.MAX_SECONDS:
+            raise HTTPException(status_code=400, detail=f"Seconds must be in (0, {profiler_settings.MAX_SECONDS}]")
+        profile = await profile_worker(seconds)
+        if profile is None:
+            raise HTTPException(status_code=409, detail="Profile is already running in this worker")
+        return JSONResponse(profile, headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'})
+
+    @expose("/profiler/token", methods=["GET"])
+    async def request_profile_token(self, request: Request) -> Response:
+        """Value of the profile header for requests to profile, valid for ?ttl= seconds"""
+        try:
+            ttl = int(request.query_params.get("ttl", profiler_settings.MAX_TOKEN_TTL))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid ttl")
+        return JSONResponse({"header": profiler_settings.TOKEN_HEADER, "token": create_profile_token(ttl)})
+
+    @expose("/profiler/requests/{profile_id}", methods=["GET"])
+    async def request_profile(self, request: Request) -> Response:
+        """Stored speedscope profile of a request sent with the profile header"""
+        profile = await get_request_profile(request.path_params["profile_id"])
+        if profile is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return Response(profile, media_type="application/json")
@@ -2,11 +2,11 @@ from typing import Optional, Type, TypeVar, Generic
 
 from fastapi_users import FastAPIUsers
 from fastapi_users.authentication import CookieTransport, AuthenticationBackend
-from fastapi_users.authentication import JWTStrategy
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
 from fastapi_users import models
 
 from auth.manager import get_user_manager
+from auth.sessions import SessionJWTStrategy, TokenUser
 from user.models import User
 from config import settings
 
@@ -23,8 +23,8 @@ SECRET = auth_settings.SECRET_JWT
 
 cookie_transport = CookieTransport(cookie_name="bonds", cookie_max_age=604800)
 
-def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET, lifetime_seconds=3600)
+def get_jwt_strategy() -> SessionJWTStrategy:
+    return SessionJWTStrategy(secret=SECRET, lifetime_seconds=auth_settings.TOKEN_LIFETIME)
 
 
 auth_backend = AuthenticationBackend(
@@ -61,4 +61,14 @@ fastapi_users = CustomFastapiUsers[User, int](
     [auth_backend],
 )
 
-current_user = fastapi_users.current_user()
\ No newline at end of file
+current_user = fastapi_users.current_user()
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
+
+async def current_token_user(request: Request) -> TokenUser:
+    """Like current_user, but trusts a valid not revoked token and does not load the user"""
+    token = await cookie_transport.scheme(request)
+    user = await get_jwt_strategy().read_token_user(token)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return user
\ No newline at end of file
@@ -0,0 +1,67 @@
+import hashlib
+import time
+from uuid import UUID
+
+import jwt
+from fastapi_users import BaseUserManager
+from fastapi_users.authentication import JWTStrategy
+
+from user.models import User
+from lru import LRUCache
+from config import settings
+
+
+auth_settings = settings.auth
+
+USER_COLUMNS = [column.key for column in User.__table__.columns]
+
+
+class IdentityCache(LRUCache):
+    """
+    Snapshots of authenticated users keyed by the hash of their token.
+
+    Every hit builds a new detached User from the snapshot, so requests
+    never share an instance. The cache is local to the worker, changes
+    of a user reach other workers through session_registry.user_changed.
+    """
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get_user(self, token: str) -> User | None:
+        snapshot = self.get(self.token_key(token))
+        return User(**snapshot) if snapshot is not None else None
+
+    def set_user(self, token: str, user: User, expires_at: float):
+        snapshot = {column: getattr(user, column) for column in USER_COLUMNS}
+        self.set(self.token_key(token), snapshot, ttl=expires_at - time.time())
+
+    def invalidate_user(self, user_id: UUID):
+        keys = [key for key, (_, snapshot) in self._data.items() if snapshot["id"] == user_id]
+        for key in keys:
+            self.delete(key)
+
+
+identity_cache = IdentityCache(
+    maxsize=auth_settings.IDENTITY_CACHE_MAXSIZE,
+    ttl=auth_settings.IDENTITY_CACHE_TTL,
+)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    """JWT strategy that reads the user of a recently seen token from identity_cache"""
+
+    async def read_token(self, token: str | None, user_manager: BaseUserManager) -> User | None:
+        if token is None:
+            return None
+        user = identity_cache.get_user(token)
+        if user is not None:
+            return user
+
+        user = await super().read_token(token, user_manager)
+        if user is not None:
+            # the signature was verified by read_token, only exp is needed here
+            expires_at = jwt.decode(token, options={"verify_signature": False}).get("exp", time.time())
+            identity_cache.set_user(token, user, expires_at)
+        return user
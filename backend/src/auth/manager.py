@@ -1,21 +1,25 @@
-from typing import Optional
+from typing import Any, Optional
 from uuid import UUID
 import secrets
 from uuid import uuid4
 
+import jwt
 from fastapi import Depends, Request, Response
-from fastapi_users import exceptions, models
+from fastapi.security import OAuth2PasswordRequestForm
+from fastapi_users import exceptions, models, schemas
 from fastapi_users import BaseUserManager, UUIDIDMixin
-from fastapi_users.password import PasswordHelper
-from pwdlib import PasswordHash
-from pwdlib.hashers.argon2 import Argon2Hasher
+from fastapi_users.jwt import decode_jwt, generate_jwt
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
 from db import get_user_db, async_session_maker
 from logger import logger
 from user.models import User
-from auth.tasks import delete_user_reset_password_token_task, delete_user_verification_token_task
-from auth.service import update_user_verification_token, update_user_reset_password_token
+from auth.tokens import verification_tokens, reset_password_tokens
+from auth.password import password_helper, password_hasher
+from auth.sessions import session_registry
+from user.existence import add_user_to_filters
 from mail.utils import (
     send_sucessful_login_msg,
     send_sucessful_register_msg,
@@ -27,14 +31,126 @@ from mail.utils import (
 auth_settings = settings.auth
 SECRET = auth_settings.SECRET_MANAGER
 
-password_hash = PasswordHash((Argon2Hasher(),))
-password_helper = PasswordHelper(password_hash)
-
 
 class UserManager(UUIDIDMixin, BaseUserManager[User, UUID]):
+    """
+    Password hashing and verification are awaited in the process pool of
+    password_hasher instead of running on the event loop.
+
+    Emails reporting a change are added to the outbox in the session of
+    user_db before the change is written, so both are committed together.
+    """
     reset_password_token_secret = SECRET
     verification_token_secret = SECRET
 
+    async def create(
+        self,
+        user_create: schemas.UC,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+
+        existing_user = await self.user_db.get_by_email(user_create.email)
+        if existing_user is not None:
+            raise exceptions.UserAlreadyExists()
+
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        password = user_dict.pop("password")
+        user_dict["hashed_password"] = await password_hasher.hash(password)
+        # the id is known before the insert, so the emails are committed with the user
+        user_dict["id"] = uuid4()
+        await self.add_register_emails(self.user_db.user_table(**user_dict))
+
+        created_user = await self.user_db.create(user_dict)
+        await add_user_to_filters(created_user)
+
+        await self.on_after_register(created_user, request)
+
+        return created_user
+
+    async def authenticate(self, credentials: OAuth2PasswordRequestForm) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Run the hasher to mitigate timing attack
+            await password_hasher.hash(credentials.password)
+            return None
+
+        verified, updated_password_hash = await password_hasher.verify_and_update(
+            credentials.password, user.hashed_password
+        )
+        if not verified:
+            return None
+        # Update password hash to a more robust one if needed
+        if updated_password_hash is not None:
+            await self.user_db.update(user, {"hashed_password": updated_password_hash})
+
+        return user
+
+    async def forgot_password(self, user: User, request: Optional[Request] = None) -> None:
+        if not user.is_active:
+            raise exceptions.UserInactive()
+
+        token_data = {
+            "sub": str(user.id),
+            "password_fgpt": await password_hasher.hash(user.hashed_password),
+            "aud": self.reset_password_token_audience,
+        }
+        token = generate_jwt(
+            token_data,
+            self.reset_password_token_secret,
+            self.reset_password_token_lifetime_seconds,
+        )
+        await self.on_after_forgot_password(user, token, request)
+
+    async def reset_password(self, token: str, password: str, request: Optional[Request] = None) -> User:
+        # the token must also be the latest one issued and not expired in the token store
+        if await reset_password_tokens.get_user_id(token) is None:
+            raise exceptions.InvalidResetPasswordToken()
+
+        try:
+            data = decode_jwt(token, self.reset_password_token_secret, [self.reset_password_token_audience])
+            parsed_id = self.parse_id(data["sub"])
+            password_fingerprint = data["password_fgpt"]
+        except (jwt.PyJWTError, KeyError, exceptions.InvalidID):
+            raise exceptions.InvalidResetPasswordToken()
+
+        user = await self.get(parsed_id)
+
+        valid_password_fingerprint, _ = await password_hasher.verify_and_update(
+            user.hashed_password, password_fingerprint
+        )
+        if not valid_password_fingerprint:
+            raise exceptions.InvalidResetPasswordToken()
+
+        if not user.is_active:
+            raise exceptions.UserInactive()
+
+        await send_sucessful_reset_password_msg(session=self.user_db.session, user=user)
+        updated_user = await self._update(user, {"password": password})
+        await reset_password_tokens.consume(token)
+
+        await self.on_after_reset_password(user, request)
+
+        return updated_user
+
+    async def _update(self, user: User, update_dict: dict[str, Any]) -> User:
+        password = update_dict.get("password")
+        if password is not None:
+            await self.validate_password(password, user)
+            update_dict = {key: value for key, value in update_dict.items() if key != "password"}
+            update_dict["hashed_password"] = await password_hasher.hash(password)
+        updated_user = await super()._update(user, update_dict)
+        await session_registry.user_changed(user.id)
+        if "email" in update_dict or "username" in update_dict:
+            await add_user_to_filters(updated_user)
+        return updated_user
+
     async def oauth_callback(
         self: "BaseUserManager[models.UOAP, models.ID]",
         oauth_name: str,
@@ -71,12 +187,15 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, UUID]):
                 username = account_email.split("@")[0] + "_" + username_postfix
                 password = self.password_helper.generate()
                 user_dict = {
+                    "id": uuid4(),
                     "email": account_email,
                     "username": username,
-                    "hashed_password": self.password_helper.hash(password),
+                    "hashed_password": await password_hasher.hash(password),
                     "is_verified": is_verified_by_default,
                 }
+                await self.add_register_emails(self.user_db.user_table(**user_dict))
                 user = await self.user_db.create(user_dict)
+                await add_user_to_filters(user)
                 user = await self.user_db.add_oauth_account(user, oauth_account_dict)
                 await self.on_after_register(user, request)
         else:
@@ -92,12 +211,14 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, UUID]):
         
         return user
     
-    async def on_after_register(self, user: User, request: Optional[Request] = None):
-        logger.debug(f"User {user.id} has registered.")
-        await self.on_after_request_verify(user=user, token='', request=request)
-        await send_sucessful_register_msg(user=user)
+    async def add_register_emails(self, user: User):
+        """Add the emails of a new user to the outbox, to be committed with the user"""
+        await send_sucessful_register_msg(session=self.user_db.session, user=user)
         if not user.is_verified:
-            await send_verification(user)
+            await send_verification(session=self.user_db.session, user=user)
+
+    async def on_after_register(self, user: User, request: Optional[Request] = None):
+        logger.debug("User %s has registered.", user.id)
 
     async def on_after_login(
         self,
@@ -105,50 +226,49 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, UUID]):
         request: Optional[Request] = None,
         response: Optional[Response] = None,
     ): 
-        logger.debug(f"User {user.id} logged in.")
-        logger.debug(f"Request: {str(request.json)}")
-        logger.debug(f"Response: {response.body}")
-        await send_sucessful_login_msg(user=user)
+        logger.debug("User %s logged in.", user.id)
+        logger.debug("Request: %s", str(request.json))
+        logger.debug("Response: %s", response.body)
+        await send_sucessful_login_msg(session=self.user_db.session, user=user)
         if not user.is_verified:
-            await send_verification(user)
+            await send_verification(session=self.user_db.session, user=user)
+        await self.user_db.session.commit()
 
     async def on_after_forgot_password(self, user: User, token: str, request: Optional[Request] = None):
-        logger.debug(f"User {user.id} has forgot their password. Reset token: {token}")
-        await update_user_reset_password_token(user_id=user.id, token=token)
-        await send_sucessful_forgot_password_msg(user=user, reset_token=token)
-        delete_user_reset_password_token_task.apply_async(
-            (user.id,), countdown=auth_settings.RESET_PASSWORD__TOKEN_EXPIRATION
-        )
+        logger.debug("User %s has forgot their password. Reset token: %s", user.id, token)
+        await reset_password_tokens.issue(user.id, token)
+        await send_sucessful_forgot_password_msg(session=self.user_db.session, user=user, reset_token=token)
+        await self.user_db.session.commit()
 
     async def on_after_reset_password(self, user: User, request: Optional[Request] = None):
-        await send_sucessful_reset_password_msg(user=user)
+        await session_registry.revoke_user(user.id)
 
     async def on_after_request_verify(self, user: User, token: str, request: Optional[Request] = None):
-        token = await send_verification(user=user)
-        logger.debug(f"Verification requested for user {user.id}. Verification token: {token}")
+        token = await send_verification(session=self.user_db.session, user=user)
+        await self.user_db.session.commit()
+        logger.debug("Verification requested for user %s. Verification token: %s", user.id, token)
 
 
 async def get_user_manager(user_db=Depends(get_user_db)):
-    yield UserManager(user_db)
+    yield UserManager(user_db, password_helper)
 
 
 async def verify_password(stored_hashed_password: str, given_password: str) -> bool:
-    is_verified, updated_hash = password_helper.verify_and_update(given_password, stored_hashed_password)
+    is_verified, updated_hash = await password_hasher.verify_and_update(given_password, stored_hashed_password)
     if is_verified and updated_hash:
         async with async_session_maker() as session:
             await session.execute(
-                f"UPDATE {User.__tablename__} SET hashed_password = :new_hash WHERE hashed_password = :old_hash",
-                {"new_hash": updated_hash, "old_hash": stored_hashed_password}
+                update(User)
+                .where(User.hashed_password == stored_hashed_password)
+                .values(hashed_password=updated_hash)
             )
             await session.commit()
     return is_verified
 
 
-async def send_verification(user: User) -> str:
+async def send_verification(session: AsyncSession, user: User) -> str:
+    """Create verification token and add the email with it to the outbox within session"""
     token = secrets.token_hex(16)
-    await update_user_verification_token(user_id=user.id, token=token)
-    await send_email_verification_msg(user=user, verification_token=token)
-    delete_user_verification_token_task.apply_async(
-        (user.id,), countdown=auth_settings.VERIFY_TOKEN_EXPIRATION
-    )
+    await verification_tokens.issue(user.id, token)
+    await send_email_verification_msg(session=session, user=user, verification_token=token)
     return token
\ No newline at end of file
@@ -0,0 +1,75 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from fastapi_users.password import PasswordHelper
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+from config import settings
+from logger import logger
+
+
+password_hashing_settings = settings.password_hashing
+
+password_hash = PasswordHash((Argon2Hasher(),))
+password_helper = PasswordHelper(password_hash)
+
+
+class AsyncPasswordHasher:
+    """
+    Runs Argon2 hashing and verification in a process pool, so the CPU time
+    does not block the event loop.
+
+    At most max_pending operations may wait for or run in the pool; beyond that
+    callers get 503 instead of queueing without a bound.
+    """
+
+    def __init__(self, helper: PasswordHelper, max_workers: int, max_pending: int):
+        self.helper = helper
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers do not inherit the event loop and connections of the app
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            logger.warning("Password hashing queue is full (%s pending)", self.pending)
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, try again later",
+                headers={"Retry-After": str(password_hashing_settings.RETRY_AFTER)},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.helper.hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self._run(self.helper.verify_and_update, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = AsyncPasswordHasher(
+    helper=password_helper,
+    max_workers=password_hashing_settings.MAX_WORKERS,
+    max_pending=password_hashing_settings.MAX_PENDING,
+)
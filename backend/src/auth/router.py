@@ -1,20 +1,32 @@
 from fastapi import Depends, APIRouter, HTTPException
 from fastapi.responses import RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.status import HTTP_302_FOUND
 
 from user.models import User
 from user.schemas import UserRead
 from auth.service import verify_verification_token
 from config import settings
-from auth.base_config import current_user
+from auth.base_config import current_user, current_token_user
+from auth.sessions import session_registry, TokenUser
 from auth.manager import send_verification
+from db import get_async_session
 from logger import logger
 
 router = APIRouter()
 
 @router.get('/ask_verification')
-async def ask_verification(user: User = Depends(current_user)):
-    await send_verification(user=user)
+async def ask_verification(user: User = Depends(current_user), session: AsyncSession = Depends(get_async_session)):
+    await send_verification(session=session, user=user)
+    await session.commit()
+    return {
+        'status': 'success',
+    }
+
+@router.post('/logout_all')
+async def logout_all(user: TokenUser = Depends(current_token_user)):
+    await session_registry.revoke_user(user.id)
+    logger.info("User %s logged out of all sessions", user)
     return {
         'status': 'success',
     }
@@ -22,7 +34,7 @@ async def ask_verification(user: User = Depends(current_user)):
 @router.get("/verify-account", response_model=UserRead)
 async def verify_user(token: str, user: User = Depends(current_user)):
     if user.is_verified:
-        logger.warning(f"User with verification token {token} already verified")
+        logger.warning("User with verification token %s already verified", token)
         raise HTTPException(status_code=400, detail=f"User with this verification token {token} already verified")
     else:
         await verify_verification_token(token)
@@ -1,72 +1,26 @@
 from fastapi import HTTPException
-from sqlalchemy import select
 from typing import Optional
-from uuid import UUID
 
 from user.models import User
-from vacancy.models import Vacancy # Do not delete, because of celery task
-from resume.models import Resume # Do not delete, because of celery task
 from logger import logger
 from db import async_session_maker
-    
-
-async def update_user_verification_token(user_id: UUID, token: str) -> Optional[User]:
-    async with async_session_maker() as session:
-        query = select(User).where(user_id == User.id)
-        user = (await session.execute(query)).unique().scalar_one_or_none()
-        user.verification_token = token
-        session.add(user)
-        await session.commit()
-        await session.refresh(user)
-        return user
-    
-
-async def delete_user_verification_token(user_id: UUID) -> Optional[User]:
-    async with async_session_maker() as session:
-        query = select(User).where(user_id == User.id)
-        user = (await session.execute(query)).unique().scalar_one_or_none()
-        user.verification_token = None
-        session.add(user)
-        await session.commit()
-        await session.refresh(user)
-        return user
-
-
-async def update_user_reset_password_token(user_id: UUID, token: str) -> Optional[User]:
-    async with async_session_maker() as session:
-        query = select(User).where(user_id == User.id)
-        user = (await session.execute(query)).unique().scalar_one_or_none()
-        user.reset_password_token = token
-        session.add(user)
-        await session.commit()
-        await session.refresh(user)
-        return user
-
-
-async def delete_user_reset_password_token(user_id: UUID) -> Optional[User]:
-    async with async_session_maker() as session:
-        query = select(User).where(user_id == User.id)
-        user = (await session.execute(query)).unique().scalar_one_or_none()
-        user.reset_password_token = None
-        session.add(user)
-        await session.commit()
-        await session.refresh(user)
-        return user
+from auth.tokens import verification_tokens
+from auth.sessions import session_registry
     
 
 async def verify_verification_token(token: str) -> Optional[User]:
+    user_id = await verification_tokens.consume(token)
     async with async_session_maker() as session:
-        query = select(User).where(token == User.verification_token)
-        user = (await session.execute(query)).unique().scalar_one_or_none()
+        user = await session.get(User, user_id) if user_id else None
         if not user:
-            logger.warning(f"User with verification token {token} not found")
+            logger.warning("User with verification token %s not found", token)
             raise HTTPException(status_code=404, detail=f"User with this verification token {token} not found")
 
-        logger.debug(f"User with verification token {token} verified")
+        logger.debug("User with verification token %s verified", token)
         user.is_verified = True
-        user.verification_token = None
         session.add(user)
         await session.commit()
         await session.refresh(user)
+        await session_registry.user_changed(user.id)
 
         return user
@@ -0,0 +1,221 @@
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+from uuid import UUID
+
+import jwt
+from fastapi_users import BaseUserManager
+from fastapi_users.jwt import decode_jwt, generate_jwt
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from auth.identity import CachedJWTStrategy, identity_cache
+from user.models import User
+from redis_ import redis_connection
+from config import settings
+from logger import logger
+
+
+auth_settings = settings.auth
+
+
+@dataclass(frozen=True)
+class TokenUser:
+    """Identity taken from a valid, not revoked token without loading the user"""
+    id: UUID
+    jti: str
+
+    def __str__(self):
+        return f"({self.id})"
+
+
+class RevocationFilter:
+    """
+    In-memory view of revoked tokens of the worker.
+
+    Holds revoked jtis and per-user "revoked before" times, each only until
+    the tokens it covers expire. It is synced from the revocation stream at
+    most once per sync_interval, so a revocation made by another worker
+    applies here within that interval and one made here applies at once.
+    Entries of a user, including "user changed" ones, also drop the user
+    from the identity_cache of the worker. Other worker-local state subscribes
+    to entries of its own field, see SessionRegistry.broadcast.
+    """
+
+    def __init__(self, redis: Redis, stream: str, sync_interval: float):
+        self.redis = redis
+        self.stream = stream
+        self.sync_interval = sync_interval
+        self._jtis: dict[str, float] = {}
+        self._users: dict[str, tuple[float, float]] = {}
+        self._last_id = "0-0"
+        self._synced_at = 0.0
+        self._handlers: dict[str, Callable[[str], None]] = {}
+
+    def subscribe(self, field: str, handler: Callable[[str], None]):
+        """Call handler with the value of every not expired entry having field"""
+        self._handlers[field] = handler
+
+    def add(self, fields: dict[str, str]):
+        expires_at = float(fields["exp"])
+        if expires_at < time.time():
+            return
+        for field, handler in self._handlers.items():
+            if field in fields:
+                handler(fields[field])
+                return
+        if "jti" in fields:
+            self._jtis[fields["jti"]] = expires_at
+            return
+        identity_cache.invalidate_user(UUID(fields["user_id"]))
+        if "before" in fields:
+            before = float(fields["before"])
+            previous_before, _ = self._users.get(fields["user_id"], (0.0, 0.0))
+            self._users[fields["user_id"]] = (max(before, previous_before), expires_at)
+
+    def is_revoked(self, claims: dict) -> bool:
+        if claims.get("jti") in self._jtis:
+            return True
+        before, _ = self._users.get(claims.get("sub"), (0.0, 0.0))
+        return claims.get("iat", 0) <= before
+
+    def _purge(self):
+        now = time.time()
+        self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp >= now}
+        self._users = {user_id: item for user_id, item in self._users.items() if item[1] >= now}
+
+    async def sync(self):
+        if time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = time.monotonic()
+        try:
+            while True:
+                response = await self.redis.xread({self.stream: self._last_id}, count=1000)
+                entries = response[0][1] if response else []
+                for entry_id, fields in entries:
+                    self._last_id = entry_id.decode("utf-8")
+                    self.add({key.decode("utf-8"): value.decode("utf-8") for key, value in fields.items()})
+                if len(entries) < 1000:
+                    break
+        except RedisError as e:
+            logger.error("Syncing token revocations failed: %s", e)
+        self._purge()
+
+    def __len__(self) -> int:
+        return len(self._jtis) + len(self._users)
+
+
+class SessionRegistry:
+    """
+    Active sessions (token jtis) of every user and their revocation.
+
+    Sessions are kept in a sorted set per user scored by token expiration.
+    Revocations and user changes are appended to a stream trimmed to the
+    token lifetime and mirrored by the RevocationFilter of every worker.
+    """
+
+    def __init__(self, redis: Redis, prefix: str, lifetime: int, revocation_filter: RevocationFilter):
+        self.redis = redis
+        self.prefix = prefix
+        self.lifetime = lifetime
+        self.filter = revocation_filter
+
+    def _sessions_key(self, user_id: UUID | str) -> str:
+        return f"{self.prefix}user:{user_id}"
+
+    async def register(self, user_id: UUID, jti: str, expires_at: float):
+        key = self._sessions_key(user_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(key, "-inf", time.time())
+            pipe.zadd(key, {jti: expires_at})
+            pipe.expire(key, self.lifetime)
+            await pipe.execute()
+
+    async def get_sessions(self, user_id: UUID) -> list[str]:
+        key = self._sessions_key(user_id)
+        jtis = await self.redis.zrangebyscore(key, time.time(), "+inf")
+        return [jti.decode("utf-8") for jti in jtis]
+
+    async def _publish(self, fields: dict[str, str]):
+        self.filter.add(fields)
+        # revocations older than the token lifetime cover only expired tokens
+        min_id = int((time.time() - self.lifetime) * 1000)
+        await self.redis.xadd(self.filter.stream, fields, minid=min_id, approximate=True)
+
+    async def revoke(self, user_id: UUID, jti: str, expires_at: float):
+        """Revoke one session, e.g. on logout"""
+        await self.redis.zrem(self._sessions_key(user_id), jti)
+        await self._publish({"jti": jti, "exp": str(expires_at)})
+
+    async def revoke_user(self, user_id: UUID):
+        """Revoke all sessions of user issued until now (log out everywhere)"""
+        await self.redis.delete(self._sessions_key(user_id))
+        now = time.time()
+        await self._publish({"user_id": str(user_id), "before": str(now), "exp": str(now + self.lifetime)})
+
+    async def broadcast(self, field: str, value: str, ttl: float):
+        """Pass value to the field subscribers of every worker that syncs within ttl seconds"""
+        await self._publish({field: value, "exp": str(time.time() + ttl)})
+
+    async def user_changed(self, user_id: UUID):
+        """Drop the cached identity of user in every worker, sessions stay valid"""
+        now = time.time()
+        try:
+            await self._publish({"user_id": str(user_id), "changed": str(now), "exp": str(now + self.lifetime)})
+        except RedisError as e:
+            # applied here already, other workers drop it after the identity cache ttl
+            logger.error("Publishing change of user %s failed: %s", user_id, e)
+
+
+session_registry = SessionRegistry(
+    redis=redis_connection,
+    prefix=auth_settings.SESSION_PREFIX,
+    lifetime=auth_settings.TOKEN_LIFETIME,
+    revocation_filter=RevocationFilter(
+        redis=redis_connection,
+        stream=auth_settings.REVOCATION_STREAM,
+        sync_interval=auth_settings.REVOCATION_SYNC_INTERVAL,
+    ),
+)
+
+
+class SessionJWTStrategy(CachedJWTStrategy):
+    """JWT strategy with a jti per token registered in session_registry, so tokens can be revoked"""
+
+    async def write_token(self, user: User) -> str:
+        jti = uuid.uuid4().hex
+        issued_at = time.time()
+        data = {"sub": str(user.id), "aud": self.token_audience, "jti": jti, "iat": issued_at}
+        token = generate_jwt(data, self.encode_key, self.lifetime_seconds, algorithm=self.algorithm)
+        await session_registry.register(user.id, jti, issued_at + self.lifetime_seconds)
+        return token
+
+    async def read_claims(self, token: str | None) -> dict | None:
+        """Claims of a valid token that has not been revoked"""
+        if token is None:
+            return None
+        try:
+            claims = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return None
+        await session_registry.filter.sync()
+        if "jti" not in claims or session_registry.filter.is_revoked(claims):
+            return None
+        return claims
+
+    async def read_token(self, token: str | None, user_manager: BaseUserManager) -> User | None:
+        if await self.read_claims(token) is None:
+            return None
+        return await super().read_token(token, user_manager)
+
+    async def read_token_user(self, token: str | None) -> TokenUser | None:
+        claims = await self.read_claims(token)
+        if claims is None:
+            return None
+        return TokenUser(id=UUID(claims["sub"]), jti=claims["jti"])
+
+    async def destroy_token(self, token: str, user: User) -> None:
+        claims = await self.read_claims(token)
+        if claims is not None:
+            await session_registry.revoke(user.id, claims["jti"], claims["exp"])
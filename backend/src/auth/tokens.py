@@ -0,0 +1,66 @@
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from redis_ import redis_connection
+from config import settings
+
+
+auth_settings = settings.auth
+
+
+class TokenStore:
+    """
+    One-time user tokens kept in Redis keys that expire on their own.
+
+    Every user has at most one valid token: issuing a new one revokes the previous.
+    """
+
+    def __init__(self, redis: Redis, prefix: str, ttl: int):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _token_key(self, token: str) -> str:
+        return f"{self.prefix}{token}"
+
+    def _user_key(self, user_id: UUID) -> str:
+        return f"{self.prefix}user:{user_id}"
+
+    async def issue(self, user_id: UUID, token: str):
+        previous_token = await self.redis.get(self._user_key(user_id))
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if previous_token:
+                pipe.delete(self._token_key(previous_token.decode("utf-8")))
+            pipe.set(self._token_key(token), str(user_id), ex=self.ttl)
+            pipe.set(self._user_key(user_id), token, ex=self.ttl)
+            await pipe.execute()
+
+    async def get_user_id(self, token: str) -> UUID | None:
+        user_id = await self.redis.get(self._token_key(token))
+        return UUID(user_id.decode("utf-8")) if user_id else None
+
+    async def get_token(self, user_id: UUID) -> str | None:
+        token = await self.redis.get(self._user_key(user_id))
+        return token.decode("utf-8") if token else None
+
+    async def consume(self, token: str) -> UUID | None:
+        """Revoke token and return id of its user, None if token is unknown or expired"""
+        user_id = await self.redis.getdel(self._token_key(token))
+        if not user_id:
+            return None
+        user_id = UUID(user_id.decode("utf-8"))
+        await self.redis.delete(self._user_key(user_id))
+        return user_id
+
+
+verification_tokens = TokenStore(
+    redis=redis_connection,
+    prefix=f"{auth_settings.TOKEN_PREFIX}verify:",
+    ttl=auth_settings.VERIFY_TOKEN_EXPIRATION,
+)
+reset_password_tokens = TokenStore(
+    redis=redis_connection,
+    prefix=f"{auth_settings.TOKEN_PREFIX}reset_password:",
+    ttl=auth_settings.RESET_PASSWORD__TOKEN_EXPIRATION,
+)
@@ -0,0 +1,185 @@
+from typing import Awaitable, Callable, TypeVar
+from uuid import UUID, uuid4
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from auth.base_config import current_superuser
+from auth.sessions import session_registry
+from redis_ import redis_connection
+from lru import LRUCache
+from config import settings
+from logger import logger
+
+
+cache_settings = settings.cache
+cache_router = APIRouter()
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+
+def make_key(namespace: str, owner_id: UUID, entity_id: int) -> str:
+    """Cache key of an entity readable only by its owner"""
+    return f"{namespace}:{owner_id}:{entity_id}"
+
+
+class CacheStats:
+    def __init__(self):
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+# a miss leaves a fill token, the loaded value is stored only if the token is
+# still there: an invalidation during the load deletes it with the entry
+READ_SCRIPT = """
+local payload = redis.call('GET', KEYS[1])
+if not payload then
+    redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+end
+return payload
+"""
+WRITE_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('DEL', KEYS[2])
+return 1
+"""
+INVALIDATION_FIELD = "cache_keys"
+
+
+class ReadThroughCache:
+    """
+    Two tier read-through cache of serialized pydantic payloads.
+
+    Hot keys are served from the in-process LRU, the rest from Redis, and
+    misses are loaded from the database and written to both tiers, unless
+    the key was invalidated while loading. Invalidations are broadcast over
+    the revocation stream, so other workers drop their LRU entries within
+    its sync interval. Redis failures on reads are logged and treated as
+    misses; keys whose invalidation failed bypass the cache in this worker
+    until a retry on a later call deletes them.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        prefix: str,
+        ttl: int,
+        fill_timeout: int,
+        local_maxsize: int,
+        local_ttl: float,
+    ):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+        self.fill_timeout = fill_timeout
+        self.local = LRUCache(maxsize=local_maxsize, ttl=local_ttl)
+        self.stats = CacheStats()
+        self._read = redis.register_script(READ_SCRIPT)
+        self._write = redis.register_script(WRITE_SCRIPT)
+        self._pending: set[str] = set()
+        session_registry.filter.subscribe(INVALIDATION_FIELD, self._drop_local)
+
+    def _keys(self, key: str) -> list[str]:
+        return [self.prefix + key, f"{self.prefix}fill:{key}"]
+
+    def _drop_local(self, keys: str):
+        for key in keys.split():
+            self.local.delete(key)
+
+    async def _delete_pending(self):
+        keys = list(self._pending)
+        try:
+            await self.redis.delete(*[redis_key for key in keys for redis_key in self._keys(key)])
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning("Cache invalidation of %s failed, retrying on the next call: %s", keys, e)
+            return
+        self._pending.difference_update(keys)
+
+    async def get_or_load(self, key: str, schema: type[SchemaT], loader: Callable[[], Awaitable[SchemaT]]) -> SchemaT:
+        await session_registry.filter.sync()
+        if self._pending:
+            await self._delete_pending()
+        if key in self._pending:
+            # Redis may still hold the entry the change of which was not invalidated
+            self.stats.misses += 1
+            return await loader()
+
+        payload = self.local.get(key)
+        if payload is not None:
+            self.stats.local_hits += 1
+            return schema.model_validate_json(payload)
+
+        token = uuid4().hex
+        try:
+            payload = await self._read(keys=self._keys(key), args=[token, self.fill_timeout])
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning("Cache read of %s failed: %s", key, e)
+            token, payload = None, None
+        if payload is not None:
+            self.stats.redis_hits += 1
+            self.local.set(key, payload)
+            return schema.model_validate_json(payload)
+
+        self.stats.misses += 1
+        value = await loader()
+        if token is None:
+            return value
+        payload = value.model_dump_json().encode("utf-8")
+        try:
+            stored = await self._write(keys=self._keys(key), args=[token, payload, self.ttl])
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning("Cache write of %s failed: %s", key, e)
+            stored = False
+        if stored:
+            self.local.set(key, payload)
+        return value
+
+    async def invalidate(self, *keys: str):
+        if not keys:
+            return
+        for key in keys:
+            self.local.delete(key)
+        self.stats.invalidations += len(keys)
+        self._pending.update(keys)
+        await self._delete_pending()
+        try:
+            await session_registry.broadcast(INVALIDATION_FIELD, " ".join(keys), self.local.ttl)
+        except RedisError as e:
+            self.stats.errors += 1
+            logger.warning("Broadcasting cache invalidation of %s failed: %s", keys, e)
+
+
+cache = ReadThroughCache(
+    redis=redis_connection,
+    prefix=cache_settings.PREFIX,
+    ttl=cache_settings.TTL,
+    fill_timeout=cache_settings.FILL_TIMEOUT,
+    local_maxsize=cache_settings.LOCAL_MAXSIZE,
+    local_ttl=cache_settings.LOCAL_TTL,
+)
+
+
+@cache_router.get("/stats")
+async def get_cache_stats(user=Depends(current_superuser)) -> dict[str, int]:
+    """Cache hit/miss counters of the current worker"""
+    return {**cache.stats.as_dict(), "local_size": len(cache.local)}
@@ -24,8 +24,9 @@ class MailSettings(EnvSettings):
     MAIL_FROM: str
     MAIL_PORT: str
     MAIL_SERVER: str
-    MAIL_TLS: str
-    MAIL_SSL: str
+    MAIL_TLS: bool = False
+    MAIL_SSL: bool = False
+    MAIL_STARTTLS: bool = False
 
 
 class RedisSettings(EnvSettings):
@@ -76,6 +77,7 @@ class TestSettings:
 
 
 class MiddlewareSettings:
+    REQUEST_ID_HEADER = "X-Request-ID"
     BACKEND_CORS_ORIGINS = [
         "http://localhost:8080",
         "http://localhost:8000",
@@ -91,6 +93,13 @@ class AuthSettings(EnvSettings):
     GOOGLE_AUTH_ROUTER_SECRET: str
     RESET_PASSWORD__TOKEN_EXPIRATION: int = 300
     VERIFY_TOKEN_EXPIRATION: int = 300
+    TOKEN_PREFIX: str = "token:"
+    IDENTITY_CACHE_TTL: float = 10
+    IDENTITY_CACHE_MAXSIZE: int = 4096
+    TOKEN_LIFETIME: int = 3600
+    SESSION_PREFIX: str = "sessions:"
+    REVOCATION_STREAM: str = "auth:revocations"
+    REVOCATION_SYNC_INTERVAL: float = 1
     VERIFY_REDIRECT: str = "http://localhost:8000/crm"
     LOGIN_REDIRECT: str = "http://localhost:8000/crm"
 
@@ -101,8 +110,17 @@ class AdminSettings(EnvSettings):
     SECRET_SESSION: str
 
 
-class LoggingSettings:
-    LOG_PATH = PROJECT_PATH / "logs"
+class LoggingSettings(EnvSettings):
+    LOG_PATH: Path = PROJECT_PATH / "logs"
+    # write files from a listener thread instead of the logging (event loop) thread
+    LOG_QUEUE: bool = True
+    LOG_LEVEL: str = "DEBUG"
+    # "text" or "json" (one object per line with request_id)
+    LOG_FORMAT: str = "text"
+    # levels by logger name, e.g. LOG_LEVELS='{"DBQueryLogger": "WARNING"}'
+    LOG_LEVELS: dict[str, str] = {}
+    # share of SQL statements written to the DB query log
+    DB_QUERY_LOG_SAMPLE_RATE: float = 1.0
 
 
 class CelerySettings(EnvSettings):
@@ -116,6 +134,14 @@ class S3StorageSettings(EnvSettings):
     S3_BUCKET_NAME: str
     S3_ENDPOINT_URL: str
     S3_PUBLIC_DOMAIN: str
+    # bodies up to one part are sent with a single PUT, larger ones with multipart upload
+    S3_PART_SIZE: int = 8 * 1024 * 1024
+    S3_MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024
+    S3_MAX_POOL_CONNECTIONS: int = 20
+    S3_PRESIGNED_EXPIRATION: int = 600
+    S3_IMAGE_CONTENT_TYPES: dict[str, str] = {
+        "image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif",
+    }
 
 
 class RequestLimiterSettings:
@@ -125,10 +151,97 @@ class RequestLimiterSettings:
 
 class VacancySettings:
     EXPIRATION_TIME: int = 30
+    STATS_SALARY_BUCKET_SIZE: int = 50000
+    STATS_MAX_VACANCIES: int = 100
+    EXPIRATION_SCHEDULE_KEY: str = "vacancy:expirations"
+    EXPIRATION_CHECK_INTERVAL: int = 30
+    EXPIRATION_BATCH_SIZE: int = 500
+    # claimed expirations not reported within this time are put back on the schedule
+    EXPIRATION_CLAIM_TIMEOUT: int = 120
+    # vacancies missing on the expiration schedule are put on it this often
+    EXPIRATION_RECONCILE_INTERVAL: int = 3600
 
 
 class SSESettings:
-    EVENT_LOOP_RETRY_TIME: int = 60
+    STREAM_PREFIX: str = "events:user:"
+    STREAM_MAXLEN: int = 1000
+    STREAM_TTL: int = 7 * 24 * 60 * 60
+    STREAM_BLOCK_MS: int = 1000
+    HEARTBEAT_INTERVAL: int = 15
+    RECONNECT_DELAY: int = 5
+    CLIENT_QUEUE_SIZE: int = 100
+
+
+class CacheSettings:
+    PREFIX: str = "cache:"
+    TTL: int = 300
+    # seconds a miss may take to load and still be stored
+    FILL_TIMEOUT: int = 30
+    LOCAL_MAXSIZE: int = 1024
+    LOCAL_TTL: float = 5
+
+
+class PasswordHashingSettings:
+    MAX_WORKERS: int = 2
+    MAX_PENDING: int = 64
+    RETRY_AFTER: int = 1
+
+
+class MailOutboxSettings:
+    BATCH_SIZE: int = 50
+    MAX_BATCHES: int = 20
+    DISPATCH_INTERVAL: int = 2
+    MAX_ATTEMPTS: int = 5
+    RETRY_DELAY: int = 30
+
+
+class UserExistenceSettings:
+    KEY_PREFIX: str = "user:exists:"
+    # 2**23 bits (1 MB) and 7 hashes give ~1% false positives for ~800k values
+    BLOOM_SIZE: int = 2 ** 23
+    BLOOM_HASHES: int = 7
+    REBUILD_INTERVAL: int = 24 * 60 * 60
+    REBUILD_BATCH_SIZE: int = 1000
+    # a rebuild running longer than this may overlap with the next one
+    REBUILD_LOCK_TIMEOUT: int = 600
+
+
+class ThumbnailSettings:
+    SIZES: list[int] = [48, 96, 256]
+    FORMAT: str = "WEBP"
+    QUALITY: int = 80
+
+
+class SQLStatsSettings:
+    # one request running the same statement shape more times is logged as possible N+1
+    REPEATED_STATEMENT_THRESHOLD: int = 5
+    MAX_ROUTES: int = 500
+
+
+class ProfilerSettings:
+    INTERVAL: float = 0.005
+    DEFAULT_SECONDS: float = 10
+    MAX_SECONDS: float = 60
+    # requests with a valid token in this header are profiled, the profile id is returned in ID_HEADER
+    TOKEN_HEADER: str = "X-Profile-Token"
+    ID_HEADER: str = "X-Profile-Id"
+    MAX_TOKEN_TTL: int = 3600
+    RESULT_PREFIX: str = "profiler:request:"
+    RESULT_TTL: int = 24 * 60 * 60
+
+
+class MemorySettings:
+    # RSS and GC gauges update interval, seconds
+    SAMPLE_INTERVAL: float = 15
+    TRACEMALLOC_FRAMES: int = 1
+    MAX_TRACEMALLOC_FRAMES: int = 25
+    DEFAULT_TOP: int = 20
+    MAX_TOP: int = 200
+
+
+class PaginationSettings:
+    DEFAULT_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 200
 
 
 class Settings:
@@ -140,12 +253,21 @@ class Settings:
     test = TestSettings()
     middleware = MiddlewareSettings()
     mail = MailSettings()
+    mail_outbox = MailOutboxSettings()
+    password_hashing = PasswordHashingSettings()
     redis = RedisSettings()
     log = LoggingSettings()
     s3 = S3StorageSettings()
     request_limiter = RequestLimiterSettings()
     vacancy = VacancySettings()
     sse = SSESettings()
+    pagination = PaginationSettings()
+    user_existence = UserExistenceSettings()
+    thumbnails = ThumbnailSettings()
+    sql_stats = SQLStatsSettings()
+    profiler = ProfilerSettings()
+    memory = MemorySettings()
+    cache = CacheSettings()
 
 
 settings = Settings()
@@ -0,0 +1,78 @@
+import re
+import uuid
+from contextvars import ContextVar
+
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+
+
+middleware_settings = settings.middleware
+
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# celery task header carrying the id of the request (or task) that sent the task
+TASK_HEADER = "request_id"
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+class RequestIdMiddleware:
+    """
+    Sets request_id for the request from the request id header, or a new one,
+    and returns it in the same response header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = middleware_settings.REQUEST_ID_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = dict(scope["headers"]).get(self.header, b"").decode("latin-1")
+        current_id = value if REQUEST_ID_PATTERN.match(value) else new_request_id()
+        token = request_id.set(current_id)
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"].append((self.header, current_id.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
+
+
+@before_task_publish.connect
+def add_request_id_header(headers: dict | None = None, **kwargs):
+    current_id = request_id.get()
+    if headers is not None and current_id is not None:
+        headers.setdefault(TASK_HEADER, current_id)
+
+
+@task_prerun.connect
+def set_task_request_id(task=None, **kwargs):
+    # tasks sent without a request (beat) get an id of their own
+    # workers merge message headers into the request, eager calls keep them apart
+    current_id = (
+        getattr(task.request, TASK_HEADER, None)
+        or (task.request.headers or {}).get(TASK_HEADER)
+        or new_request_id()
+    )
+    task.request.request_id_token = request_id.set(current_id)
+
+
+@task_postrun.connect
+def reset_task_request_id(task=None, **kwargs):
+    token = getattr(task.request, "request_id_token", None)
+    if token is not None:
+        request_id.reset(token)
@@ -1,11 +1,14 @@
+import logging
+import random
 from typing import AsyncGenerator
-from time import time
+from time import perf_counter
 
 from fastapi import Depends
 from fastapi_users.db import SQLAlchemyUserDatabase
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.engine import Connection
 from sqlalchemy.engine.interfaces import DBAPICursor, _DBAPIAnyExecuteParams
 from sqlalchemy.engine.interfaces import ExecutionContext
@@ -13,16 +16,30 @@ from sqlalchemy.engine.interfaces import ExecutionContext
 from user.models import User, OAuthAccount
 from config import settings
 from logger import db_query_logger
+from metrics import DB_POOL_CHECKOUT_WAIT
 
 
+log_settings = settings.log
 test_db_settings = settings.test_database
 db_settings = settings.database
 test_settings = settings.test
 
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Default pool of async engines that records how long checkouts wait for a connection"""
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(perf_counter() - start)
+
+
 if test_settings.IS_TESTING:
-    engine = create_async_engine(test_db_settings.DATABASE_URL_ASYNC)
+    engine = create_async_engine(test_db_settings.DATABASE_URL_ASYNC, poolclass=TimedQueuePool)
 else:
-    engine = create_async_engine(db_settings.DATABASE_URL_ASYNC)
+    engine = create_async_engine(db_settings.DATABASE_URL_ASYNC, poolclass=TimedQueuePool)
     
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
@@ -36,9 +53,14 @@ def before_cursor_execute(
     context: ExecutionContext | None,
     executemany: bool,
 ) -> None:
-    context._query_start_time = time()
-    db_query_logger.debug("Start Query:\n%s" % statement)
-    db_query_logger.debug("Parameters:\n%r" % (parameters,))
+    context._query_start_time = perf_counter()
+    context._query_logged = (
+        db_query_logger.isEnabledFor(logging.DEBUG)
+        and random.random() < log_settings.DB_QUERY_LOG_SAMPLE_RATE
+    )
+    if context._query_logged:
+        db_query_logger.debug("Start Query:\n%s", statement)
+        db_query_logger.debug("Parameters:\n%r", parameters)
 
 
 @event.listens_for(Engine, "after_cursor_execute")
@@ -50,9 +72,11 @@ def after_cursor_execute(
     context: ExecutionContext,
     executemany: bool,
 ) -> None:
-    total = time() - context._query_start_time
+    if not context._query_logged:
+        return
+    total = perf_counter() - context._query_start_time
     db_query_logger.debug("Query Complete!\n\n")
-    db_query_logger.debug("Total Time: %.02fms" % (total * 1000))
+    db_query_logger.debug("Total Time: %.02fms", total * 1000)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -0,0 +1,42 @@
+from uuid import UUID
+
+from sqlalchemy import update
+
+from user.models import User
+from resume.models import Candidate
+from images.thumbnails import create_thumbnails, delete_thumbnails
+from cache import cache, make_key
+from db import async_session_maker
+from logger import logger
+
+
+async def _save_thumbnails(model, entity_id, picture_url: str) -> dict[str, str] | None:
+    thumbnails = await create_thumbnails(picture_url)
+    if thumbnails is None:
+        return None
+    async with async_session_maker() as session:
+        # the picture may have been replaced while thumbnails were made
+        result = await session.execute(
+            update(model)
+            .where(model.id == entity_id, model.profile_picture_url == picture_url)
+            .values(profile_picture_thumbnails=thumbnails)
+        )
+        await session.commit()
+    if result.rowcount == 0:
+        logger.info("Picture of %s %s was replaced, dropping its thumbnails", model.__name__, entity_id)
+        await delete_thumbnails(thumbnails)
+        return None
+    return thumbnails
+
+
+async def save_user_thumbnails(user_id: UUID, picture_url: str) -> dict[str, str] | None:
+    return await _save_thumbnails(User, user_id, picture_url)
+
+
+async def save_candidate_thumbnails(
+        candidate_id: int, picture_url: str, user_id: UUID, resume_id: int,
+) -> dict[str, str] | None:
+    thumbnails = await _save_thumbnails(Candidate, candidate_id, picture_url)
+    if thumbnails is not None:
+        await cache.invalidate(make_key("resume", user_id, resume_id))
+    return thumbnails
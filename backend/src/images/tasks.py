@@ -0,0 +1,20 @@
+from uuid import UUID
+
+from images.service import save_user_thumbnails, save_candidate_thumbnails
+from tasks_celery import celery_app
+from worker_runtime import run_async
+from logger import celery_logger as logger
+
+
+@celery_app.task
+def create_user_thumbnails(user_id: str, picture_url: str):
+    thumbnails = run_async(save_user_thumbnails(UUID(user_id), picture_url))
+    logger.info("Thumbnails of user %s picture: %s", user_id, thumbnails)
+    return thumbnails
+
+
+@celery_app.task
+def create_candidate_thumbnails(candidate_id: int, picture_url: str, user_id: str, resume_id: int):
+    thumbnails = run_async(save_candidate_thumbnails(candidate_id, picture_url, UUID(user_id), resume_id))
+    logger.info("Thumbnails of candidate %s picture: %s", candidate_id, thumbnails)
+    return thumbnails
@@ -0,0 +1,69 @@
+import io
+import posixpath
+
+from PIL import Image, ImageOps
+
+from s3_storage import s3_client
+from logger import logger
+from config import settings
+
+
+thumbnail_settings = settings.thumbnails
+
+
+def make_thumbnails(data: bytes, sizes: list[int], image_format: str, quality: int) -> dict[int, bytes]:
+    """Square thumbnails of image cropped to the center, one per size"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (max(sizes), max(sizes)))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image_format == "WEBP" and image.has_transparency_data else "RGB")
+        thumbnails = {}
+        for size in sorted(sizes, reverse=True):
+            thumbnail = ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format=image_format, quality=quality, method=4 if image_format == "WEBP" else 0)
+            thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+def thumbnail_key(object_name: str, size: int) -> str:
+    """profile-pictures/name/photo.png -> profile-pictures/name/thumbnails/photo_48.webp"""
+    directory, filename = posixpath.split(object_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, "thumbnails", f"{stem}_{size}.{thumbnail_settings.FORMAT.lower()}")
+
+
+async def create_thumbnails(picture_url: str) -> dict[str, str] | None:
+    """
+    Store thumbnails next to picture of this storage and return their urls by size.
+
+    The image is decoded and resized in the calling (Celery worker) process,
+    never in an API worker.
+    """
+    object_name = s3_client.get_object_name(picture_url)
+    if object_name is None:
+        logger.info("Picture %s is not stored by us, no thumbnails", picture_url)
+        return None
+    data = await s3_client.download_file(object_name)
+    try:
+        thumbnails = make_thumbnails(
+            data, thumbnail_settings.SIZES, thumbnail_settings.FORMAT, thumbnail_settings.QUALITY,
+        )
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Can't make thumbnails of %s: %s", object_name, e)
+        return None
+    urls = {}
+    for size, thumbnail in thumbnails.items():
+        urls[str(size)] = await s3_client.upload_stream(
+            thumbnail_key(object_name, size), io.BytesIO(thumbnail),
+            content_type=f"image/{thumbnail_settings.FORMAT.lower()}",
+        )
+    logger.info("Created %s thumbnails of %s", len(urls), object_name)
+    return urls
+
+
+async def delete_thumbnails(thumbnails: dict[str, str] | None):
+    for url in (thumbnails or {}).values():
+        object_name = s3_client.get_object_name(url)
+        if object_name:
+            await s3_client.delete_file(object_name)
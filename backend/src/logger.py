@@ -1,20 +1,108 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+try:
+    import orjson
+except ModuleNotFoundError:
+    orjson = None
 
 from config import settings
+from correlation import request_id
+
+
+log_settings = settings.log
+
+# file handlers of all loggers, written by the listener thread in queue mode
+_file_handlers: list[logging.Handler] = []
+_queue_handler: QueueHandler | None = None
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, so log shippers do not parse text"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": record.request_id,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode("utf-8")
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+_record_factory = logging.getLogRecordFactory()
+
+
+def _record_with_request_id(*args, **kwargs) -> logging.LogRecord:
+    # set in the logging thread, where the request (or task) context is
+    record = _record_factory(*args, **kwargs)
+    record.request_id = request_id.get()
+    return record
+
+
+logging.setLogRecordFactory(_record_with_request_id)
 
 
 def create_log_files_if_not_exist():
-    log_settings = settings.log
     if not log_settings.LOG_PATH.exists():
         log_settings.LOG_PATH.mkdir(parents=True)
 
 
+def get_log_level(logger_name: str) -> int:
+    return logging.getLevelName(log_settings.LOG_LEVELS.get(logger_name, log_settings.LOG_LEVEL).upper())
+
+
+def _start_listener():
+    """Give the handlers a new queue and a thread writing it to the files"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_file_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_after_fork():
+    # the listener thread does not survive fork (celery and gunicorn workers)
+    global _listener
+    if _listener is not None:
+        _listener = None
+        _start_listener()
+
+
+def stop_listener():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _get_queue_handler() -> QueueHandler:
+    global _queue_handler
+    if _queue_handler is None:
+        _queue_handler = QueueHandler(queue.SimpleQueue())
+        _start_listener()
+        atexit.register(stop_listener)
+        os.register_at_fork(after_in_child=_restart_listener_after_fork)
+    return _queue_handler
+
+
 def setup_logger(logger_name: str, filename: str = 'app.log'):
     logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
-
-    log_settings = settings.log
+    logger.setLevel(get_log_level(logger_name))
 
     create_log_files_if_not_exist()
 
@@ -24,16 +112,26 @@ def setup_logger(logger_name: str, filename: str = 'app.log'):
     file_handler = RotatingFileHandler(filename=log_settings.LOG_PATH / filename, maxBytes=5*1024*1024, backupCount=2)
     file_handler.setLevel(logging.DEBUG)
 
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if log_settings.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
 
-    logger.addHandler(file_handler)
+    if log_settings.LOG_QUEUE:
+        # the calling thread only puts records on the queue, the listener routes them by logger name
+        file_handler.addFilter(logging.Filter(logger_name))
+        _file_handlers.append(file_handler)
+        if _listener is not None:
+            _listener.handlers = tuple(_file_handlers)
+        logger.addHandler(_get_queue_handler())
+    else:
+        logger.addHandler(file_handler)
 
     return logger
 
 
 def clear_log_files():
-    log_settings = settings.log
     for file in log_settings.LOG_PATH.glob('*.log'):
         with open (file, 'w') as f:
             f.write('')
@@ -0,0 +1,26 @@
+from sqladmin import ModelView
+
+from mail.models import EmailOutbox
+
+
+class EmailOutboxAdmin(ModelView, model=EmailOutbox):
+    name = "Email"
+    name_plural = "Email Outbox"
+    column_list = [
+        "id",
+        "subject",
+        "recipients",
+        "status",
+        "attempts",
+        "created_at",
+        "next_attempt_at",
+    ]
+    column_labels = {
+        "id": "ID",
+        "subject": "Subject",
+        "recipients": "Recipients",
+        "status": "Status",
+        "attempts": "Attempts",
+        "created_at": "Created At",
+        "next_attempt_at": "Next Attempt At",
+    }
@@ -11,6 +11,7 @@ mail_config = ConnectionConfig(
     MAIL_FROM=mail_settings.MAIL_FROM,
     MAIL_PORT=mail_settings.MAIL_PORT,
     MAIL_SERVER=mail_settings.MAIL_SERVER,
-    MAIL_SSL_TLS=bool(mail_settings.MAIL_SSL),
+    MAIL_SSL_TLS=mail_settings.MAIL_SSL,
+    MAIL_STARTTLS=mail_settings.MAIL_STARTTLS,
     USE_CREDENTIALS=True
 )
\ No newline at end of file
@@ -0,0 +1,42 @@
+import enum
+from datetime import datetime
+
+from sqlalchemy import Index, String, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+
+from base import Base
+
+
+class EmailStatus(enum.Enum):
+    pending = "pending"
+    failed = "failed"
+
+
+class EmailOutbox(Base):
+    """Email waiting to be sent, sent emails are deleted"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # the dispatcher only looks for due pending emails
+        Index(
+            "ix_email_outbox_pending_next_attempt_at", "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    subject: Mapped[str] = mapped_column(String(length=255))
+    recipients: Mapped[list[str]] = mapped_column(ARRAY(String(320)))
+    body: Mapped[str]
+    status: Mapped[EmailStatus] = mapped_column(server_default=EmailStatus.pending.name)
+    attempts: Mapped[int] = mapped_column(server_default=text("0"))
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=text("TIMEZONE('utc', now())")
+    )
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        server_default=text("TIMEZONE('utc', now())")
+    )
+
+    def __str__(self):
+        return f"({self.id}) {self.subject} | {', '.join(self.recipients)}"
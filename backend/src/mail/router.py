@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+
+from user.models import User
+from mail.schemas import OutboxStats
+from mail.service import get_outbox_stats
+from auth.base_config import current_superuser
+
+router = APIRouter()
+
+
+@router.get("/outbox/stats", response_model=OutboxStats)
+async def read_outbox_stats(user: User = Depends(current_superuser)):
+    """Get email outbox backlog"""
+    return await get_outbox_stats()
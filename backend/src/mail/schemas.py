@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+
+
+class QueuedEmail(BaseModel):
+    id: int | None = None
+    subject: str
+    recipients: list[str] = Field(..., min_length=1)
+    body: str
+    attempts: int = 0
+
+
+class OutboxStats(BaseModel):
+    pending: int
+    due: int
+    failed: int
+    oldest_pending_age: float | None
@@ -0,0 +1,108 @@
+from email.message import EmailMessage
+
+import aiosmtplib
+from aiosmtplib import SMTPException, SMTPRecipientsRefused, SMTPResponseException
+from fastapi_mail import ConnectionConfig
+
+from mail.mail import mail_config
+from mail.schemas import QueuedEmail
+from logger import celery_logger as logger
+
+
+class BatchMailSender:
+    """
+    Sends emails over one SMTP connection that is kept open between batches
+    and reopened when the server drops it.
+
+    Recipients refused with a temporary (4xx) error are returned as separate
+    emails to be retried on their own, permanent refusals are dropped.
+    """
+
+    def __init__(self, config: ConnectionConfig):
+        self.config = config
+        self.connections = 0
+        self._smtp: aiosmtplib.SMTP | None = None
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+            timeout=self.config.TIMEOUT,
+        )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD.get_secret_value())
+        self._smtp = smtp
+        self.connections += 1
+        return smtp
+
+    def _build_message(self, email: QueuedEmail) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.config.MAIL_FROM
+        message["To"] = ", ".join(email.recipients)
+        message["Subject"] = email.subject
+        message.set_content(email.body, subtype="html")
+        return message
+
+    async def _send(self, email: QueuedEmail) -> dict[str, int]:
+        """Send email and return the codes of refused recipients"""
+        message = self._build_message(email)
+        try:
+            smtp = await self._connect()
+            errors, _ = await smtp.send_message(message, recipients=email.recipients)
+        except ConnectionError:
+            # pooled connection went stale, reconnect once
+            await self.close()
+            smtp = await self._connect()
+            errors, _ = await smtp.send_message(message, recipients=email.recipients)
+        return {recipient: response.code for recipient, response in errors.items()}
+
+    def _retry(self, email: QueuedEmail, refused: dict[str, int]) -> QueuedEmail | None:
+        temporary = [recipient for recipient, code in refused.items() if 400 <= code < 500]
+        permanent = refused.keys() - set(temporary)
+        if permanent:
+            logger.error("Email with subject %s permanently refused for %s", email.subject, sorted(permanent))
+        if not temporary:
+            return None
+        return email.model_copy(update={"recipients": temporary, "attempts": email.attempts + 1})
+
+    async def send_batch(self, emails: list[QueuedEmail]) -> list[QueuedEmail]:
+        """Send emails over the pooled connection and return the ones to retry"""
+        retry = []
+        for index, email in enumerate(emails):
+            try:
+                refused = await self._send(email)
+            except SMTPRecipientsRefused as e:
+                refused = {error.recipient: error.code for error in e.recipients}
+            except SMTPResponseException as e:
+                refused = {recipient: e.code for recipient in email.recipients}
+            except (SMTPException, ConnectionError, TimeoutError) as e:
+                # server is unreachable, keep the rest of the batch for the next flush
+                logger.error("Sending emails failed: %s", e)
+                await self.close()
+                failed = self._retry(email, {recipient: 421 for recipient in email.recipients})
+                return retry + ([failed] if failed else []) + emails[index + 1:]
+            logger.info("Email with subject %s sent to %s recipients", email.subject, len(email.recipients) - len(refused))
+            failed = self._retry(email, refused) if refused else None
+            if failed:
+                retry.append(failed)
+        return retry
+
+    async def close(self):
+        if self._smtp is None:
+            return
+        smtp, self._smtp = self._smtp, None
+        if not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except (SMTPException, ConnectionError, TimeoutError):
+            smtp.close()
+
+
+mail_sender = BatchMailSender(config=mail_config)
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import async_session_maker
+from mail.models import EmailOutbox, EmailStatus
+from mail.schemas import QueuedEmail, OutboxStats
+from mail.sender import BatchMailSender, mail_sender
+from config import settings
+from logger import celery_logger as logger
+
+
+mail_outbox_settings = settings.mail_outbox
+
+
+def add_email(session: AsyncSession, subject: str, recipients: list[str], body: str) -> EmailOutbox:
+    """Add email to the outbox within session, it is sent after the caller commits"""
+    email = EmailOutbox(subject=subject, recipients=recipients, body=body)
+    session.add(email)
+    return email
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=mail_outbox_settings.RETRY_DELAY * 2 ** max(attempts - 1, 0))
+
+
+async def _dispatch_batch(session: AsyncSession, sender: BatchMailSender, batch_size: int) -> tuple[int, int]:
+    """Claim a batch of due emails, send them and return (claimed, sent)"""
+    current_time = datetime.now(UTC).replace(tzinfo=None)
+    # rows claimed by another dispatcher are skipped, locks are held until commit
+    query = (
+        select(EmailOutbox)
+        .where(EmailOutbox.status == EmailStatus.pending, EmailOutbox.next_attempt_at <= current_time)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = (await session.execute(query)).scalars().all()
+    if not rows:
+        return 0, 0
+
+    emails = [
+        QueuedEmail(id=row.id, subject=row.subject, recipients=row.recipients, body=row.body, attempts=row.attempts)
+        for row in rows
+    ]
+    retry = {email.id: email for email in await sender.send_batch(emails)}
+
+    sent_ids = []
+    for row in rows:
+        email = retry.get(row.id)
+        if email is None:
+            sent_ids.append(row.id)
+            continue
+        row.recipients = email.recipients
+        row.attempts = email.attempts
+        if email.attempts >= mail_outbox_settings.MAX_ATTEMPTS:
+            logger.error("Email %s with subject %s to %s failed after %s attempts", row.id, row.subject, row.recipients, row.attempts)
+            row.status = EmailStatus.failed
+        else:
+            row.next_attempt_at = current_time + _retry_delay(email.attempts)
+    if sent_ids:
+        await session.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(sent_ids)))
+    await session.commit()
+    return len(rows), len(sent_ids)
+
+
+async def dispatch_outbox(
+        sender: BatchMailSender = mail_sender,
+        batch_size: int = mail_outbox_settings.BATCH_SIZE,
+        max_batches: int = mail_outbox_settings.MAX_BATCHES,
+) -> int:
+    """Send up to max_batches batches of due emails and return the number of emails sent"""
+    sent = 0
+    for _ in range(max_batches):
+        async with async_session_maker() as session:
+            claimed, batch_sent = await _dispatch_batch(session, sender, batch_size)
+        sent += batch_sent
+        if claimed < batch_size:
+            break
+    return sent
+
+
+async def get_outbox_stats() -> OutboxStats:
+    """Backlog of the outbox"""
+    current_time = datetime.now(UTC).replace(tzinfo=None)
+    async with async_session_maker() as session:
+        query = select(
+            func.count().filter(EmailOutbox.status == EmailStatus.pending),
+            func.count().filter(
+                EmailOutbox.status == EmailStatus.pending, EmailOutbox.next_attempt_at <= current_time
+            ),
+            func.count().filter(EmailOutbox.status == EmailStatus.failed),
+            func.min(EmailOutbox.created_at).filter(EmailOutbox.status == EmailStatus.pending),
+        )
+        pending, due, failed, oldest_pending = (await session.execute(query)).one()
+    return OutboxStats(
+        pending=pending,
+        due=due,
+        failed=failed,
+        oldest_pending_age=(current_time - oldest_pending).total_seconds() if oldest_pending else None,
+    )
@@ -1,25 +1,17 @@
-import asyncio
-
-from fastapi_mail import FastMail, MessageSchema
-
 from tasks_celery import celery_app
+from worker_runtime import run_async, on_shutdown
 from logger import celery_logger as logger
-from mail.mail import mail_config
+from mail.sender import mail_sender
+from mail.service import dispatch_outbox, get_outbox_stats
 
-@celery_app.task
-def send_email(subject: str, recipients: list[str], body: str):
-    logger.info(f"Sending email with subject {subject} to {recipients}")
-    message = MessageSchema(
-        subject=subject,
-        recipients=recipients,
-        body=body,
-        subtype="html"
-    )
 
-    fm = FastMail(mail_config)
+on_shutdown(mail_sender.close)
 
-    loop = asyncio.get_event_loop()
-    try:
-        loop.run_until_complete(fm.send_message(message))
-    except Exception as e:
-        logger.error(f"Error sending email with subject {subject} to {recipients}: {e}")
+
+@celery_app.task
+def dispatch_outbox_task():
+    sent = run_async(dispatch_outbox())
+    if sent:
+        stats = run_async(get_outbox_stats())
+        logger.info("Sent %s emails from outbox, backlog: %s", sent, stats.model_dump())
+    return sent
@@ -10,20 +10,33 @@ from auth.base_config import auth_backend, fastapi_users
 from auth.socials.google import google_auth_client
 from user.schemas import UserRead, UserCreate
 from logger import logger
+from correlation import RequestIdMiddleware
 from config import settings
 from db import engine
 from redis_ import redis_connection
-from sse import sse_router
+from s3_storage import s3_client
+from sse import sse_router, event_broadcaster
+from auth.password import password_hasher
+from cache import cache_router
+from sql_stats import sql_stats_router, SQLStatsMiddleware
+from metrics import metrics_router, MetricsMiddleware, mark_process_dead
+from profiler import RequestProfilerMiddleware
+from memory import start_memory_sampler, stop_memory_sampler
+from user.existence import ensure_existence_filters
 
 from vacancy.admin import VacancyAdmin
 from resume.admin import ResumeAdmin, CandidateAdmin, EducationAdmin, WorkExperienceAdmin
 from user.admin import UserAdmin, OAuthAccountAdmin
+from mail.admin import EmailOutboxAdmin
 from admin.auth_backend import AdminAuth
+from admin.profiler import ProfilerAdmin
+from admin.memory import MemoryAdmin
 
 from auth.router import router as router_auth
 from resume.router import router as router_resume
 from vacancy.router import router as router_vacancy
 from user.router import router as router_user
+from mail.router import router as router_mail
 
 
 request_limiter_settings = settings.request_limiter
@@ -39,6 +52,7 @@ async def init_admin():
     admin_views = [
         OAuthAccountAdmin, UserAdmin, VacancyAdmin,
         ResumeAdmin, CandidateAdmin, EducationAdmin, WorkExperienceAdmin,
+        EmailOutboxAdmin, ProfilerAdmin, MemoryAdmin,
     ]
     [admin.add_view(view) for view in admin_views]
 
@@ -54,14 +68,22 @@ async def close_limiter():
 async def start_up(app: FastAPI):
     logger.debug("App started")
     await init_admin()
+    await s3_client.open()
+    await ensure_existence_filters()
+    start_memory_sampler()
     if request_limiter_settings.ENABLED:
         await init_limiter()
 
 
 async def shut_down(app: FastAPI):
     logger.debug("Shutting down")
+    await event_broadcaster.close()
+    password_hasher.shutdown()
+    await s3_client.close()
+    stop_memory_sampler()
     if request_limiter_settings.ENABLED:
         await close_limiter()
+    mark_process_dead()
 
 
 @asynccontextmanager
@@ -85,8 +107,15 @@ app.add_middleware(
         "Access-Control-Allow-Headers",
         "Access-Control-Allow-Origin",
         "Authorization",
+        middleware_settings.REQUEST_ID_HEADER,
+        settings.profiler.TOKEN_HEADER,
     ],
+    expose_headers=[middleware_settings.REQUEST_ID_HEADER, "Server-Timing", settings.profiler.ID_HEADER],
 )
+app.add_middleware(RequestProfilerMiddleware)
+app.add_middleware(SQLStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
 if request_limiter_settings.ENABLED:
     dependencies = [Depends(request_limiter_settings.DEFAULT_LIMIT)]
@@ -144,11 +173,31 @@ app.include_router(
     tags=["resume"],
     dependencies=dependencies,
 )
+app.include_router(
+    router_mail,
+    prefix="/api/v1/mail",
+    tags=["mail"],
+    dependencies=dependencies,
+)
 app.include_router(
     sse_router,
     prefix="/api/v1/sse",
     tags=["sse"],
 )
+app.include_router(
+    cache_router,
+    prefix="/api/v1/cache",
+    tags=["cache"],
+)
+app.include_router(
+    sql_stats_router,
+    prefix="/api/v1/sql",
+    tags=["sql"],
+)
+app.include_router(
+    metrics_router,
+    tags=["metrics"],
+)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import gc
+import os
+import resource
+import threading
+import tracemalloc
+
+from metrics import PROCESS_RSS, GC_COUNT, GC_COLLECTIONS
+from logger import logger
+from config import settings
+
+
+memory_settings = settings.memory
+
+KEY_TYPES = ("filename", "lineno", "traceback")
+# allocations of the tracing itself and of imports are noise in the diffs
+TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def get_rss() -> int:
+    """Resident set size of the current process in bytes"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        # no procfs (macOS): peak instead of current size, in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class MemoryTracer:
+    """
+    tracemalloc snapshots of the current worker.
+
+    start() takes the baseline snapshot, diff() takes a new one and compares
+    it with the previous one (or the baseline), so repeated calls show what
+    grows between them. Tracing slows allocations down, stop() when done.
+    """
+
+    def __init__(self):
+        self.baseline: tracemalloc.Snapshot | None = None
+        self.previous: tracemalloc.Snapshot | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_tracing(self) -> bool:
+        return tracemalloc.is_tracing() and self.baseline is not None
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+
+    def start(self, frames: int):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self.baseline = self.previous = self._take_snapshot()
+        logger.warning("Tracing memory allocations of worker %s with %s frames", os.getpid(), frames)
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self.baseline = self.previous = None
+        logger.warning("Stopped tracing memory allocations of worker %s", os.getpid())
+
+    def diff(self, key_type: str, top: int, from_baseline: bool) -> dict:
+        """Top allocation differences grouped by key_type, largest growth first"""
+        with self._lock:
+            snapshot = self._take_snapshot()
+            previous = self.baseline if from_baseline else self.previous
+            self.previous = snapshot
+        stats = snapshot.compare_to(previous, key_type)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "pid": os.getpid(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "rss_bytes": get_rss(),
+            "stats": [
+                {
+                    "location": [
+                        frame.filename if key_type == "filename" else f"{frame.filename}:{frame.lineno}"
+                        for frame in stat.traceback
+                    ],
+                    "size_bytes": stat.size,
+                    "size_diff_bytes": stat.size_diff,
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:top]
+            ],
+        }
+
+
+memory_tracer = MemoryTracer()
+
+
+class MemorySampler(threading.Thread):
+    """Sets RSS and GC gauges of the current process every interval"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="memory-sampler", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        PROCESS_RSS.set(get_rss())
+        for generation, count in enumerate(gc.get_count()):
+            GC_COUNT.labels(generation=generation).set(count)
+        for generation, stats in enumerate(gc.get_stats()):
+            GC_COLLECTIONS.labels(generation=generation).set(stats["collections"])
+
+    def run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error("Sampling memory metrics failed: %s", e)
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_sampler: MemorySampler | None = None
+
+
+def start_memory_sampler():
+    """Start the sampler of the current process, once per process (workers start their own after fork)"""
+    global _sampler
+    if _sampler is None or not _sampler.is_alive():
+        _sampler = MemorySampler(memory_settings.SAMPLE_INTERVAL)
+        _sampler.start()
+
+
+def stop_memory_sampler():
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
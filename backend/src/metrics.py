@@ -0,0 +1,162 @@
+import os
+import time
+
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+metrics_router = APIRouter()
+
+# gunicorn workers and celery worker processes write their samples to files in this directory
+# (set by docker/app.sh), /metrics of any web worker merges the samples of all of them
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+# celery task header with the time the task was sent
+TASK_PUBLISHED_HEADER = "published_at"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Request handling time by route template",
+    ["method", "route", "status"],
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time waited for a connection from the database pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections checked out of the pool",
+    multiprocess_mode="livesum",
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Redis command (or pipeline) round trip time",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+SSE_CONNECTIONS = Gauge(
+    "sse_connections",
+    "Open server-sent events streams",
+    multiprocess_mode="livesum",
+)
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Celery task run time",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+CELERY_TASK_QUEUE_LAG = Histogram(
+    "celery_task_queue_lag_seconds",
+    "Time from sending a Celery task to its start",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+# set by memory.MemorySampler, per process (pid label in multiprocess mode)
+PROCESS_RSS = Gauge(
+    "worker_rss_bytes",
+    "Resident set size of the worker process",
+    multiprocess_mode="liveall",
+)
+GC_COUNT = Gauge(
+    "worker_gc_count",
+    "gc.get_count() by generation: allocations minus deallocations since the last collection (0), "
+    "collections of the younger generation since the last collection (1, 2)",
+    ["generation"],
+    multiprocess_mode="liveall",
+)
+GC_COLLECTIONS = Gauge(
+    "worker_gc_collections",
+    "Garbage collections run by generation since the process start",
+    ["generation"],
+    multiprocess_mode="liveall",
+)
+
+
+class MetricsMiddleware:
+    """Observes request durations labelled with the route template, not the path, to bound label values"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=route.path if route else "unmatched",
+                status=status,
+            ).observe(time.perf_counter() - start)
+
+
+@event.listens_for(Pool, "checkout")
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_IN_USE.inc()
+
+
+@event.listens_for(Pool, "checkin")
+def count_checkin(dbapi_connection, connection_record):
+    DB_POOL_IN_USE.dec()
+
+
+@before_task_publish.connect
+def add_published_header(headers: dict | None = None, **kwargs):
+    if headers is not None:
+        headers.setdefault(TASK_PUBLISHED_HEADER, time.time())
+
+
+@task_prerun.connect
+def observe_task_start(task=None, **kwargs):
+    published_at = (
+        getattr(task.request, TASK_PUBLISHED_HEADER, None)
+        or (task.request.headers or {}).get(TASK_PUBLISHED_HEADER)
+    )
+    if published_at is not None:
+        CELERY_TASK_QUEUE_LAG.labels(task=task.name).observe(max(time.time() - float(published_at), 0))
+    task.request.metrics_started_at = time.perf_counter()
+
+
+@task_postrun.connect
+def observe_task_end(task=None, state: str | None = None, **kwargs):
+    started_at = getattr(task.request, "metrics_started_at", None)
+    if started_at is not None:
+        CELERY_TASK_DURATION.labels(task=task.name, state=state or "UNKNOWN").observe(
+            time.perf_counter() - started_at
+        )
+
+
+def mark_process_dead():
+    """Drop live gauges of the exiting process from the multiprocess samples"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Prometheus exposition of all workers"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
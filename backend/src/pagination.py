@@ -0,0 +1,25 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+from logger import logger
+
+
+def encode_cursor(*values: int) -> str:
+    """Encode keyset values of the last returned row into an opaque cursor"""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple[int, ...]:
+    """Decode an opaque cursor back into `size` keyset values"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != size or not all(isinstance(v, int) for v in values):
+            raise ValueError
+    except ValueError:
+        logger.warning("Invalid pagination cursor %s", cursor)
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return tuple(values)
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from types import FrameType
+
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from correlation import request_id, new_request_id
+from redis_ import redis_connection
+from logger import logger
+from config import settings
+
+
+profiler_settings = settings.profiler
+admin_settings = settings.admin
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# one sampler per worker: a second one would only sample the same loop thread
+_sampler_lock = threading.Lock()
+
+
+class StackSampler(threading.Thread):
+    """
+    Sampling profiler of one thread, usually the event loop thread.
+
+    A daemon thread reads the stack of the target thread every interval,
+    so the profiled code runs unchanged and the overhead does not depend
+    on how many calls it makes. With a task, only samples taken while that
+    task runs on the loop are kept. Code run in the thread pool is not seen.
+    """
+
+    def __init__(
+        self,
+        target_id: int,
+        interval: float,
+        loop: asyncio.AbstractEventLoop | None = None,
+        task: asyncio.Task | None = None,
+    ):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.target_id = target_id
+        self.interval = interval
+        self.loop = loop
+        self.task = task
+        self.frames: list[dict] = []
+        self.samples: list[list[int]] = []
+        self._frame_ids: dict[tuple[str, str, int], int] = {}
+        self._stop_event = threading.Event()
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+
+    def _frame_id(self, frame: FrameType) -> int:
+        code = frame.f_code
+        key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append({"name": key[0], "file": key[1], "line": key[2]})
+        return frame_id
+
+    def sample(self):
+        frame = sys._current_frames().get(self.target_id)
+        if frame is None:
+            return
+        # reading the running task of another thread is racy, a wrong sample now and then is fine
+        if self.task is not None and asyncio.tasks._current_tasks.get(self.loop) is not self.task:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_id(frame))
+            frame = frame.f_back
+        stack.reverse()
+        self.samples.append(stack)
+
+    def run(self):
+        self.started_at = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+        self.stopped_at = time.perf_counter()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def speedscope(self, name: str) -> dict:
+        """Profile in the speedscope file format (https://www.speedscope.app)"""
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "betarget profiler",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.stopped_at - self.started_at,
+                "samples": self.samples,
+                "weights": [self.interval] * len(self.samples),
+            }],
+        }
+
+
+async def profile_worker(seconds: float) -> dict | None:
+    """Sample the event loop thread of the current worker for seconds, None if a profile is running"""
+    if not _sampler_lock.acquire(blocking=False):
+        return None
+    try:
+        sampler = StackSampler(threading.get_ident(), profiler_settings.INTERVAL)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+    finally:
+        _sampler_lock.release()
+    logger.info("Profiled worker %s for %s seconds: %s samples", os.getpid(), seconds, len(sampler.samples))
+    return sampler.speedscope(f"worker {os.getpid()}, {seconds} s")
+
+
+def _signature(expires_at: int) -> str:
+    message = f"profile-request:{expires_at}".encode("utf-8")
+    return hmac.new(admin_settings.SECRET_SESSION.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def create_profile_token(ttl: int) -> str:
+    """Value of the profile header accepted until ttl seconds from now"""
+    expires_at = int(time.time()) + min(ttl, profiler_settings.MAX_TOKEN_TTL)
+    return f"{expires_at}.{_signature(expires_at)}"
+
+
+def verify_profile_token(token: str) -> bool:
+    expires_at, _, signature = token.partition(".")
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(int(expires_at)))
+
+
+def profile_key(profile_id: str) -> str:
+    return f"{profiler_settings.RESULT_PREFIX}{profile_id}"
+
+
+async def get_request_profile(profile_id: str) -> bytes | None:
+    return await redis_connection.get(profile_key(profile_id))
+
+
+class RequestProfilerMiddleware:
+    """
+    Profiles a request carrying a valid profile token header.
+
+    The profile is stored in Redis under the request id, returned in the
+    profile id response header and readable in the admin panel.
+    Other requests, and profiled ones while a profile is running, pass through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = profiler_settings.TOKEN_HEADER.lower().encode("latin-1")
+        self.id_header = profiler_settings.ID_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope["headers"]).get(self.header)
+        if token is None or not verify_profile_token(token.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+        if not _sampler_lock.acquire(blocking=False):
+            logger.warning("Request %s is not profiled: a profile is already running", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = request_id.get() or new_request_id()
+
+        async def send_with_profile_id(message: Message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"].append((self.id_header, profile_id.encode("latin-1")))
+            await send(message)
+
+        sampler = StackSampler(
+            threading.get_ident(),
+            profiler_settings.INTERVAL,
+            loop=asyncio.get_running_loop(),
+            task=asyncio.current_task(),
+        )
+        try:
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_with_profile_id)
+            finally:
+                sampler.stop()
+        finally:
+            _sampler_lock.release()
+
+        profile = sampler.speedscope(f"{scope['method']} {scope['path']} ({profile_id})")
+        try:
+            await redis_connection.set(
+                profile_key(profile_id), json.dumps(profile), ex=profiler_settings.RESULT_TTL
+            )
+        except RedisError as e:
+            logger.error("Saving profile of request %s failed: %s", profile_id, e)
@@ -1,7 +1,38 @@
+from time import perf_counter
+
 import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
 
 from config import settings
+from metrics import REDIS_COMMAND_DURATION
 
 
 redis_settings = settings.redis
-redis_connection = redis.from_url(redis_settings.REDIS_URL, encoding="utf-8")
\ No newline at end of file
+
+
+class TimedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.labels(command="MULTI" if self.is_transaction else "PIPELINE").observe(
+                perf_counter() - start
+            )
+
+
+class TimedRedis(redis.Redis):
+    """Redis client that records the round trip time of every command and pipeline"""
+
+    async def execute_command(self, *args, **options):
+        start = perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(command=str(args[0]).upper()).observe(perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> TimedPipeline:
+        return TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+redis_connection = TimedRedis.from_url(redis_settings.REDIS_URL, encoding="utf-8")
\ No newline at end of file
@@ -1,12 +1,45 @@
 from sqladmin import ModelView
+from sqlalchemy.orm import InstrumentedAttribute
+from starlette.requests import Request
+
 from resume.models import (
     Resume, Candidate, Gender,
     InterestInJob, ResumeStatus, Education,
     EducationDegree, WorkExperience
 )
+from resume.service import get_resume_cache_keys
+from cache import cache
+
+class ResumeCacheMixin:
+    """
+    Invalidates cached resumes changed in the admin panel, like the resume service does.
+
+    Views set resume_link to (Resume column, attribute of their model) selecting
+    the resumes whose cached data include the changed row.
+    """
+    resume_link: tuple[InstrumentedAttribute, str]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # checked here: the hooks run after the admin change is committed
+        if not hasattr(cls, "resume_link"):
+            raise TypeError(f"{cls.__name__} must set resume_link")
+
+    def resume_filter(self, model):
+        column, attribute = self.resume_link
+        return column == getattr(model, attribute)
+
+    async def after_model_change(self, data: dict, model, is_created: bool, request: Request) -> None:
+        await cache.invalidate(*await get_resume_cache_keys(self.resume_filter(model)))
 
+    async def on_model_delete(self, model, request: Request) -> None:
+        # deleting cascades to resumes, so their keys are collected before
+        request.state.resume_cache_keys = await get_resume_cache_keys(self.resume_filter(model))
 
-class ResumeAdmin(ModelView, model=Resume):
+    async def after_model_delete(self, model, request: Request) -> None:
+        await cache.invalidate(*request.state.resume_cache_keys)
+
+class ResumeAdmin(ResumeCacheMixin, ModelView, model=Resume):
     name = "Resume"
     name_plural = "Resumes"
     column_list = [
@@ -51,7 +84,9 @@ class ResumeAdmin(ModelView, model=Resume):
         ]
     }
 
-class CandidateAdmin(ModelView, model=Candidate):
+    resume_link = (Resume.id, "id")
+
+class CandidateAdmin(ResumeCacheMixin, ModelView, model=Candidate):
     name = "Candidate"
     name_plural = "Candidates"
     column_list = [
@@ -94,7 +129,9 @@ class CandidateAdmin(ModelView, model=Candidate):
         ]
     }
 
-class EducationAdmin(ModelView, model=Education):
+    resume_link = (Resume.candidate_id, "id")
+
+class EducationAdmin(ResumeCacheMixin, ModelView, model=Education):
     name = "Education"
     name_plural = "Educations"
     column_list = [
@@ -128,7 +165,9 @@ class EducationAdmin(ModelView, model=Education):
         ]
     }
 
-class WorkExperienceAdmin(ModelView, model=WorkExperience):
+    resume_link = (Resume.id, "resume_id")
+
+class WorkExperienceAdmin(ResumeCacheMixin, ModelView, model=WorkExperience):
     name = "WorkExperience"
     name_plural = "WorkExperiences"
     column_list = [
@@ -147,3 +186,5 @@ class WorkExperienceAdmin(ModelView, model=WorkExperience):
         "end_date": "End Date",
         "description": "Description",
     }
+
+    resume_link = (Resume.id, "resume_id")
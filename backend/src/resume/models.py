@@ -1,8 +1,8 @@
 import enum
 from datetime import date
 
-from sqlalchemy import ForeignKey, String
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import ForeignKey, String, Index
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from base import Base
@@ -47,7 +47,12 @@ class EducationDegree(enum.Enum):
 # Models
 class Resume(Base):
     __tablename__ = "resume"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # keyset pagination indexes
+        Index("ix_resume_vacancy_id_id", "vacancy_id", "id"),
+        Index("ix_resume_vacancy_id_resume_status_id", "vacancy_id", "resume_status", "id"),
+        {'extend_existing': True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     candidate_id: Mapped[int] = mapped_column(ForeignKey("candidate.id", ondelete="CASCADE"), nullable=False)
@@ -61,11 +66,11 @@ class Resume(Base):
     ready_to_relocate: Mapped[bool | None]
     ready_for_business_trips: Mapped[bool | None]
 
-    # relationships
+    # relationships (collections are loaded with batched IN queries to avoid cartesian joins)
     vacancy = relationship("Vacancy", back_populates="resumes")
     candidate = relationship("Candidate", back_populates="resume", cascade="all, delete", lazy="joined")
-    educations = relationship("Education", back_populates="resume", cascade="all, delete-orphan", lazy="joined")
-    experiences = relationship("WorkExperience", back_populates="resume", cascade="all, delete-orphan", lazy="joined")
+    educations = relationship("Education", back_populates="resume", cascade="all, delete-orphan", lazy="selectin")
+    experiences = relationship("WorkExperience", back_populates="resume", cascade="all, delete-orphan", lazy="selectin")
 
     def __doc__(self):
         return f"Resume({self.id}) {self.job_title}"
@@ -134,6 +139,8 @@ class Candidate(Base):
     email: Mapped[str | None] = mapped_column(String, nullable=True)
     phone_number: Mapped[str | None] = mapped_column(String, nullable=True)
     profile_picture_url: Mapped[str | None] = mapped_column(String, nullable=True)
+    # thumbnail urls by size, made after the picture is uploaded
+    profile_picture_thumbnails: Mapped[dict[str, str] | None] = mapped_column(JSONB, nullable=True)
 
     # relationships
     resume = relationship("Resume", back_populates="candidate")
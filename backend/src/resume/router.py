@@ -1,46 +1,55 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 
 from starlette import status
 
-from auth.base_config import current_user
-from user.models import User
-from vacancy.service import get_vacancy_by_id
+from auth.base_config import current_token_user
+from auth.sessions import TokenUser
 from logger import logger
+from config import settings
 
 from .models import ResumeStatus
-from .schemas import ResumeCreate, ResumeRead, ResumeUpdate
+from .schemas import ResumeCreate, ResumeRead, ResumeUpdate, ResumePage
 from .service import (
     get_resume_by_id, get_resumes_by_user_id, 
     get_vacancy_resumes_by_stage, create_resume,
-    delete_resume_by_id, update_resume
+    delete_resume_by_id, update_resume,
+    candidate_picture_prefix, check_resume_access, confirm_candidate_picture_upload,
 )
+from s3_storage import ImageUploadRequest, ImageUpload, ImageUploadConfirm, create_image_upload
 
+pagination_settings = settings.pagination
 router = APIRouter()
 
 
-@router.get("/", response_model=list[ResumeRead])
+@router.get("/", response_model=ResumePage)
 async def get_user_resumes(
         vacancy_id: int | None = None,
         resume_stage: ResumeStatus = "in_work",
-        user: User = Depends(current_user)
+        cursor: str | None = None,
+        limit: int = Query(pagination_settings.DEFAULT_PAGE_SIZE, ge=1, le=pagination_settings.MAX_PAGE_SIZE),
+        summary: bool = False,
+        user: TokenUser = Depends(current_token_user)
 ):
     """
-    Return user resumes.
+    Return a page of user resumes.
 
     If vacancy_id is None - get ALL user resumes.
     If vacancy_id is NOT None - get vacancy_id resumes by resume_stage filter
+
+    Pass next_cursor from the previous page as cursor to get the next page.
+    If summary is True - educations and experiences are not loaded and returned as null.
     """
-    logger.info(f"Get user resumes for vacancy {vacancy_id} for user {user}")
+    logger.info("Get user resumes for vacancy %s for user %s", vacancy_id, user)
     if not vacancy_id:
-        return await get_resumes_by_user_id(user.id)
+        return await get_resumes_by_user_id(user.id, cursor, limit, summary)
 
-    return await get_vacancy_resumes_by_stage(vacancy_id, resume_stage, user.id)
+    return await get_vacancy_resumes_by_stage(vacancy_id, resume_stage, user.id, cursor, limit, summary)
 
 
 @router.get("/{resume_id}", response_model=ResumeRead)
-async def get_user_resume(resume_id: int, user: User = Depends(current_user)):
+async def get_user_resume(resume_id: int, user: TokenUser = Depends(current_token_user)):
     """Get user resume by id"""
-    logger.info(f"Get user resume with id {resume_id} for user {user}")
+    logger.info("Get user resume with id %s for user %s", resume_id, user)
     return await get_resume_by_id(resume_id, user.id)
 
 
@@ -48,23 +57,43 @@ async def get_user_resume(resume_id: int, user: User = Depends(current_user)):
 async def create_user_resume(
         new_resume: ResumeCreate,
         vacancy_id: int,
-        user: User = Depends(current_user)
+        user: TokenUser = Depends(current_token_user)
 ):
     """Creates a new resume."""
-    logger.info(f"Create new user resume for vacancy {vacancy_id} for user {user}")
-    await get_vacancy_by_id(vacancy_id, user.id)
+    logger.info("Create new user resume for vacancy %s for user %s", vacancy_id, user)
     return await create_resume(new_resume, vacancy_id, user.id)
 
 
 @router.delete("/{resume_id}")
-async def delete_resume(resume_id: int, user: User = Depends(current_user)):
+async def delete_resume(resume_id: int, user: TokenUser = Depends(current_token_user)):
     """Delete user resume by id."""
-    logger.info(f"Delete user resume with id {resume_id} for user {user}")
+    logger.info("Delete user resume with id %s for user %s", resume_id, user)
     return await delete_resume_by_id(resume_id, user.id)
 
 
 @router.put("/", response_model=ResumeRead)
-async def update_user_resume(updated_resume: ResumeUpdate, user: User = Depends(current_user)):
+async def update_user_resume(updated_resume: ResumeUpdate, user: TokenUser = Depends(current_token_user)):
     """Update resume"""
-    logger.info(f"Update user resume with id {updated_resume.id} for user {user}")
-    return await update_resume(updated_resume, user.id)
\ No newline at end of file
+    logger.info("Update user resume with id %s for user %s", updated_resume.id, user)
+    return await update_resume(updated_resume, user.id)
+
+@router.post("/{resume_id}/candidate_picture_upload", response_model=ImageUpload)
+async def create_candidate_picture_upload(
+        resume_id: int,
+        upload_request: ImageUploadRequest,
+        user: TokenUser = Depends(current_token_user)
+):
+    """Presigned url to upload candidate picture directly to S3, confirm it afterwards"""
+    await check_resume_access(resume_id, user.id)
+    return await create_image_upload(candidate_picture_prefix(resume_id), upload_request)
+
+
+@router.post("/{resume_id}/candidate_picture_upload/confirm")
+async def confirm_candidate_picture(
+        resume_id: int,
+        upload: ImageUploadConfirm,
+        user: TokenUser = Depends(current_token_user)
+) -> str:
+    """Set uploaded picture as candidate profile picture"""
+    logger.info("Confirm candidate picture upload of resume %s for user %s", resume_id, user)
+    return await confirm_candidate_picture_upload(resume_id, user.id, upload.key)
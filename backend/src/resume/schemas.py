@@ -48,6 +48,7 @@ class CandidateRead(BaseModel):
     phone_number: PhoneNumber | None
     
     profile_picture_url: AnyHttpUrl | None = Field(None)
+    profile_picture_thumbnails: dict[str, str] | None = Field(None)
 
     @field_validator("telegram", "whatsapp", "linkedin", "github", "profile_picture_url")
     def validate_urls(cls, v):
@@ -117,3 +118,8 @@ class ResumeRead(BaseModel):
 
 class ResumeUpdate(ResumeRead):
     pass
+
+
+class ResumePage(BaseModel):
+    items: list[ResumeRead]
+    next_cursor: str | None = None
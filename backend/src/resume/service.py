@@ -1,15 +1,21 @@
 from fastapi import HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload, noload
 from uuid import UUID
 
 from db import async_session_maker
+from cache import cache, make_key
 from resume.models import Resume, ResumeStatus, Candidate, Education, WorkExperience
 from resume.schemas import  (
-    ResumeRead, ResumeCreate, ResumeUpdate, 
+    ResumeRead, ResumeCreate, ResumeUpdate, ResumePage,
     CandidateCreate, CandidateRead, CandidateUpdate,
 )
 from vacancy.models import Vacancy
+from pagination import encode_cursor, decode_cursor
+from s3_storage import confirm_image_upload, replace_image
+from images.thumbnails import delete_thumbnails
+from images.tasks import create_candidate_thumbnails
 from logger import logger
 
 
@@ -19,7 +25,7 @@ async def get_candidate_by_id(candidate_id: int) -> CandidateRead:
     async with async_session_maker() as session:
         candidate = await session.get(Candidate, candidate_id)
         if not candidate:
-            logger.warning(f"Candidate with id {candidate_id} not found")
+            logger.warning("Candidate with id %s not found", candidate_id)
             raise HTTPException(status_code=404, detail="Candidate not found")
         return candidate
 
@@ -39,7 +45,7 @@ async def update_candidate(updated_candidate: CandidateUpdate) -> CandidateRead:
     async with async_session_maker() as session:
         candidate = await session.get(Candidate, updated_candidate.id)
         if not candidate:
-            logger.warning(f"Candidate with id {updated_candidate.id} not found")
+            logger.warning("Candidate with id %s not found", updated_candidate.id)
             raise HTTPException(status_code=404, detail="Candidate not found")
 
         updated_data = updated_candidate.model_dump(exclude_unset=True)
@@ -57,7 +63,7 @@ async def delete_candidate(candidate_id: int) -> dict:
     async with async_session_maker() as session:
         candidate = await session.get(Candidate, candidate_id)
         if not candidate:
-            logger.warning(f"Candidate with id {candidate_id} not found")
+            logger.warning("Candidate with id %s not found", candidate_id)
             raise HTTPException(status_code=404, detail="Candidate not found")
 
         await session.delete(candidate)
@@ -66,44 +72,92 @@ async def delete_candidate(candidate_id: int) -> dict:
 
 
 # Updated Resume CRUD methods --------------------------------
+def _resume_load_options(summary: bool = False) -> list:
+    """
+    Loading strategy for resume children.
+
+    Candidate is many-to-one and is joined to the resume row, one-to-many
+    collections are loaded with batched IN queries. Summary listings skip
+    the collections entirely.
+    """
+    if summary:
+        return [joinedload(Resume.candidate), noload(Resume.educations), noload(Resume.experiences)]
+    return [joinedload(Resume.candidate), selectinload(Resume.educations), selectinload(Resume.experiences)]
+
+
+async def _get_resume(session: AsyncSession, resume_id: int, user_id: UUID) -> Resume:
+    """Get resume model by resume_id and user_id within session"""
+    resume = await session.get(
+        Resume, resume_id, options=_resume_load_options()
+    )
+
+    if not resume:
+        logger.warning("Resume with id %s not found", resume_id)
+        raise HTTPException(status_code=404, detail="Resume not found")
+    vacancy = await session.get(Vacancy, resume.vacancy_id)
+    if vacancy.user_id != user_id:
+        logger.warning("Not enough permissions to read resume with id %s for user %s", resume_id, user_id)
+        raise HTTPException(status_code=403, detail="Not enough permissions to read this resume")
+
+    return resume
+
+
 async def get_resume_by_id(resume_id: int, user_id: UUID) -> ResumeRead:
-    """Get resume by resume_id with candidate info"""
-    async with async_session_maker() as session:
-        resume = await session.get(
-            Resume, resume_id, options=[joinedload(Resume.candidate), joinedload(Resume.educations), joinedload(Resume.experiences)]
-        )
+    """Get resume by resume_id with candidate info (cached)"""
+    async def load_resume() -> ResumeRead:
+        async with async_session_maker() as session:
+            resume = await _get_resume(session, resume_id, user_id)
+            return ResumeRead.model_validate(resume, from_attributes=True)
 
-        if not resume:
-            logger.warning(f"Resume with id {resume_id} not found")
-            raise HTTPException(status_code=404, detail="Resume not found")
-        vacancy = await session.get(Vacancy, resume.vacancy_id)
-        if vacancy.user_id != user_id:
-            logger.warning(f"Not enough permissions to read resume with id {resume_id} for user {user_id}")
-            raise HTTPException(status_code=403, detail="Not enough permissions to read this resume")
+    return await cache.get_or_load(make_key("resume", user_id, resume_id), ResumeRead, load_resume)
 
-        return resume
+
+def _paginate(query, cursor: str | None, limit: int):
+    """Apply (vacancy_id, id) keyset pagination to a resume query"""
+    if cursor:
+        vacancy_id, resume_id = decode_cursor(cursor, size=2)
+        query = query.where(tuple_(Resume.vacancy_id, Resume.id) > (vacancy_id, resume_id))
+    # fetch one extra row to know whether there is a next page
+    return query.order_by(Resume.vacancy_id, Resume.id).limit(limit + 1)
+
+
+def _build_page(resumes: list[Resume], limit: int, summary: bool = False) -> ResumePage:
+    next_cursor = None
+    if len(resumes) > limit:
+        resumes = resumes[:limit]
+        last = resumes[-1]
+        next_cursor = encode_cursor(last.vacancy_id, last.id)
+    page = ResumePage.model_validate({"items": resumes, "next_cursor": next_cursor}, from_attributes=True)
+    if summary:
+        # children were not loaded, so do not report them as empty
+        for item in page.items:
+            item.educations = None
+            item.experiences = None
+    return page
 
 
-async def get_resumes_by_user_id(user_id: UUID) -> list[ResumeRead]:
-    """Get resumes by user_id with candidate info"""
+async def get_resumes_by_user_id(user_id: UUID, cursor: str | None, limit: int, summary: bool = False) -> ResumePage:
+    """Get a page of resumes by user_id with candidate info"""
     async with async_session_maker() as session:
         query = (
             select(Resume)
             .join(Vacancy)
             .where(Vacancy.user_id == user_id)
-            .options(joinedload(Resume.candidate), joinedload(Resume.educations), joinedload(Resume.experiences))
+            .options(*_resume_load_options(summary))
         )
-        result = await session.execute(query)
-        resumes = result.unique().scalars().all()
-        return resumes
+        result = await session.execute(_paginate(query, cursor, limit))
+        resumes = result.scalars().all()
+        return _build_page(resumes, limit, summary)
 
 
-async def get_vacancy_resumes_by_stage(vacancy_id: int, resume_status: ResumeStatus, user_id: UUID):
-    """Get vacancy resumes by resume_status with candidate info"""
+async def get_vacancy_resumes_by_stage(
+    vacancy_id: int, resume_status: ResumeStatus, user_id: UUID, cursor: str | None, limit: int, summary: bool = False
+) -> ResumePage:
+    """Get a page of vacancy resumes by resume_status with candidate info"""
     async with async_session_maker() as session:
         vacancy = await session.get(Vacancy, vacancy_id)
         if not vacancy or vacancy.user_id != user_id:
-            logger.warning(f"Not enough permissions to access vacancy with id {vacancy_id} for user {user_id}")
+            logger.warning("Not enough permissions to access vacancy with id %s for user %s", vacancy_id, user_id)
             raise HTTPException(status_code=403, detail="Not enough permissions to access this vacancy")
         
         query = (
@@ -112,20 +166,24 @@ async def get_vacancy_resumes_by_stage(vacancy_id: int, resume_status: ResumeSta
                 (Resume.vacancy_id == vacancy_id) & 
                 (Resume.resume_status == resume_status)
             )
-            .options(joinedload(Resume.candidate), joinedload(Resume.educations), joinedload(Resume.experiences))
+            .options(*_resume_load_options(summary))
         )
-        result = await session.execute(query)
-        resumes = result.unique().scalars().all()
-        return resumes
+        result = await session.execute(_paginate(query, cursor, limit))
+        resumes = result.scalars().all()
+        return _build_page(resumes, limit, summary)
 
 
 async def create_resume(new_resume: ResumeCreate, vacancy_id: int, user_id: UUID) -> ResumeRead:
     """Create a new resume for current user with candidate info"""
     async with async_session_maker() as session:
         async with session.begin():
+            # the only vacancy lookup of resume creation, it also checks permissions
             vacancy = await session.get(Vacancy, vacancy_id)
-            if not vacancy or vacancy.user_id != user_id:
-                logger.warning(f"Not enough permissions to create resume for vacancy with id {vacancy_id} for user {user_id}")
+            if not vacancy:
+                logger.warning("Vacancy with id %s not found", vacancy_id)
+                raise HTTPException(status_code=404, detail="Vacancy not found")
+            if vacancy.user_id != user_id:
+                logger.warning("Not enough permissions to create resume for vacancy with id %s for user %s", vacancy_id, user_id)
                 raise HTTPException(status_code=403, detail="Not enough permissions to create resume for this vacancy")
 
             new_candidate_data = new_resume.candidate
@@ -158,9 +216,10 @@ async def create_resume(new_resume: ResumeCreate, vacancy_id: int, user_id: UUID
 async def delete_resume_by_id(resume_id: int, user_id: UUID):
     """Delete resume and potentially the candidate"""
     async with async_session_maker() as session:
-        resume = await get_resume_by_id(resume_id, user_id)
+        resume = await _get_resume(session, resume_id, user_id)
         await session.delete(resume)
         await session.commit()
+        await cache.invalidate(make_key("resume", user_id, resume_id))
         return {"success": f"Resume with id {resume.id} deleted."}
     
 
@@ -168,19 +227,26 @@ async def delete_resume_without_check(resume_id: int):
     """Delete resume without checking permissions"""
     async with async_session_maker() as session:
         resume = await session.get(Resume, resume_id)
+        vacancy = await session.get(Vacancy, resume.vacancy_id)
         await session.delete(resume)
         await session.commit()
+        await cache.invalidate(make_key("resume", vacancy.user_id, resume_id))
         return {"success": f"Resume with id {resume.id} deleted."}
 
 
 async def update_resume(updated_resume: ResumeUpdate, user_id: UUID) -> ResumeRead:
     """Update resume with updated_resume and user_id with candidate info"""
     async with async_session_maker() as session:
-        resume = await get_resume_by_id(updated_resume.id, user_id)
+        resume = await _get_resume(session, updated_resume.id, user_id)
         
         existing_educations = {edu.id: edu for edu in resume.educations}
         existing_experiences = {exp.id: exp for exp in resume.experiences}
-        updated_data = updated_resume.model_dump(exclude_unset=True)
+        old_picture_url = resume.candidate.profile_picture_url if resume.candidate else None
+        old_thumbnails = resume.candidate.profile_picture_thumbnails if resume.candidate else None
+        # thumbnails are made by the images tasks only
+        updated_data = updated_resume.model_dump(
+            exclude_unset=True, exclude={"candidate": {"profile_picture_thumbnails"}},
+        )
         for key, value in updated_data.items():
             if key == 'candidate' and isinstance(value, dict):
                 if resume.candidate:
@@ -207,8 +273,61 @@ async def update_resume(updated_resume: ResumeUpdate, user_id: UUID) -> ResumeRe
             else:
                 setattr(resume, key, value)
 
+        picture_changed = resume.candidate is not None and resume.candidate.profile_picture_url != old_picture_url
+        if picture_changed:
+            resume.candidate.profile_picture_thumbnails = None
         session.add(resume)
         await session.commit()
         await session.refresh(resume)
+        await cache.invalidate(make_key("resume", user_id, resume.id))
+        if picture_changed:
+            await delete_thumbnails(old_thumbnails)
+            if resume.candidate.profile_picture_url:
+                create_candidate_thumbnails.delay(
+                    resume.candidate.id, resume.candidate.profile_picture_url, str(user_id), resume.id,
+                )
         return resume
 
+
+async def get_resume_cache_keys(*where) -> list[str]:
+    """Cache keys of resumes matching where, for changes made outside this service (admin panel)"""
+    async with async_session_maker() as session:
+        query = select(Resume.id, Vacancy.user_id).join(Vacancy, Vacancy.id == Resume.vacancy_id).where(*where)
+        rows = (await session.execute(query)).all()
+    return [make_key("resume", user_id, resume_id) for resume_id, user_id in rows]
+
+
+def candidate_picture_prefix(resume_id: int) -> str:
+    return f"candidate-pictures/{resume_id}"
+
+
+async def check_resume_access(resume_id: int, user_id: UUID):
+    """Raise 404/403 unless resume belongs to a vacancy of user"""
+    async with async_session_maker() as session:
+        resume = await session.get(Resume, resume_id, options=[noload(Resume.candidate), noload(Resume.educations), noload(Resume.experiences)])
+        if not resume:
+            logger.warning("Resume with id %s not found", resume_id)
+            raise HTTPException(status_code=404, detail="Resume not found")
+        vacancy = await session.get(Vacancy, resume.vacancy_id)
+        if vacancy.user_id != user_id:
+            logger.warning("Not enough permissions to access resume with id %s for user %s", resume_id, user_id)
+            raise HTTPException(status_code=403, detail="Not enough permissions to access this resume")
+
+
+async def confirm_candidate_picture_upload(resume_id: int, user_id: UUID, key: str) -> str:
+    """Record candidate picture uploaded directly to S3"""
+    await check_resume_access(resume_id, user_id)
+    picture_url = await confirm_image_upload(candidate_picture_prefix(resume_id), key)
+    async with async_session_maker() as session:
+        resume = await _get_resume(session, resume_id, user_id)
+        candidate = resume.candidate
+        old_picture_url, old_thumbnails = candidate.profile_picture_url, candidate.profile_picture_thumbnails
+        candidate.profile_picture_url = picture_url
+        candidate.profile_picture_thumbnails = None
+        await session.commit()
+    await cache.invalidate(make_key("resume", user_id, resume_id))
+    await replace_image(old_picture_url, picture_url)
+    await delete_thumbnails(old_thumbnails)
+    create_candidate_thumbnails.delay(candidate.id, picture_url, str(user_id), resume_id)
+    logger.info("Candidate picture of resume %s is set to %s", resume_id, key)
+    return picture_url
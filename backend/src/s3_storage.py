@@ -1,7 +1,16 @@
+import inspect
+import io
+import uuid
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any, BinaryIO, Literal
 
+import aiofiles
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+from pydantic import BaseModel
 
 from config import settings
 from logger import logger
@@ -9,41 +18,189 @@ from logger import logger
 
 s3_settings = settings.s3
 
+
+class FileTooLargeError(Exception):
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File is larger than {max_size} bytes")
+
+
+async def _read(source: Any, size: int) -> bytes:
+    """Read from file-like object with sync or async read (UploadFile, aiofiles)"""
+    data = source.read(size)
+    if inspect.isawaitable(data):
+        return await data
+    return data
+
+
 class S3Client:
-    def __init__(self, access_key: str, secret_key: str, bucket_name: str, end_point_url: str):
+    def __init__(
+            self, access_key: str, secret_key: str, bucket_name: str, end_point_url: str,
+            part_size: int = s3_settings.S3_PART_SIZE, max_upload_size: int = s3_settings.S3_MAX_UPLOAD_SIZE,
+            max_pool_connections: int = s3_settings.S3_MAX_POOL_CONNECTIONS,
+    ):
         self.bucket_name = bucket_name
         self.access_key = access_key
         self.secret_key = secret_key
         self.end_point_url = end_point_url
+        self.part_size = part_size
+        self.max_upload_size = max_upload_size
+        self.max_pool_connections = max_pool_connections
         self.session = get_session()
+        self._client_context = None
+        self._client = None
 
-    @asynccontextmanager
-    async def get_client(self):
-        async with self.session.create_client(
+    def _create_client(self):
+        return self.session.create_client(
             's3',
             endpoint_url=self.end_point_url,
             aws_access_key_id=self.access_key,
             aws_secret_access_key=self.secret_key,
-        ) as client:
+            config=AioConfig(max_pool_connections=self.max_pool_connections),
+        )
+
+    async def open(self):
+        """Open the client shared by all calls, keeping its connections alive between them"""
+        if self._client is None:
+            self._client_context = self._create_client()
+            self._client = await self._client_context.__aenter__()
+            logger.info("S3 client opened with pool of %s connections", self.max_pool_connections)
+
+    async def close(self):
+        if self._client is not None:
+            client_context, self._client_context, self._client = self._client_context, None, None
+            await client_context.__aexit__(None, None, None)
+            logger.info("S3 client closed")
+
+    @asynccontextmanager
+    async def get_client(self):
+        if self._client is not None:
+            yield self._client
+            return
+        # not opened (scripts, tests without lifespan): a client for this call only
+        async with self._create_client() as client:
             yield client
 
-    async def upload_file(self, object_name: str, file_path: Path | None = None, file_data: bytes | None = None) -> str | None:
+    async def _read_part(self, source: Any, prefix: bytes = b"") -> bytes:
+        """Read up to part_size bytes, the only body data held in memory"""
+        part = bytearray(prefix)
+        while len(part) < self.part_size:
+            chunk = await _read(source, self.part_size - len(part))
+            if not chunk:
+                break
+            part += chunk
+        return bytes(part)
+
+    async def upload_stream(
+            self, object_name: str, source: Any,
+            content_type: str | None = None, max_size: int | None = None,
+    ) -> str | None:
+        """
+        Upload file-like object part by part, holding at most one part in memory.
+
+        Bodies that fit into one part are sent with a single PUT, larger ones with multipart upload.
+        Raises FileTooLargeError as soon as more than max_size bytes are read.
+        """
+        max_size = max_size if max_size is not None else self.max_upload_size
+        extra_args = {"ContentType": content_type} if content_type else {}
+        part = await self._read_part(source)
+        if not part:
+            logger.warning("File %s can't be uploaded", object_name)
+            return None
+        if len(part) > max_size:
+            raise FileTooLargeError(max_size)
+        # one byte ahead tells a body of exactly one part from a longer one
+        next_byte = await _read(source, 1) if len(part) == self.part_size else b""
+
         async with self.get_client() as client:
-            if file_path:
-                with open(file_path, 'rb') as f:
-                    file_data = f.read()
-            if file_data:
-                await client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=object_name,
-                    Body=file_data
-                )
-                url = s3_settings.S3_PUBLIC_DOMAIN + '/' + object_name
-                logger.info(f"File {object_name} is uploaded")
-                return url
+            if not next_byte:
+                await client.put_object(Bucket=self.bucket_name, Key=object_name, Body=part, **extra_args)
             else:
-                logger.warning(f"File {object_name} can't be uploaded")
-                return None
+                await self._upload_multipart(client, object_name, source, part, next_byte, max_size, extra_args)
+        logger.info("File %s is uploaded", object_name)
+        return self.get_url(object_name)
+
+    async def _upload_multipart(
+            self, client, object_name: str, source: Any,
+            part: bytes, next_byte: bytes, max_size: int, extra_args: dict,
+    ):
+        upload = await client.create_multipart_upload(Bucket=self.bucket_name, Key=object_name, **extra_args)
+        upload_id = upload["UploadId"]
+        parts = []
+        uploaded_size = 0
+        try:
+            while part:
+                uploaded_size += len(part)
+                if uploaded_size > max_size:
+                    raise FileTooLargeError(max_size)
+                response = await client.upload_part(
+                    Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                    PartNumber=len(parts) + 1, Body=part,
+                )
+                parts.append({"PartNumber": len(parts) + 1, "ETag": response["ETag"]})
+                part = await self._read_part(source, prefix=next_byte)
+                next_byte = b""
+            await client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            await client.abort_multipart_upload(Bucket=self.bucket_name, Key=object_name, UploadId=upload_id)
+            raise
+
+    async def upload_file(self, object_name: str, file_path: Path | None = None, file_data: bytes | BinaryIO | None = None) -> str | None:
+        if file_path:
+            async with aiofiles.open(file_path, 'rb') as f:
+                return await self.upload_stream(object_name, f)
+        if isinstance(file_data, (bytes, bytearray)):
+            file_data = io.BytesIO(file_data)
+        if file_data:
+            return await self.upload_stream(object_name, file_data)
+        logger.warning("File %s can't be uploaded", object_name)
+        return None
+
+    def get_url(self, object_name: str) -> str:
+        return s3_settings.S3_PUBLIC_DOMAIN + '/' + object_name
+
+    def get_object_name(self, url: str) -> str | None:
+        """Object name of public url of this storage, None for external urls"""
+        if not url.startswith(s3_settings.S3_PUBLIC_DOMAIN + '/'):
+            return None
+        return url[len(s3_settings.S3_PUBLIC_DOMAIN) + 1:]
+
+    async def generate_presigned_post(
+            self, object_name: str, content_type: str, max_size: int, expires_in: int,
+    ) -> tuple[str, dict[str, str]]:
+        """Url and form fields for a browser POST upload, S3 itself rejects other types and sizes"""
+        async with self.get_client() as client:
+            presigned = await client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=object_name,
+                Fields={"Content-Type": content_type},
+                Conditions=[{"Content-Type": content_type}, ["content-length-range", 1, max_size]],
+                ExpiresIn=expires_in,
+            )
+        return presigned["url"], presigned["fields"]
+
+    async def generate_presigned_put(self, object_name: str, content_type: str, expires_in: int) -> str:
+        """Url for a PUT upload, its size can only be checked after the upload"""
+        async with self.get_client() as client:
+            return await client.generate_presigned_url(
+                "put_object",
+                Params={"Bucket": self.bucket_name, "Key": object_name, "ContentType": content_type},
+                ExpiresIn=expires_in,
+            )
+
+    async def head_file(self, object_name: str) -> dict | None:
+        """Size and content type of stored file, None if there is no such file"""
+        async with self.get_client() as client:
+            try:
+                response = await client.head_object(Bucket=self.bucket_name, Key=object_name)
+            except ClientError as e:
+                if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                    return None
+                raise
+        return {"size": response["ContentLength"], "content_type": response.get("ContentType")}
 
     async def download_file(self, object_name: str) -> bytes:
         async with self.get_client() as client:
@@ -52,7 +209,7 @@ class S3Client:
                 Key=object_name
             )
             file_data = await response['Body'].read()
-            logger.info(f"File {object_name} is downloaded")
+            logger.info("File %s is downloaded", object_name)
             return file_data
         
     async def delete_file(self, object_name: str):
@@ -61,7 +218,7 @@ class S3Client:
                 Bucket=self.bucket_name,
                 Key=object_name
             )
-            logger.info(f"File {object_name} is deleted")
+            logger.info("File %s is deleted", object_name)
 
 
 s3_client = S3Client(
@@ -70,3 +227,64 @@ s3_client = S3Client(
     bucket_name=s3_settings.S3_BUCKET_NAME,
     end_point_url=s3_settings.S3_ENDPOINT_URL
 )
+
+
+class ImageUploadRequest(BaseModel):
+    content_type: str
+    method: Literal["post", "put"] = "post"
+
+
+class ImageUpload(BaseModel):
+    """Where and how the client uploads the file itself, then it confirms the key"""
+    method: Literal["post", "put"]
+    url: str
+    key: str
+    fields: dict[str, str] = {}
+    headers: dict[str, str] = {}
+    expires_in: int
+
+
+class ImageUploadConfirm(BaseModel):
+    key: str
+
+
+async def create_image_upload(prefix: str, upload_request: ImageUploadRequest) -> ImageUpload:
+    """Presign direct upload of image to a new key under prefix"""
+    extension = s3_settings.S3_IMAGE_CONTENT_TYPES.get(upload_request.content_type)
+    if extension is None:
+        raise HTTPException(status_code=415, detail=f"Unsupported image type {upload_request.content_type}")
+    key = f"{prefix}/{uuid.uuid4().hex}{extension}"
+    expires_in = s3_settings.S3_PRESIGNED_EXPIRATION
+    if upload_request.method == "post":
+        url, fields = await s3_client.generate_presigned_post(
+            key, upload_request.content_type, s3_client.max_upload_size, expires_in,
+        )
+        return ImageUpload(method="post", url=url, key=key, fields=fields, expires_in=expires_in)
+    url = await s3_client.generate_presigned_put(key, upload_request.content_type, expires_in)
+    return ImageUpload(
+        method="put", url=url, key=key, headers={"Content-Type": upload_request.content_type}, expires_in=expires_in,
+    )
+
+
+async def confirm_image_upload(prefix: str, key: str) -> str:
+    """Check image uploaded to key under prefix and return its public url"""
+    if not key.startswith(prefix + "/") or "/" in key[len(prefix) + 1:]:
+        raise HTTPException(status_code=400, detail="Key does not belong to this upload")
+    stored_file = await s3_client.head_file(key)
+    if stored_file is None:
+        raise HTTPException(status_code=404, detail="Uploaded file not found")
+    # PUT uploads are not limited by S3, so they are checked here
+    if stored_file["size"] > s3_client.max_upload_size:
+        await s3_client.delete_file(key)
+        raise HTTPException(status_code=413, detail=f"File is larger than {s3_client.max_upload_size} bytes")
+    if stored_file["content_type"] not in s3_settings.S3_IMAGE_CONTENT_TYPES:
+        await s3_client.delete_file(key)
+        raise HTTPException(status_code=415, detail=f"Unsupported image type {stored_file['content_type']}")
+    return s3_client.get_url(key)
+
+
+async def replace_image(old_url: str | None, new_url: str):
+    """Delete previous image of this storage after it was replaced by new_url"""
+    old_key = s3_client.get_object_name(old_url) if old_url else None
+    if old_key and old_url != new_url:
+        await s3_client.delete_file(old_key)
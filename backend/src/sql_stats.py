@@ -0,0 +1,132 @@
+import re
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth.base_config import current_superuser
+from config import settings
+from logger import db_query_logger as logger
+
+
+sql_stats_settings = settings.sql_stats
+sql_stats_router = APIRouter()
+
+PARAMETER_PATTERN = re.compile(r"\$\d+|\?|%\(\w+\)s")
+PARAMETER_LIST_PATTERN = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape: the same for any parameter values and IN list lengths"""
+    statement = PARAMETER_PATTERN.sub("?", statement)
+    statement = PARAMETER_LIST_PATTERN.sub("(?)", statement)
+    return WHITESPACE_PATTERN.sub(" ", statement).strip()
+
+
+@dataclass
+class RequestSQLStats:
+    statements: int = 0
+    duration: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, duration: float):
+        self.statements += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+
+@dataclass
+class RouteSQLStats:
+    requests: int = 0
+    statements: int = 0
+    duration: float = 0.0
+    max_statements: int = 0
+    repeated_statement_requests: int = 0
+
+    def add(self, stats: RequestSQLStats, repeated: bool):
+        self.requests += 1
+        self.statements += stats.statements
+        self.duration += stats.duration
+        self.max_statements = max(self.max_statements, stats.statements)
+        self.repeated_statement_requests += repeated
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "requests": self.requests,
+            "statements": self.statements,
+            "avg_statements": round(self.statements / self.requests, 2),
+            "max_statements": self.max_statements,
+            "avg_db_time_ms": round(self.duration / self.requests * 1000, 3),
+            "repeated_statement_requests": self.repeated_statement_requests,
+        }
+
+
+request_sql_stats: ContextVar[RequestSQLStats | None] = ContextVar("request_sql_stats", default=None)
+# per route of the current worker
+route_sql_stats: dict[str, RouteSQLStats] = {}
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_statement(conn, cursor, statement: str, parameters, context, executemany: bool) -> None:
+    """Count statement for the current request, if any, timed from db.before_cursor_execute"""
+    stats = request_sql_stats.get()
+    if stats is not None:
+        stats.record(statement, perf_counter() - context._query_start_time)
+
+
+class SQLStatsMiddleware:
+    """
+    Accounts the SQL statements of every request.
+
+    Adds them to the Server-Timing header, aggregates them by route and warns
+    when one request runs the same statement shape too many times (N+1).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSQLStats()
+        token = request_sql_stats.set(stats)
+
+        async def send_with_server_timing(message: Message):
+            if message["type"] == "http.response.start":
+                # streaming responses may query later, the header has the statements run so far
+                server_timing = f'db;dur={stats.duration * 1000:.2f};desc="{stats.statements} statements"'
+                message.setdefault("headers", [])
+                message["headers"].append((b"server-timing", server_timing.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            request_sql_stats.reset(token)
+            route = scope.get("route")
+            self.account(f"{scope['method']} {route.path if route else 'unmatched'}", stats)
+
+    @staticmethod
+    def account(route: str, stats: RequestSQLStats):
+        repeated = [
+            (statement, count) for statement, count in stats.fingerprints.items()
+            if count > sql_stats_settings.REPEATED_STATEMENT_THRESHOLD
+        ]
+        for statement, count in repeated:
+            logger.warning("Possible N+1 in %s: statement run %s times: %s", route, count, statement[:500])
+        if len(route_sql_stats) < sql_stats_settings.MAX_ROUTES or route in route_sql_stats:
+            route_sql_stats.setdefault(route, RouteSQLStats()).add(stats, bool(repeated))
+
+
+@sql_stats_router.get("/stats")
+async def get_sql_stats(user=Depends(current_superuser)) -> dict[str, dict[str, float]]:
+    """SQL statements per route of the current worker"""
+    return {route: stats.as_dict() for route, stats in route_sql_stats.items()}
@@ -1,10 +1,18 @@
 import asyncio
 import json
+import re
+from collections import deque
+from uuid import UUID
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Header, Request
 from fastapi.responses import StreamingResponse
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
+from auth.base_config import current_token_user
+from auth.sessions import TokenUser
 from logger import sse_logger as logger
+from metrics import SSE_CONNECTIONS
 from redis_ import redis_connection
 from config import settings
 
@@ -12,6 +20,112 @@ from config import settings
 sse_settings = settings.sse
 sse_router = APIRouter()
 
+EVENT_ID_PATTERN = re.compile(r"^\d+-\d+$")
+
+
+def stream_key(user_id: UUID) -> str:
+    return f"{sse_settings.STREAM_PREFIX}{user_id}"
+
+
+def _parse_event_id(event_id: str) -> tuple[int, int]:
+    ms, seq = event_id.split("-")
+    return int(ms), int(seq)
+
+
+async def publish_event(user_id: UUID, event: str, data: str) -> str:
+    """Append event to the bounded stream of user"""
+    key = stream_key(user_id)
+    async with redis_connection.pipeline(transaction=False) as pipe:
+        pipe.xadd(key, {"event": event, "data": data}, maxlen=sse_settings.STREAM_MAXLEN, approximate=True)
+        pipe.expire(key, sse_settings.STREAM_TTL)
+        event_id, _ = await pipe.execute()
+    return event_id.decode("utf-8")
+
+
+class EventBroadcaster:
+    """
+    Reads the streams of connected users with a single blocking XREAD per
+    worker process and fans entries out to the queues of their connections.
+
+    The reader runs while at least one client is connected.
+    A slow client whose queue is full loses its oldest events.
+    """
+
+    def __init__(self, redis: Redis, queue_size: int):
+        self.redis = redis
+        self.queue_size = queue_size
+        self._queues: dict[str, set[asyncio.Queue]] = {}
+        self._cursors: dict[str, str] = {}
+        self._listener: asyncio.Task | None = None
+
+    async def subscribe(self, user_id: UUID) -> asyncio.Queue:
+        key = stream_key(user_id)
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if key not in self._cursors:
+            latest = await self.redis.xrevrange(key, count=1)
+            self._cursors.setdefault(key, latest[0][0].decode("utf-8") if latest else "0-0")
+        self._queues.setdefault(key, set()).add(queue)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, user_id: UUID, queue: asyncio.Queue):
+        key = stream_key(user_id)
+        queues = self._queues.get(key, set())
+        queues.discard(queue)
+        if not queues:
+            self._queues.pop(key, None)
+            self._cursors.pop(key, None)
+
+    async def replay(self, user_id: UUID, last_event_id: str) -> list[tuple[str, dict]]:
+        """Events of user stored after last_event_id"""
+        entries = await self.redis.xrange(stream_key(user_id), min=f"({last_event_id}", max="+")
+        return [self._decode(entry) for entry in entries]
+
+    @staticmethod
+    def _decode(entry) -> tuple[str, dict]:
+        entry_id, fields = entry
+        return entry_id.decode("utf-8"), {k.decode("utf-8"): v.decode("utf-8") for k, v in fields.items()}
+
+    def _broadcast(self, key: str, event: tuple[str, dict]):
+        for queue in self._queues.get(key, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _listen(self):
+        while self._cursors:
+            try:
+                response = await self.redis.xread(
+                    dict(self._cursors), count=self.queue_size, block=sse_settings.STREAM_BLOCK_MS
+                )
+            except RedisError as e:
+                logger.error("Reading event streams failed: %s", e)
+                await asyncio.sleep(sse_settings.RECONNECT_DELAY)
+                continue
+            for key, entries in response or []:
+                key = key.decode("utf-8")
+                for entry in entries:
+                    event = self._decode(entry)
+                    if key in self._cursors:
+                        self._cursors[key] = event[0]
+                    self._broadcast(key, event)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+event_broadcaster = EventBroadcaster(
+    redis=redis_connection,
+    queue_size=sse_settings.CLIENT_QUEUE_SIZE,
+)
+
 
 async def __handle_vacancy_expiration_event(event_info: dict):
     data = event_info.get('data')
@@ -24,23 +138,53 @@ async def __handle_vacancy_expiration_event(event_info: dict):
 
 
 @sse_router.get("/events")
-async def event_stream(request: Request) -> StreamingResponse:
+async def event_stream(
+    request: Request,
+    last_event_id: str | None = Header(None, alias="Last-Event-ID"),
+    user: TokenUser = Depends(current_token_user),
+) -> StreamingResponse:
+    """
+    Stream events of current user.
+
+    Reconnecting clients send Last-Event-ID and get the events they missed.
+    """
+    if last_event_id and not EVENT_ID_PATTERN.match(last_event_id):
+        logger.warning("Invalid Last-Event-ID %s from user %s", last_event_id, user.id)
+        last_event_id = None
+
     async def event_generator(request: Request):
         client_ip = request.client.host
-        logger.info(f"Client IP: {client_ip} is connected")
-        while True:
-            event_info = await redis_connection.get("event_vacancy_expiration")
-            if event_info:
-                event_info = json.loads(event_info.decode('utf-8'))
-                logger.info(f"SSE Event: {event_info}")
+        logger.info("Client IP: %s of user %s is connected", client_ip, user.id)
+        # subscribe before replaying, so nothing is lost in between; duplicates are skipped by id
+        queue = await event_broadcaster.subscribe(user.id)
+        SSE_CONNECTIONS.inc()
+        try:
+            backlog = deque(await event_broadcaster.replay(user.id, last_event_id) if last_event_id else [])
+            last_sent = _parse_event_id(last_event_id) if last_event_id else (0, 0)
+            while not await request.is_disconnected():
+                if backlog:
+                    event_id, event_info = backlog.popleft()
+                else:
+                    try:
+                        event_id, event_info = await asyncio.wait_for(
+                            queue.get(), timeout=sse_settings.HEARTBEAT_INTERVAL
+                        )
+                    except asyncio.TimeoutError:
+                        yield "data: keep-alive\n\n"
+                        continue
+                if _parse_event_id(event_id) <= last_sent:
+                    continue
+                last_sent = _parse_event_id(event_id)
+                logger.info("SSE Event %s: %s", event_id, event_info)
                 match event_info.get('event'):
                     case 'vacancy_expiration':
-                       yield await __handle_vacancy_expiration_event(event_info)
+                        yield f"id: {event_id}\n" + await __handle_vacancy_expiration_event(event_info)
                     case _:
                         logger.info("No vacancies to expire")
                         yield "data: keep-alive\n\n"
-                await asyncio.sleep(sse_settings.EVENT_LOOP_RETRY_TIME)
-            else:
-                yield "data: keep-alive\n\n"
+        finally:
+            SSE_CONNECTIONS.dec()
+            event_broadcaster.unsubscribe(user.id, queue)
+            logger.info("Client IP: %s of user %s is disconnected", client_ip, user.id)
 
-    return StreamingResponse(event_generator(request), media_type="text/event-stream")
\ No newline at end of file
+    return StreamingResponse(event_generator(request), media_type="text/event-stream")
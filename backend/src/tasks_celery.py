@@ -1,5 +1,4 @@
 from celery import Celery
-from celery.schedules import crontab
 
 from config import settings
 
@@ -19,21 +18,29 @@ celery_app.conf.update(
 )
 
 # Ensure tasks are discovered
-celery_app.autodiscover_tasks(['mail', 'vacancy', 'auth'])
+celery_app.autodiscover_tasks(['mail', 'vacancy', 'user', 'images'])
 
-# Calls tasks at 00:00 every day
+# Pops due vacancies off the expiration schedule and repairs it, sends emails from
+# the outbox and rebuilds the user existence filters without deleted and renamed users
 celery_app.conf.beat_schedule = {
     "check_expired_vacancies": {
         "task": "vacancy.tasks.check_expired_vacancies",
-        "schedule": crontab(minute=0, hour=0),
+        "schedule": float(settings.vacancy.EXPIRATION_CHECK_INTERVAL),
+    },
+    "reconcile_expiration_schedule": {
+        "task": "vacancy.tasks.reconcile_expiration_schedule",
+        "schedule": float(settings.vacancy.EXPIRATION_RECONCILE_INTERVAL),
+    },
+    "dispatch_email_outbox": {
+        "task": "mail.tasks.dispatch_outbox_task",
+        "schedule": float(settings.mail_outbox.DISPATCH_INTERVAL),
+    },
+    "rebuild_user_existence_filters": {
+        "task": "user.tasks.rebuild_existence_filters_task",
+        "schedule": float(settings.user_existence.REBUILD_INTERVAL),
     },
 }
 
 if settings.test.IS_TESTING:
     # Calls task every 15 seconds (only for test)
-    celery_app.conf.beat_schedule = {
-        "check_expired_vacancies": {
-            "task": "vacancy.tasks.check_expired_vacancies",
-            "schedule": 15.0,
-        },
-    }
\ No newline at end of file
+    celery_app.conf.beat_schedule["check_expired_vacancies"]["schedule"] = 15.0
\ No newline at end of file
@@ -1,7 +1,18 @@
 import pytest
+from fastapi.security import OAuth2PasswordRequestForm
+from fastapi_users import exceptions
+from fastapi_users.db import SQLAlchemyUserDatabase
 from httpx import AsyncClient
 
+from sqlalchemy import select, delete
+
 from conftest import test_urls
+from db import async_session_maker
+from auth.manager import UserManager
+from auth.password import password_helper
+from user.models import User, OAuthAccount
+from mail.models import EmailOutbox
+from auth.tokens import verification_tokens, reset_password_tokens
 from user.service import get_user_by_username, delete_user
 
 
@@ -23,6 +34,19 @@ async def test_register_successfully(async_client: AsyncClient, user_data: dict)
     await delete_user(db_user)
 
 
+@pytest.mark.asyncio
+async def test_register_adds_emails_to_outbox(async_client: AsyncClient, user_data: dict):
+    await async_client.post(url=test_urls["auth"].get("register"), json=user_data)
+    db_user = await get_user_by_username(username=user_data.get("username"))
+    async with async_session_maker() as session:
+        query = select(EmailOutbox.subject).where(EmailOutbox.recipients.any(user_data.get("email")))
+        subjects = (await session.execute(query)).scalars().all()
+        await session.execute(delete(EmailOutbox).where(EmailOutbox.recipients.any(user_data.get("email"))))
+        await session.commit()
+    assert "You successfully registered to our service" in subjects and "Verify your account" in subjects
+    await delete_user(db_user)
+
+
 @pytest.mark.asyncio
 async def test_register_already(async_client: AsyncClient, user_data: dict):
     _ = await async_client.post(url=test_urls["auth"].get("register"), json=user_data)
@@ -115,6 +139,25 @@ async def test_logout_successfully(auth_async_client: AsyncClient, user_data: di
     await delete_user(await get_user_by_username(username=user_data.get("username")))
 
 
+@pytest.mark.asyncio
+async def test_token_revoked_after_logout(auth_async_client: AsyncClient, user_data: dict):
+    cookies = dict(auth_async_client.cookies)
+    await auth_async_client.post(url=test_urls["auth"].get("logout"))
+    auth_async_client.cookies = cookies
+    response = await auth_async_client.get(url=test_urls["vacancy"].get("get_all_vacancies"))
+    assert response.status_code == 401
+    await delete_user(await get_user_by_username(username=user_data.get("username")))
+
+
+@pytest.mark.asyncio
+async def test_logout_all_successfully(auth_async_client: AsyncClient, user_data: dict):
+    response = await auth_async_client.post(url=test_urls["auth"].get("logout_all"))
+    assert response.status_code == 200
+    response = await auth_async_client.get(url=test_urls["user"].get("my_data"))
+    assert response.status_code == 401
+    await delete_user(await get_user_by_username(username=user_data.get("username")))
+
+
 @pytest.mark.asyncio
 async def test_forgot_password_successfully(async_client: AsyncClient, user_data: dict):
     forgot_password_response = await async_client.post(
@@ -144,7 +187,7 @@ async def test_reset_password_successfully(auth_async_client: AsyncClient, user_
     reset_password_response = await auth_async_client.post(
         url=test_urls["auth"].get("reset_password"),
         json={
-            "token": user.reset_password_token,
+            "token": await reset_password_tokens.get_token(user.id),
             "password": "newpassword",
         },
     )
@@ -162,7 +205,7 @@ async def test_reset_password_successfully(auth_async_client: AsyncClient, user_
     reset_password_response = await auth_async_client.post(
         url=test_urls["auth"].get("reset_password"),
         json={
-            "token": user.reset_password_token,
+            "token": await reset_password_tokens.get_token(user.id),
             "password": user_data.get("password"),
         },
     )
@@ -205,10 +248,10 @@ async def test_verify_account_successfully(auth_async_client: AsyncClient, user_
     user = await get_user_by_username(username=user_data.get("username"))
     response = await auth_async_client.get(
         url=test_urls["auth"].get("verify_account"),
-        params={"token": user.verification_token},
+        params={"token": await verification_tokens.get_token(user.id)},
     )
     user = await get_user_by_username(username=user_data.get("username"))
-    assert response.status_code == 302 and user.is_verified and user.verification_token is None
+    assert response.status_code == 302 and user.is_verified and await verification_tokens.get_token(user.id) is None
 
 
 @pytest.mark.asyncio
@@ -226,4 +269,42 @@ async def test_verify_account_unsuccessfully(auth_async_client: AsyncClient):
         url=test_urls["auth"].get("verify_account"),
         params={},
     )
-    assert response.status_code == 422
\ No newline at end of file
+    assert response.status_code == 422
+
+
+def credentials(username: str, password: str) -> OAuth2PasswordRequestForm:
+    return OAuth2PasswordRequestForm(username=username, password=password)
+
+
+@pytest.mark.asyncio
+async def test_manager_authenticate(auth_async_client: AsyncClient, user_data: dict):
+    async with async_session_maker() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User, OAuthAccount), password_helper)
+        user = await manager.authenticate(credentials(user_data.get("email"), user_data.get("password")))
+        assert user is not None and user.username == user_data.get("username")
+        assert await manager.authenticate(credentials(user_data.get("email"), "wrong_password")) is None
+        assert await manager.authenticate(credentials("nobody@ex.com", user_data.get("password"))) is None
+
+
+@pytest.mark.asyncio
+async def test_manager_reset_password(auth_async_client: AsyncClient, user_data: dict):
+    async with async_session_maker() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User, OAuthAccount), password_helper)
+        user = await manager.get_by_email(user_data.get("email"))
+
+        with pytest.raises(exceptions.InvalidResetPasswordToken):
+            await manager.reset_password("wrong_token", "newpassword")
+
+        await manager.forgot_password(user)
+        token = await reset_password_tokens.get_token(user.id)
+        await manager.reset_password(token, "newpassword")
+        assert await manager.authenticate(credentials(user_data.get("email"), "newpassword")) is not None
+        assert await manager.authenticate(credentials(user_data.get("email"), user_data.get("password"))) is None
+
+        # the token is consumed by the reset
+        with pytest.raises(exceptions.InvalidResetPasswordToken):
+            await manager.reset_password(token, user_data.get("password"))
+
+        await manager.forgot_password(user)
+        await manager.reset_password(await reset_password_tokens.get_token(user.id), user_data.get("password"))
+        assert await manager.authenticate(credentials(user_data.get("email"), user_data.get("password"))) is not None
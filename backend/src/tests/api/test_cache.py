@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+
+from cache import cache
+from redis_ import redis_connection
+
+
+class Payload(BaseModel):
+    value: int
+
+
+async def test_load_invalidated_while_loading_not_stored():
+    key = "test:race"
+    await cache.invalidate(key)
+
+    async def load_and_change():
+        stale = Payload(value=1)
+        # the row is changed and invalidated before the stale value is stored
+        await cache.invalidate(key)
+        return stale
+
+    assert (await cache.get_or_load(key, Payload, load_and_change)).value == 1
+    assert await redis_connection.get(cache.prefix + key) is None
+    assert cache.local.get(key) is None
+
+    async def load():
+        return Payload(value=2)
+
+    assert (await cache.get_or_load(key, Payload, load)).value == 2
+    assert await redis_connection.get(cache.prefix + key) is not None
+    await cache.invalidate(key)
+    assert await redis_connection.get(cache.prefix + key) is None
@@ -36,19 +36,60 @@ async def test_get_all_resumes(auth_async_client: AsyncClient, vacancy_data: dic
     for _ in range(5):
         await auth_async_client.post(test_urls["resume"].get("create_user_resume"), params={"vacancy_id": vacancy_data.get("id")} , json=resume_data)
     response = await auth_async_client.get(test_urls["resume"].get("get_all_resumes"))
-    all_data = response.json()
+    all_data = response.json().get("items")
     assert response.status_code == 200 and all([res.get("id") and res.get("job_title") == "string" for res in all_data]) and len(all_data) >= 5
     for res in all_data:
         await delete_resume_without_check(res.get("id"))
     await delete_vacancy_without_checking(vacancy_data.get("id"))
 
 
+@pytest.mark.asyncio
+async def test_get_all_resumes_paginated(auth_async_client: AsyncClient, vacancy_data: dict, resume_data: dict):
+    vacancy_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
+    vacancy_data = vacancy_response.json()
+    for _ in range(5):
+        await auth_async_client.post(test_urls["resume"].get("create_user_resume"), params={"vacancy_id": vacancy_data.get("id")}, json=resume_data)
+    pages, params = [], {"limit": 2}
+    while True:
+        response = await auth_async_client.get(test_urls["resume"].get("get_all_resumes"), params=params)
+        assert response.status_code == 200 and len(response.json().get("items")) <= 2
+        pages.append(response.json().get("items"))
+        if not response.json().get("next_cursor"):
+            break
+        params["cursor"] = response.json().get("next_cursor")
+    resume_ids = [res.get("id") for page in pages for res in page]
+    assert len(pages) >= 3 and len(resume_ids) == len(set(resume_ids)) and resume_ids == sorted(resume_ids)
+    for resume_id in resume_ids:
+        await delete_resume_without_check(resume_id)
+    await delete_vacancy_without_checking(vacancy_data.get("id"))
+
+
+@pytest.mark.asyncio
+async def test_get_all_resumes_summary(auth_async_client: AsyncClient, vacancy_data: dict, resume_data: dict):
+    vacancy_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
+    vacancy_data = vacancy_response.json()
+    create_response = await auth_async_client.post(test_urls["resume"].get("create_user_resume"), params={"vacancy_id": vacancy_data.get("id")}, json=resume_data)
+    created_data = create_response.json()
+    response = await auth_async_client.get(test_urls["resume"].get("get_all_resumes"), params={"summary": True})
+    summary_data = response.json().get("items")
+    assert response.status_code == 200 and len(created_data.get("educations")) == 1 and len(created_data.get("experiences")) == 1
+    assert all([res.get("candidate") and res.get("educations") is None and res.get("experiences") is None for res in summary_data])
+    await delete_resume_without_check(created_data.get("id"))
+    await delete_vacancy_without_checking(vacancy_data.get("id"))
+
+
+@pytest.mark.asyncio
+async def test_get_all_resumes_invalid_cursor(auth_async_client: AsyncClient):
+    response = await auth_async_client.get(test_urls["resume"].get("get_all_resumes"), params={"cursor": "invalid"})
+    assert response.status_code == 400
+
+
 @pytest.mark.asyncio
 async def test_get_all_resumes_empty(auth_async_client: AsyncClient, vacancy_data: dict):
     response_vacancy = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
     vacancy_data = response_vacancy.json()
     response = await auth_async_client.get(test_urls["resume"].get("get_all_resumes"))
-    assert response.status_code == 200 and len(response.json()) == 0
+    assert response.status_code == 200 and len(response.json().get("items")) == 0 and response.json().get("next_cursor") is None
     await delete_vacancy_without_checking(vacancy_data.get("id"))
 
 
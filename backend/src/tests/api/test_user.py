@@ -4,6 +4,8 @@ import pytest
 from httpx import AsyncClient
 
 from conftest import test_urls
+from redis_ import redis_connection
+from user.existence import rebuild_existence_filters
 from s3_storage import s3_client
 from logger import test_logger as logger
 from config import PROJECT_PATH, settings
@@ -51,6 +53,34 @@ async def test_update_profile_image_success(auth_async_client: AsyncClient):
     
 
 
+@pytest.mark.asyncio
+async def test_profile_image_direct_upload(auth_async_client: AsyncClient):
+    response = await auth_async_client.post(
+        test_urls["user"].get("profile_image_upload"), json={"content_type": "image/png", "method": "put"}
+    )
+    upload = response.json()
+    assert response.status_code == 200 and upload["key"].endswith(".png")
+
+    with open(PROJECT_PATH / "src" / "tests" / "img" / "test_image.png", "rb") as image_file:
+        async with AsyncClient() as s3_http_client:
+            s3_response = await s3_http_client.put(upload["url"], content=image_file.read(), headers=upload["headers"])
+    assert s3_response.status_code == 200
+
+    response = await auth_async_client.post(
+        test_urls["user"].get("confirm_profile_image_upload"), json={"key": upload["key"]}
+    )
+    assert response.status_code == 200 and response.json() == settings.s3.S3_PUBLIC_DOMAIN + "/" + upload["key"]
+    await s3_client.delete_file(upload["key"])
+
+
+@pytest.mark.asyncio
+async def test_profile_image_upload_unsupported_type(auth_async_client: AsyncClient):
+    response = await auth_async_client.post(
+        test_urls["user"].get("profile_image_upload"), json={"content_type": "text/html"}
+    )
+    assert response.status_code == 415
+
+
 @pytest.mark.asyncio
 async def test_update_profile_image_unsuccessful(auth_async_client: AsyncClient):
     response = await auth_async_client.put(test_urls["user"].get("update_profile_image"), files={})
@@ -96,6 +126,16 @@ async def test_check_user_exists_both(auth_async_client: AsyncClient):
     assert "is_exists_by_username" in response.json()
 
 
+@pytest.mark.asyncio
+async def test_check_user_exists_registered(auth_async_client: AsyncClient, user_data: dict):
+    params = {"email": user_data.get("email"), "username": user_data.get("username")}
+    response = await auth_async_client.get(url=test_urls["user"].get("get_user_exists"), params=params)
+    assert response.json() == {"is_exists_by_email": True, "is_exists_by_username": True}
+    params = {"email": "free_" + user_data.get("email"), "username": "free_" + user_data.get("username")}
+    response = await auth_async_client.get(url=test_urls["user"].get("get_user_exists"), params=params)
+    assert response.json() == {"is_exists_by_email": False, "is_exists_by_username": False}
+
+
 @pytest.mark.asyncio
 async def test_get_my_data_successfull(auth_async_client: AsyncClient, user_data):
     response = await auth_async_client.get(url=test_urls["user"].get("my_data"))
@@ -103,7 +143,28 @@ async def test_get_my_data_successfull(auth_async_client: AsyncClient, user_data
     assert response.status_code == 200 and response_data.get("username") == user_data.get("username")
 
 
+@pytest.mark.asyncio
+async def test_get_my_data_after_update(auth_async_client: AsyncClient, user_data: dict):
+    await auth_async_client.get(url=test_urls["user"].get("my_data"))
+    new_data = {**user_data, "telegram": "https://t.me/new_name"}
+    del new_data["profile_picture_url"]
+    await auth_async_client.put(url=test_urls["user"].get("update"), json=new_data)
+    response = await auth_async_client.get(url=test_urls["user"].get("my_data"))
+    assert response.status_code == 200 and response.json().get("telegram") == "https://t.me/new_name"
+
+
 @pytest.mark.asyncio
 async def test_get_my_data_unsuccessfull(async_client: AsyncClient):
     response = await async_client.get(url=test_urls["user"].get("my_data"))
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_existence_filters_rebuilt_once_at_a_time():
+    lock = redis_connection.lock(f"{settings.user_existence.KEY_PREFIX}rebuild", timeout=10)
+    assert await lock.acquire()
+    try:
+        assert await rebuild_existence_filters() is None
+    finally:
+        await lock.release()
+    assert await rebuild_existence_filters() >= 0
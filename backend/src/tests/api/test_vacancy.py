@@ -2,7 +2,11 @@ import pytest
 from httpx import AsyncClient
 
 from conftest import test_urls
-from vacancy.service import delete_vacancy_without_checking
+from vacancy.service import delete_vacancy_without_checking, schedule_pending_expirations
+from vacancy.scheduler import claim_due_expirations, ack_expirations, PROCESSING_KEY
+from resume.service import delete_resume_without_check
+from redis_ import redis_connection
+from config import settings
 
 
 @pytest.mark.asyncio
@@ -75,12 +79,109 @@ async def test_get_user_vacancy(auth_async_client: AsyncClient, vacancy_data: di
     await delete_vacancy_without_checking(created_data.get("id"))
 
 
+@pytest.mark.asyncio
+async def test_get_user_vacancy_after_update(auth_async_client: AsyncClient, vacancy_data: dict):
+    create_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
+    created_data = create_response.json()
+    vacancy_url = test_urls["vacancy"].get("get_user_vacancy") + f"{created_data.get('id')}"
+    await auth_async_client.get(vacancy_url)
+    await auth_async_client.put(test_urls["vacancy"].get("update_user_vacancy"), json={**created_data, "job_title": "new string"})
+    response = await auth_async_client.get(vacancy_url)
+    assert response.status_code == 200 and response.json().get("job_title") == "new string"
+    await delete_vacancy_without_checking(created_data.get("id"))
+    response = await auth_async_client.get(vacancy_url)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_vacancy_expiration_scheduled(auth_async_client: AsyncClient, vacancy_data: dict):
+    create_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
+    created_data = create_response.json()
+    assert created_data.get("id") not in [vacancy.get("id") for vacancy in await claim_due_expirations()]
+    expired_data = {**created_data, "expiration_date": "2000-01-01T00:00:00"}
+    await auth_async_client.put(test_urls["vacancy"].get("update_user_vacancy"), json=expired_data)
+    claimed = [vacancy for vacancy in await claim_due_expirations() if vacancy.get("id") == created_data.get("id")]
+    assert claimed
+    assert created_data.get("id") not in [vacancy.get("id") for vacancy in await claim_due_expirations()]
+    await ack_expirations(claimed)
+    await delete_vacancy_without_checking(created_data.get("id"))
+
+
+@pytest.mark.asyncio
+async def test_unacknowledged_expiration_requeued(auth_async_client: AsyncClient, vacancy_data: dict):
+    create_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
+    created_data = create_response.json()
+    expired_data = {**created_data, "expiration_date": "2000-01-01T00:00:00"}
+    await auth_async_client.put(test_urls["vacancy"].get("update_user_vacancy"), json=expired_data)
+    claimed = [vacancy for vacancy in await claim_due_expirations() if vacancy.get("id") == created_data.get("id")]
+    assert claimed
+    # the claiming worker died: its claim times out and the next claim takes the vacancy again
+    member = f"{claimed[0]['user_id']}:{created_data.get('id')}"
+    await redis_connection.zadd(PROCESSING_KEY, {member: 0})
+    assert created_data.get("id") in [vacancy.get("id") for vacancy in await claim_due_expirations()]
+    await delete_vacancy_without_checking(created_data.get("id"))
+    assert await redis_connection.zscore(PROCESSING_KEY, member) is None
+
+
+@pytest.mark.asyncio
+async def test_lost_expiration_reconciled(auth_async_client: AsyncClient, vacancy_data: dict):
+    create_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
+    created_data = create_response.json()
+    # the schedule write was lost, e.g. Redis was down when the vacancy was created
+    member = f"{auth_async_client.cookies.get('user_id')}:{created_data.get('id')}"
+    await redis_connection.zrem(settings.vacancy.EXPIRATION_SCHEDULE_KEY, member)
+    assert await schedule_pending_expirations() >= 1
+    assert await redis_connection.zscore(settings.vacancy.EXPIRATION_SCHEDULE_KEY, member) is not None
+    await delete_vacancy_without_checking(created_data.get("id"))
+
+
 @pytest.mark.asyncio
 async def test_get_user_vacancy_unauthorized(async_client: AsyncClient, vacancy_data: dict):
     response = await async_client.get(test_urls["vacancy"].get("get_user_vacancy") + "1")
     assert response.status_code == 401
 
 
+@pytest.mark.asyncio
+async def test_get_user_vacancy_stats(auth_async_client: AsyncClient, vacancy_data: dict, resume_data: dict):
+    create_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
+    created_data = create_response.json()
+    resume_ids = []
+    for stage, rating in [("in_work", 4), ("in_work", 6), ("offer", None)]:
+        resume_response = await auth_async_client.post(
+            test_urls["resume"].get("create_user_resume"),
+            params={"vacancy_id": created_data.get("id")},
+            json={**resume_data, "resume_status": stage, "rating": rating},
+        )
+        resume_ids.append(resume_response.json().get("id"))
+    response = await auth_async_client.get(test_urls["vacancy"].get("get_user_vacancy") + f"{created_data.get('id')}/stats")
+    stats = response.json()
+    assert response.status_code == 200 and stats.get("total") == 3 and stats.get("average_rating") == 5
+    assert stats.get("stage_counts").get("in_work") == 2 and stats.get("stage_counts").get("offer") == 1 and stats.get("stage_counts").get("rejected") == 0
+    assert sum(bucket.get("count") for bucket in stats.get("salary_histogram")) == 3
+    for resume_id in resume_ids:
+        await delete_resume_without_check(resume_id)
+    await delete_vacancy_without_checking(created_data.get("id"))
+
+
+@pytest.mark.asyncio
+async def test_get_user_vacancies_stats(auth_async_client: AsyncClient, vacancy_data: dict):
+    vacancy_ids = []
+    for _ in range(2):
+        create_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
+        vacancy_ids.append(create_response.json().get("id"))
+    response = await auth_async_client.get(test_urls["vacancy"].get("get_vacancies_stats"), params={"vacancy_id": vacancy_ids})
+    assert response.status_code == 200 and [stats.get("vacancy_id") for stats in response.json()] == sorted(vacancy_ids)
+    assert all(stats.get("total") == 0 and stats.get("average_rating") is None for stats in response.json())
+    for vacancy_id in vacancy_ids:
+        await delete_vacancy_without_checking(vacancy_id)
+
+
+@pytest.mark.asyncio
+async def test_get_user_vacancy_stats_not_found(auth_async_client: AsyncClient):
+    response = await auth_async_client.get(test_urls["vacancy"].get("get_vacancies_stats"), params={"vacancy_id": [0]})
+    assert response.status_code == 404
+
+
 @pytest.mark.asyncio
 async def test_delete_vacancy_successfully(auth_async_client: AsyncClient, vacancy_data: dict):
     create_response = await auth_async_client.post(test_urls["vacancy"].get("create_user_vacancy"), json=vacancy_data)
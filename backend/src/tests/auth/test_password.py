@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from auth.password import AsyncPasswordHasher, password_helper
+
+
+@pytest.fixture
+def hasher():
+    hasher = AsyncPasswordHasher(password_helper, max_workers=1, max_pending=1)
+    yield hasher
+    hasher.shutdown()
+
+
+async def test_hash_and_verify_in_pool(hasher: AsyncPasswordHasher):
+    hashed = await hasher.hash("SuperUsername1233")
+    assert hashed.startswith("$argon2")
+    assert hasher.pending == 0
+
+    verified, updated_hash = await hasher.verify_and_update("SuperUsername1233", hashed)
+    assert verified
+    assert updated_hash is None
+    # the hash of the pool is the one the helper of the app verifies
+    assert password_helper.verify_and_update("SuperUsername1233", hashed)[0]
+
+    verified, _ = await hasher.verify_and_update("wrong_password", hashed)
+    assert not verified
+
+
+async def test_full_queue_rejected(hasher: AsyncPasswordHasher):
+    first = asyncio.create_task(hasher.hash("SuperUsername1233"))
+    await asyncio.sleep(0)
+    assert hasher.pending == 1
+
+    with pytest.raises(HTTPException) as e:
+        await hasher.hash("SuperUsername1233")
+    assert e.value.status_code == 503
+    assert "Retry-After" in e.value.headers
+
+    # the rejected call does not take a slot, the queued one still completes
+    assert (await first).startswith("$argon2")
+    assert hasher.pending == 0
@@ -15,6 +15,7 @@ test_urls = {
         "register": "/auth/register",
         "login": "/auth/login",
         "logout": "/auth/logout",
+        "logout_all": "/auth/logout_all",
         "forgot_password": "/auth/forgot-password",
         "reset_password": "/auth/reset-password",
         "ask_verification": "/auth/ask_verification",
@@ -24,6 +25,8 @@ test_urls = {
         "update": f"{api_prefix}/user/",
         "delete": f"{api_prefix}/user/",
         "update_profile_image": f"{api_prefix}/user/update_profile_image",
+        "profile_image_upload": f"{api_prefix}/user/profile_image_upload",
+        "confirm_profile_image_upload": f"{api_prefix}/user/profile_image_upload/confirm",
         "get_user_exists": f"{api_prefix}/user/is_exists",
         "my_data": f"{api_prefix}/user/my_data",
     },
@@ -33,6 +36,7 @@ test_urls = {
         "update_user_vacancy": f"{api_prefix}/vacancy/",
         "get_user_vacancy": f"{api_prefix}/vacancy/",
         "delete_user_vacancy": f"{api_prefix}/vacancy/",
+        "get_vacancies_stats": f"{api_prefix}/vacancy/stats",
     },
     "resume": {
         "get_all_resumes": f"{api_prefix}/resume/",
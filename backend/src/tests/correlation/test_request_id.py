@@ -0,0 +1,54 @@
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from correlation import RequestIdMiddleware, request_id, add_request_id_header
+from logger import JsonFormatter
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/")
+    async def read_request_id():
+        headers = {}
+        add_request_id_header(headers=headers)
+        return {"request_id": request_id.get(), "task_headers": headers}
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_request_id_generated_and_sent_to_tasks():
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+        response = await client.get("/")
+    data = response.json()
+    assert data["request_id"] and response.headers["X-Request-ID"] == data["request_id"]
+    assert data["task_headers"] == {"request_id": data["request_id"]}
+    assert request_id.get() is None
+
+
+@pytest.mark.asyncio
+async def test_request_id_taken_from_header():
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+        response = await client.get("/", headers={"X-Request-ID": "abc-123"})
+        invalid_response = await client.get("/", headers={"X-Request-ID": "bad id\n"})
+    assert response.json()["request_id"] == "abc-123"
+    assert invalid_response.json()["request_id"] != "bad id\n"
+
+
+def test_json_formatter():
+    token = request_id.set("abc-123")
+    try:
+        record = logging.getLogger("TestLogger").makeRecord(
+            "TestLogger", logging.INFO, __file__, 1, "User %s \"quoted\"", ("(1) name",), None,
+        )
+    finally:
+        request_id.reset(token)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == 'User (1) name "quoted"'
+    assert entry["request_id"] == "abc-123" and entry["level"] == "INFO" and entry["logger"] == "TestLogger"
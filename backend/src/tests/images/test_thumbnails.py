@@ -0,0 +1,28 @@
+import io
+
+from PIL import Image
+
+from images.thumbnails import make_thumbnails, thumbnail_key
+from config import PROJECT_PATH
+
+
+def test_make_thumbnails():
+    data = (PROJECT_PATH / "src" / "tests" / "img" / "test_image.png").read_bytes()
+    thumbnails = make_thumbnails(data, sizes=[48, 96], image_format="WEBP", quality=80)
+    assert set(thumbnails) == {48, 96}
+    for size, thumbnail in thumbnails.items():
+        with Image.open(io.BytesIO(thumbnail)) as image:
+            assert image.format == "WEBP" and image.size == (size, size)
+        assert len(thumbnail) < len(data)
+
+
+def test_make_thumbnails_of_wide_jpeg():
+    buffer = io.BytesIO()
+    Image.new("RGB", (4000, 1000), "red").save(buffer, format="JPEG")
+    thumbnails = make_thumbnails(buffer.getvalue(), sizes=[48], image_format="JPEG", quality=80)
+    with Image.open(io.BytesIO(thumbnails[48])) as image:
+        assert image.format == "JPEG" and image.size == (48, 48)
+
+
+def test_thumbnail_key():
+    assert thumbnail_key("profile-pictures/name/photo.png", 48) == "profile-pictures/name/thumbnails/photo_48.webp"
@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import db  # noqa: F401, registers the query logging listeners
+import logger as logger_module
+from logger import db_query_logger, log_settings, setup_logger
+
+
+class RecordList(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.mark.skipif(not log_settings.LOG_QUEUE, reason="queue mode is off")
+def test_records_written_by_listener_to_own_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_settings, "LOG_PATH", tmp_path)
+    queued = setup_logger("QueueTestLogger", filename="queue.log")
+    setup_logger("OtherQueueTestLogger", filename="other.log")
+    # the calling thread only enqueues
+    assert queued.handlers == [logger_module._queue_handler]
+
+    file_handler = next(
+        handler for handler in logger_module._file_handlers if handler.baseFilename == str(tmp_path / "queue.log")
+    )
+    writing_threads = []
+    handle = file_handler.handle
+
+    def handle_in_thread(record: logging.LogRecord):
+        writing_threads.append(threading.current_thread())
+        return handle(record)
+
+    monkeypatch.setattr(file_handler, "handle", handle_in_thread)
+
+    queued.warning("queued record")
+    wait_for(lambda: "queued record" in (tmp_path / "queue.log").read_text())
+    assert writing_threads and threading.current_thread() not in writing_threads
+    assert "queued record" not in (tmp_path / "other.log").read_text()
+
+
+def test_level_by_logger_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_settings, "LOG_PATH", tmp_path)
+    monkeypatch.setattr(log_settings, "LOG_LEVEL", "DEBUG")
+    monkeypatch.setattr(log_settings, "LOG_LEVELS", {"QuietTestLogger": "warning"})
+    assert not setup_logger("QuietTestLogger", filename="quiet.log").isEnabledFor(logging.INFO)
+    assert setup_logger("LoudTestLogger", filename="loud.log").isEnabledFor(logging.DEBUG)
+
+
+@pytest.mark.parametrize("sample_rate, logged", [(0.0, False), (1.0, True)])
+def test_query_log_sample_rate(monkeypatch, sample_rate: float, logged: bool):
+    monkeypatch.setattr(log_settings, "DB_QUERY_LOG_SAMPLE_RATE", sample_rate)
+    records = RecordList()
+    previous_level = db_query_logger.level
+    db_query_logger.setLevel(logging.DEBUG)
+    db_query_logger.addHandler(records)
+    try:
+        with create_engine("sqlite://").connect() as conn:
+            conn.execute(text("SELECT 1"))
+    finally:
+        db_query_logger.removeHandler(records)
+        db_query_logger.setLevel(previous_level)
+    assert any("SELECT 1" in record.getMessage() for record in records.records) is logged
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+from fastapi_mail import ConnectionConfig
+
+from smtp_stub import SMTPStub
+from mail.schemas import QueuedEmail
+from mail.sender import BatchMailSender
+from logger import test_logger
+
+
+def make_sender(stub: SMTPStub) -> BatchMailSender:
+    config = ConnectionConfig(
+        MAIL_USERNAME="",
+        MAIL_PASSWORD="",
+        MAIL_FROM="sender@example.com",
+        MAIL_PORT=stub.port,
+        MAIL_SERVER="127.0.0.1",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+    )
+    return BatchMailSender(config=config)
+
+
+def make_emails(count: int, recipients: list[str] | None = None) -> list[QueuedEmail]:
+    return [
+        QueuedEmail(subject=f"subject {i}", recipients=recipients or [f"user{i}@example.com"], body="body")
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_batch_over_one_connection():
+    async with SMTPStub() as stub:
+        sender = make_sender(stub)
+        assert await sender.send_batch(make_emails(20)) == []
+        assert await sender.send_batch(make_emails(20)) == []
+        await sender.close()
+    assert len(stub.messages) == 40 and stub.connections == 1
+
+
+@pytest.mark.asyncio
+async def test_send_batch_reconnects_after_drop():
+    async with SMTPStub() as stub:
+        sender = make_sender(stub)
+        await sender.send_batch(make_emails(1))
+        stub.drop_connections()
+        assert await sender.send_batch(make_emails(1)) == []
+        await sender.close()
+    assert len(stub.messages) == 2 and stub.connections == 2
+
+
+@pytest.mark.asyncio
+async def test_send_batch_retries_refused_recipients():
+    recipients = ["ok@example.com", "busy@example.com", "gone@example.com"]
+    async with SMTPStub(reject={"gone@example.com"}, defer={"busy@example.com": 1}) as stub:
+        sender = make_sender(stub)
+        retry = await sender.send_batch(make_emails(1, recipients))
+        assert [(email.recipients, email.attempts) for email in retry] == [(["busy@example.com"], 1)]
+        assert await sender.send_batch(retry) == []
+        await sender.close()
+    assert [message[1] for message in stub.messages] == [["ok@example.com"], ["busy@example.com"]]
+
+
+@pytest.mark.asyncio
+async def test_send_batch_keeps_email_id_on_retry():
+    async with SMTPStub(defer={"busy@example.com": 2}) as stub:
+        sender = make_sender(stub)
+        email = QueuedEmail(id=7, subject="subject", recipients=["busy@example.com"], body="body")
+        retry = await sender.send_batch([email])
+        retry = await sender.send_batch(retry)
+        assert [(email.id, email.attempts) for email in retry] == [(7, 2)]
+        await sender.close()
+    assert stub.messages == []
+
+
+@pytest.mark.asyncio
+async def test_send_batch_server_unavailable():
+    async with SMTPStub() as stub:
+        sender = make_sender(stub)
+    emails = make_emails(3)
+    retry = await sender.send_batch(emails)
+    assert [email.subject for email in retry] == [email.subject for email in emails]
+    assert retry[0].attempts == 1 and retry[1].attempts == 0
+
+
+@pytest.mark.asyncio
+async def test_send_batch_throughput():
+    count = 500
+    async with SMTPStub() as stub:
+        sender = make_sender(stub)
+        start = time.perf_counter()
+        await sender.send_batch(make_emails(count))
+        elapsed = time.perf_counter() - start
+        await sender.close()
+    test_logger.info(f"Sent {count} emails in {elapsed:.3f}s ({count / elapsed:.0f} emails/s) over {stub.connections} connection")
+    assert len(stub.messages) == count and stub.connections == 1
@@ -0,0 +1,34 @@
+from prometheus_client import REGISTRY
+
+from memory import MemorySampler, memory_tracer
+
+_retained = []
+
+
+def allocate():
+    _retained.extend(bytearray(1024) for _ in range(1000))
+
+
+def test_diff_shows_growth_by_line():
+    memory_tracer.start(frames=1)
+    try:
+        allocate()
+        diff = memory_tracer.diff("lineno", top=5, from_baseline=False)
+        assert diff["stats"][0]["location"][0].endswith(f"test_memory.py:{allocate.__code__.co_firstlineno + 1}")
+        assert diff["stats"][0]["size_diff_bytes"] >= 1000 * 1024
+        assert len(diff["stats"]) <= 5
+
+        # nothing grew since the previous diff, the growth is still there from the baseline
+        assert memory_tracer.diff("lineno", top=1, from_baseline=False)["stats"][0]["size_diff_bytes"] < 1000 * 1024
+        assert memory_tracer.diff("lineno", top=1, from_baseline=True)["stats"][0]["size_diff_bytes"] >= 1000 * 1024
+    finally:
+        memory_tracer.stop()
+        _retained.clear()
+    assert not memory_tracer.is_tracing
+
+
+def test_sampler_sets_gauges():
+    MemorySampler(interval=60).sample()
+    assert REGISTRY.get_sample_value("worker_rss_bytes") > 0
+    assert REGISTRY.get_sample_value("worker_gc_count", {"generation": "0"}) is not None
+    assert REGISTRY.get_sample_value("worker_gc_collections", {"generation": "0"}) is not None
@@ -0,0 +1,53 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from db import TimedQueuePool
+from metrics import MetricsMiddleware, metrics_router
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_requests_observed_by_route_template():
+    labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+        await client.get("/items/1")
+        await client.get("/items/2")
+        response = await client.get("/metrics")
+
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_pool_checkouts_observed(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=TimedQueuePool)
+    waits = sample("db_pool_checkout_wait_seconds_count")
+    in_use = sample("db_pool_connections_in_use")
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        assert sample("db_pool_connections_in_use") == in_use + 1
+    await engine.dispose()
+
+    assert sample("db_pool_checkout_wait_seconds_count") == waits + 1
+    assert sample("db_pool_connections_in_use") == in_use
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from profiler import (
+    RequestProfilerMiddleware, create_profile_token, profile_worker, profiler_settings, verify_profile_token,
+)
+
+
+def busy_loop(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def frame_names(profile: dict) -> set[str]:
+    frames = profile["shared"]["frames"]
+    return {frames[i]["name"] for sample in profile["profiles"][0]["samples"] for i in sample}
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestProfilerMiddleware)
+
+    @app.get("/busy")
+    async def busy():
+        busy_loop(0.1)
+        return {}
+
+    return app
+
+
+def test_profile_token_verified():
+    token = create_profile_token(60)
+    expires_at, signature = token.split(".")
+    assert verify_profile_token(token)
+    assert not verify_profile_token(f"{int(expires_at) + 1}.{signature}")
+    assert not verify_profile_token(create_profile_token(-1))
+    assert not verify_profile_token("invalid")
+
+
+@pytest.mark.asyncio
+async def test_worker_profile_samples_event_loop():
+    async def work():
+        await asyncio.sleep(0.01)
+        busy_loop(0.2)
+
+    task = asyncio.create_task(work())
+    profile = await profile_worker(0.3)
+    await task
+
+    assert profile["profiles"][0]["type"] == "sampled"
+    assert profile["profiles"][0]["samples"]
+    assert "busy_loop" in frame_names(profile)
+
+
+@pytest.mark.asyncio
+async def test_request_profiled_with_token():
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+        profiled = await client.get("/busy", headers={profiler_settings.TOKEN_HEADER: create_profile_token(60)})
+        not_profiled = await client.get("/busy", headers={profiler_settings.TOKEN_HEADER: "1.invalid"})
+
+    assert profiled.headers[profiler_settings.ID_HEADER]
+    assert profiler_settings.ID_HEADER not in not_profiled.headers
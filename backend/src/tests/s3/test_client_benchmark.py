@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+from s3_stub import S3Stub
+from s3_storage import S3Client
+from logger import test_logger
+
+
+ROUNDS = 50
+
+
+def make_client(stub: S3Stub) -> S3Client:
+    return S3Client(
+        access_key="key",
+        secret_key="secret",
+        bucket_name=stub.bucket,
+        end_point_url=stub.endpoint_url,
+        max_pool_connections=4,
+    )
+
+
+async def replace_pictures(client: S3Client, concurrency: int = 1):
+    """Replacing a profile picture is a delete and an upload"""
+    async def replace(i: int):
+        await client.delete_file(f"picture-{i - 1}")
+        await client.upload_file(f"picture-{i}", file_data=b"x" * 1024)
+
+    for start in range(0, ROUNDS, concurrency):
+        await asyncio.gather(*(replace(i) for i in range(start, start + concurrency)))
+
+
+@pytest.mark.asyncio
+async def test_client_per_call_vs_long_lived_client():
+    async with S3Stub("bucket") as stub:
+        started = time.perf_counter()
+        await replace_pictures(make_client(stub))
+        per_call_time, per_call_connections = time.perf_counter() - started, len(stub.connections)
+
+        stub.connections.clear()
+        client = make_client(stub)
+        await client.open()
+        try:
+            started = time.perf_counter()
+            await replace_pictures(client)
+            long_lived_time, long_lived_connections = time.perf_counter() - started, len(stub.connections)
+
+            stub.connections.clear()
+            await replace_pictures(client, concurrency=10)
+            concurrent_connections = len(stub.connections)
+        finally:
+            await client.close()
+
+    test_logger.info(
+        f"{ROUNDS} picture replacements: client per call {per_call_time:.3f}s, {per_call_connections} connections; "
+        f"long-lived client {long_lived_time:.3f}s, {long_lived_connections} connections"
+    )
+    assert per_call_connections == 2 * ROUNDS
+    assert long_lived_connections == 1
+    assert concurrent_connections <= client.max_pool_connections
@@ -0,0 +1,48 @@
+import aiohttp
+import pytest
+
+from s3_stub import S3Stub
+from s3_storage import S3Client
+
+
+def make_client(stub: S3Stub) -> S3Client:
+    return S3Client(
+        access_key="key",
+        secret_key="secret",
+        bucket_name=stub.bucket,
+        end_point_url=stub.endpoint_url,
+    )
+
+
+async def post_form(url: str, fields: dict[str, str], data: bytes) -> int:
+    form = aiohttp.FormData(fields)
+    form.add_field("file", data, filename="picture.png")
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=form) as response:
+            return response.status
+
+
+@pytest.mark.asyncio
+async def test_presigned_post_upload():
+    async with S3Stub("bucket") as stub:
+        client = make_client(stub)
+        url, fields = await client.generate_presigned_post("pictures/a.png", "image/png", max_size=100, expires_in=60)
+        assert await post_form(url, fields, b"x" * 10) == 204
+        assert await client.head_file("pictures/a.png") == {"size": 10, "content_type": "image/png"}
+
+        url, fields = await client.generate_presigned_post("pictures/b.png", "image/png", max_size=100, expires_in=60)
+        assert await post_form(url, fields, b"x" * 101) == 400
+        assert await client.head_file("pictures/b.png") is None
+        assert not any(name == "put_object" for name, _ in stub.requests)
+
+
+@pytest.mark.asyncio
+async def test_presigned_put_upload():
+    async with S3Stub("bucket") as stub:
+        client = make_client(stub)
+        url = await client.generate_presigned_put("pictures/c.jpg", "image/jpeg", expires_in=60)
+        async with aiohttp.ClientSession() as session:
+            async with session.put(url, data=b"y" * 20, headers={"Content-Type": "image/jpeg"}) as response:
+                assert response.status == 200
+        assert await client.head_file("pictures/c.jpg") == {"size": 20, "content_type": "image/jpeg"}
+        assert client.get_object_name(client.get_url("pictures/c.jpg")) == "pictures/c.jpg"
@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+from s3_stub import S3Stub
+from s3_storage import S3Client, FileTooLargeError
+
+
+PART_SIZE = 1024
+
+
+class ChunkedReader:
+    """Async reader returning short chunks like UploadFile reading from a socket"""
+
+    def __init__(self, data: bytes, chunk_size: int = 100):
+        self.stream = io.BytesIO(data)
+        self.chunk_size = chunk_size
+        self.max_read = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        self.max_read = max(self.max_read, size)
+        return self.stream.read(min(size, self.chunk_size))
+
+
+def make_client(stub: S3Stub, max_upload_size: int = 10 * PART_SIZE) -> S3Client:
+    return S3Client(
+        access_key="key",
+        secret_key="secret",
+        bucket_name=stub.bucket,
+        end_point_url=stub.endpoint_url,
+        part_size=PART_SIZE,
+        max_upload_size=max_upload_size,
+    )
+
+
+@pytest.mark.asyncio
+async def test_small_file_uploaded_with_single_put():
+    async with S3Stub("bucket") as stub:
+        data = b"x" * PART_SIZE
+        url = await make_client(stub).upload_stream("small", ChunkedReader(data))
+        assert url.endswith("/small")
+        assert stub.objects["small"] == data
+        assert [name for name, _ in stub.requests] == ["put_object"]
+
+
+@pytest.mark.asyncio
+async def test_large_file_uploaded_in_parts():
+    async with S3Stub("bucket") as stub:
+        data = bytes(range(256)) * 13
+        reader = ChunkedReader(data)
+        await make_client(stub).upload_stream("large", reader)
+        assert stub.objects["large"] == data
+        assert [name for name, _ in stub.requests].count("upload_part") == 4
+        assert reader.max_read <= PART_SIZE
+
+
+@pytest.mark.asyncio
+async def test_too_large_file_aborted():
+    async with S3Stub("bucket") as stub:
+        with pytest.raises(FileTooLargeError):
+            await make_client(stub, max_upload_size=2 * PART_SIZE).upload_stream("huge", ChunkedReader(b"x" * 5 * PART_SIZE))
+        assert "huge" not in stub.objects and stub.aborted == ["huge"] and not stub.uploads
+
+
+@pytest.mark.asyncio
+async def test_upload_file_from_path(tmp_path):
+    async with S3Stub("bucket") as stub:
+        path = tmp_path / "picture.png"
+        path.write_bytes(b"y" * 3 * PART_SIZE)
+        await make_client(stub).upload_file("picture", file_path=path)
+        assert stub.objects["picture"] == path.read_bytes()
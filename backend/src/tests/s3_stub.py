@@ -0,0 +1,118 @@
+import base64
+import json
+import uuid
+
+from aiohttp import web
+
+
+class S3Stub:
+    """
+    Minimal local S3 server for one bucket: PutObject, GetObject, HeadObject,
+    DeleteObject, browser form POST and multipart uploads, without authentication.
+    Form POST uploads enforce the content-length-range of the form.
+    """
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self.objects: dict[str, bytes] = {}
+        self.content_types: dict[str, str] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self.aborted: list[str] = []
+        self.requests: list[tuple[str, str]] = []
+        self.connections: set[tuple[str, int]] = set()
+        self.port: int | None = None
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_route("POST", "/{bucket}", self._handle_form)
+        app.router.add_route("*", "/{bucket}/{key:.+}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def __aenter__(self) -> "S3Stub":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.connections.add(request.transport.get_extra_info("peername"))
+        key, query = request.match_info["key"], request.query
+        if request.match_info["bucket"] != self.bucket:
+            return web.Response(status=404)
+
+        if request.method == "POST" and "uploads" in query:
+            self.requests.append(("create_multipart_upload", key))
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {}
+            return self._xml(
+                "InitiateMultipartUploadResult",
+                f"<Bucket>{self.bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId>",
+            )
+        if request.method == "PUT" and "uploadId" in query:
+            self.requests.append(("upload_part", key))
+            self.uploads[query["uploadId"]][int(query["partNumber"])] = await request.read()
+            return web.Response(headers={"ETag": f'"{query["partNumber"]}"'})
+        if request.method == "POST" and "uploadId" in query:
+            self.requests.append(("complete_multipart_upload", key))
+            parts = self.uploads.pop(query["uploadId"])
+            self.objects[key] = b"".join(parts[number] for number in sorted(parts))
+            return self._xml("CompleteMultipartUploadResult", f"<Bucket>{self.bucket}</Bucket><Key>{key}</Key>")
+        if request.method == "DELETE" and "uploadId" in query:
+            self.requests.append(("abort_multipart_upload", key))
+            self.uploads.pop(query["uploadId"], None)
+            self.aborted.append(key)
+            return web.Response(status=204)
+        if request.method == "PUT":
+            self.requests.append(("put_object", key))
+            self.objects[key] = await request.read()
+            self.content_types[key] = request.headers.get("Content-Type", "binary/octet-stream")
+            return web.Response(headers={"ETag": '"etag"'})
+        if request.method == "HEAD":
+            self.requests.append(("head_object", key))
+            if key not in self.objects:
+                return web.Response(status=404)
+            return web.Response(headers={
+                "Content-Length": str(len(self.objects[key])), "Content-Type": self.content_types[key],
+            })
+        if request.method == "GET":
+            self.requests.append(("get_object", key))
+            if key not in self.objects:
+                return web.Response(status=404)
+            return web.Response(body=self.objects[key])
+        if request.method == "DELETE":
+            self.requests.append(("delete_object", key))
+            self.objects.pop(key, None)
+            return web.Response(status=204)
+        return web.Response(status=405)
+
+    async def _handle_form(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        key, file = form["key"], form["file"]
+        self.requests.append(("post_object", key))
+        data = file.file.read()
+        policy = json.loads(base64.b64decode(form["policy"]))
+        for condition in policy["conditions"]:
+            if isinstance(condition, list) and condition[0] == "content-length-range":
+                if not condition[1] <= len(data) <= condition[2]:
+                    return web.Response(status=400, text="EntityTooLarge")
+        self.objects[key] = data
+        self.content_types[key] = form.get("Content-Type", "binary/octet-stream")
+        return web.Response(status=204)
+
+    @staticmethod
+    def _xml(root: str, content: str) -> web.Response:
+        body = f'<?xml version="1.0" encoding="UTF-8"?><{root}>{content}</{root}>'
+        return web.Response(body=body.encode(), content_type="application/xml")
@@ -0,0 +1,118 @@
+import asyncio
+import re
+
+from logger import test_logger as logger
+
+
+ADDRESS_PATTERN = re.compile(r"<(.*)>")
+
+
+class SMTPStub:
+    """
+    Minimal local SMTP server accepting plain (no TLS, no AUTH) sessions.
+
+    Recipients in reject are refused with 550, recipients in defer are
+    refused with 450 the given number of times and accepted afterwards.
+    """
+
+    def __init__(self, reject: set[str] | None = None, defer: dict[str, int] | None = None):
+        self.reject = reject or set()
+        self.defer = defer or {}
+        self.messages: list[tuple[str, list[str], bytes]] = []
+        self.connections = 0
+        self.port: int | None = None
+        self._server: asyncio.Server | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.drop_connections()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def drop_connections(self):
+        """Close client connections like a server dropping idle sessions"""
+        for writer in self._writers:
+            writer.close()
+        self._writers.clear()
+
+    async def __aenter__(self) -> "SMTPStub":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        sender, recipients = None, []
+        try:
+            await reply("220 localhost SMTP stub")
+            while line := await reader.readline():
+                command = line.decode().strip()
+                verb = command[:4].upper()
+                if verb == "EHLO":
+                    await reply("250-localhost\r\n250-8BITMIME\r\n250 SMTPUTF8")
+                elif verb == "HELO":
+                    await reply("250 localhost")
+                elif verb == "MAIL":
+                    sender, recipients = ADDRESS_PATTERN.search(command).group(1), []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    recipient = ADDRESS_PATTERN.search(command).group(1)
+                    if recipient in self.reject:
+                        await reply("550 Mailbox unavailable")
+                    elif self.defer.get(recipient, 0) > 0:
+                        self.defer[recipient] -= 1
+                        await reply("450 Mailbox busy, try again later")
+                    else:
+                        recipients.append(recipient)
+                        await reply("250 OK")
+                elif verb == "DATA":
+                    if not recipients:
+                        await reply("503 No valid recipients")
+                        continue
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = bytearray()
+                    while (data_line := await reader.readline()) != b".\r\n":
+                        data.extend(data_line)
+                    self.messages.append((sender, recipients, bytes(data)))
+                    sender, recipients = None, []
+                    await reply("250 OK")
+                elif verb == "RSET":
+                    sender, recipients = None, []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 1025):
+    """Run the stub, e.g. to benchmark a worker against it: python -m tests.smtp_stub (from src)"""
+    stub = SMTPStub()
+    await stub.start(host, port)
+    logger.info("SMTP stub listening on %s:%s", host, stub.port)
+    async with stub._server:
+        await stub._server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,51 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from sql_stats import SQLStatsMiddleware, fingerprint, route_sql_stats, sql_stats_settings
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(SQLStatsMiddleware)
+    engine = create_async_engine("sqlite+aiosqlite://")
+
+    @app.get("/items/{count}")
+    async def read_items(count: int):
+        async with engine.connect() as conn:
+            for item_id in range(count):
+                await conn.execute(text("SELECT :item_id"), {"item_id": item_id})
+        return {}
+
+    return app
+
+
+def test_fingerprint_ignores_parameters():
+    assert fingerprint("SELECT * FROM vacancy\n WHERE id = $1") == "SELECT * FROM vacancy WHERE id = ?"
+    assert fingerprint("SELECT * FROM vacancy WHERE id IN (?, ?, ?)") == fingerprint(
+        "SELECT * FROM vacancy WHERE id IN ($1, $2)"
+    )
+
+
+@pytest.mark.asyncio
+async def test_statements_accounted_per_request(caplog):
+    route_sql_stats.clear()
+    count = sql_stats_settings.REPEATED_STATEMENT_THRESHOLD + 1
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+        with caplog.at_level(logging.WARNING):
+            response = await client.get(f"/items/{count}")
+        await client.get("/items/1")
+
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert f'desc="{count} statements"' in response.headers["Server-Timing"]
+    assert "Possible N+1 in GET /items/{count}" in caplog.text
+
+    stats = route_sql_stats["GET /items/{count}"].as_dict()
+    assert stats["requests"] == 2
+    assert stats["statements"] == count + 1
+    assert stats["max_statements"] == count
+    assert stats["repeated_statement_requests"] == 1
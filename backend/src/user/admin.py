@@ -1,6 +1,9 @@
 from sqladmin import ModelView
+from starlette.requests import Request
 
 from user.models import User, OAuthAccount
+from auth.sessions import session_registry
+from user.existence import add_user_to_filters
 
 
 class UserAdmin(ModelView, model=User):
@@ -80,6 +83,16 @@ class UserAdmin(ModelView, model=User):
         ]
     }
 
+    async def after_model_change(self, data: dict, model: User, is_created: bool, request: Request) -> None:
+        await add_user_to_filters(model)
+        if not is_created and not model.is_active:
+            await session_registry.revoke_user(model.id)
+        elif not is_created:
+            await session_registry.user_changed(model.id)
+
+    async def after_model_delete(self, model: User, request: Request) -> None:
+        await session_registry.revoke_user(model.id)
+
 
 
 class OAuthAccountAdmin(ModelView, model=OAuthAccount):
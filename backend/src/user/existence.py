@@ -0,0 +1,161 @@
+import hashlib
+from typing import Iterable
+
+from redis.asyncio import Redis
+from redis.exceptions import LockError, RedisError
+from sqlalchemy import select
+
+from user.models import User
+from db import async_session_maker
+from redis_ import redis_connection
+from logger import logger
+from config import settings
+
+
+user_existence_settings = settings.user_existence
+
+# Sets the bits of values in the live filter and, while a rebuild is running, in the next one,
+# so values added during the rebuild are not lost when it replaces the live filter
+ADD_SCRIPT = redis_connection.register_script("""
+local building = redis.call('EXISTS', KEYS[2]) == 1
+for i = 1, #ARGV do
+    redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+    if building then
+        redis.call('SETBIT', KEYS[2], ARGV[i], 1)
+    end
+end
+""")
+
+
+class BloomFilter:
+    """
+    Bloom filter kept in a Redis bitmap and shared by all workers.
+
+    A negative answer is exact, a positive one has to be checked in the database.
+    Bits are never cleared, so removed values stay possible positives until rebuild.
+    """
+
+    def __init__(self, redis: Redis, key: str, size: int, hashes: int):
+        self.redis = redis
+        self.key = key
+        self.next_key = f"{key}:next"
+        self.size = size
+        self.hashes = hashes
+
+    def _offsets(self, value: str) -> list[int]:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    async def add(self, values: Iterable[str]):
+        offsets = [offset for value in values if value for offset in self._offsets(value)]
+        if offsets:
+            await ADD_SCRIPT(keys=[self.key, self.next_key], args=offsets)
+
+    async def might_contain(self, value: str) -> bool | None:
+        """False if value was never added, None if the filter is not built yet"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(self.key)
+            for offset in self._offsets(value):
+                pipe.getbit(self.key, offset)
+            is_built, *bits = await pipe.execute()
+        if not is_built:
+            return None
+        return all(bits)
+
+    async def start_rebuild(self):
+        # allocate an empty next filter, from now on add() fills it too
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.next_key)
+            pipe.setbit(self.next_key, self.size - 1, 0)
+            await pipe.execute()
+
+    async def finish_rebuild(self, bitmap: bytearray):
+        """Merge bitmap built from the database into the next filter and make it live"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(f"{self.next_key}:bulk", bytes(bitmap))
+            pipe.bitop("OR", self.next_key, self.next_key, f"{self.next_key}:bulk")
+            pipe.delete(f"{self.next_key}:bulk")
+            pipe.rename(self.next_key, self.key)
+            await pipe.execute()
+
+    def new_bitmap(self) -> bytearray:
+        return bytearray(self.size // 8)
+
+    def add_to_bitmap(self, bitmap: bytearray, value: str):
+        # Redis bitmaps number bits from the most significant bit of the first byte
+        for offset in self._offsets(value):
+            bitmap[offset >> 3] |= 0x80 >> (offset & 7)
+
+
+username_filter = BloomFilter(
+    redis=redis_connection,
+    key=f"{user_existence_settings.KEY_PREFIX}username",
+    size=user_existence_settings.BLOOM_SIZE,
+    hashes=user_existence_settings.BLOOM_HASHES,
+)
+email_filter = BloomFilter(
+    redis=redis_connection,
+    key=f"{user_existence_settings.KEY_PREFIX}email",
+    size=user_existence_settings.BLOOM_SIZE,
+    hashes=user_existence_settings.BLOOM_HASHES,
+)
+
+
+async def add_user_to_filters(user: User):
+    try:
+        await username_filter.add([user.username])
+        await email_filter.add([user.email])
+    except RedisError as e:
+        # a missing value only makes the check answer "free" until the next rebuild
+        logger.error("Adding user %s to existence filters failed: %s", user.id, e)
+
+
+async def rebuild_existence_filters() -> int | None:
+    """
+    Build both filters from the database, dropping values of deleted and renamed users.
+
+    Returns None without building if another process holds the rebuild lock:
+    a second start_rebuild() would drop the next filters the first one is filling.
+    """
+    lock = redis_connection.lock(
+        f"{user_existence_settings.KEY_PREFIX}rebuild",
+        timeout=user_existence_settings.REBUILD_LOCK_TIMEOUT,
+        blocking=False,
+    )
+    if not await lock.acquire():
+        return None
+    try:
+        await username_filter.start_rebuild()
+        await email_filter.start_rebuild()
+        usernames, emails = username_filter.new_bitmap(), email_filter.new_bitmap()
+        count = 0
+        async with async_session_maker() as session:
+            query = select(User.username, User.email).execution_options(
+                yield_per=user_existence_settings.REBUILD_BATCH_SIZE
+            )
+            async for username, email in await session.stream(query):
+                username_filter.add_to_bitmap(usernames, username)
+                email_filter.add_to_bitmap(emails, email)
+                count += 1
+        await username_filter.finish_rebuild(usernames)
+        await email_filter.finish_rebuild(emails)
+        return count
+    finally:
+        try:
+            await lock.release()
+        except LockError as e:
+            logger.warning("Existence filters rebuild outlived its lock: %s", e)
+
+
+async def ensure_existence_filters():
+    """Build the filters once, if they are missing"""
+    try:
+        if await redis_connection.exists(username_filter.key, email_filter.key) < 2:
+            count = await rebuild_existence_filters()
+            if count is None:
+                logger.info("User existence filters are being built by another process")
+            else:
+                logger.info("Built user existence filters from %s users", count)
+    except RedisError as e:
+        logger.error("Building existence filters failed: %s", e)
@@ -5,7 +5,7 @@ import enum
 
 from fastapi_users_db_sqlalchemy import SQLAlchemyBaseUserTable, SQLAlchemyBaseOAuthAccountTableUUID
 from sqlalchemy import String, Boolean, text, Integer, ForeignKey, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from base import Base
@@ -50,10 +50,10 @@ class User(SQLAlchemyBaseUserTable[uuid.UUID], Base):
     linkedin: Mapped[str | None]
     email: Mapped[str | None]
     phone_number: Mapped[str | None]
-    verification_token: Mapped[str | None]
-    reset_password_token: Mapped[str | None]
     subscription_type: Mapped[SubscriptionType | None] = mapped_column(Enum(SubscriptionType), default=SubscriptionType.free)
     profile_picture_url: Mapped[str | None]
+    # thumbnail urls by size, made after the picture is uploaded
+    profile_picture_thumbnails: Mapped[dict[str, str] | None] = mapped_column(JSONB, nullable=True)
 
     vacancies = relationship("Vacancy", back_populates="user", cascade="all, delete", passive_deletes=True)
 
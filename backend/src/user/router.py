@@ -5,9 +5,12 @@ from user.schemas import UserRead, UserUpdate
 from user.service import (
     delete_user, update_user,
     update_user_profile_picture, get_user_by_username,
-    get_user_by_email
+    is_username_taken, is_email_taken,
+    profile_picture_prefix, confirm_profile_picture_upload,
 )
-from auth.base_config import current_user
+from s3_storage import ImageUploadRequest, ImageUpload, ImageUploadConfirm, create_image_upload
+from auth.base_config import current_user, current_token_user
+from auth.sessions import TokenUser
 from logger import test_logger as logger
 
 router = APIRouter()
@@ -29,7 +32,7 @@ async def update_user_route(
     user: User = Depends(current_user)
 ) -> UserRead:
     db_user = await update_user(user, updated_user)
-    logger.info(f"Db_user is {db_user.__dict__}")
+    logger.info("User %s updated", db_user.id)
     return await get_user_by_username(username=db_user.username)
 
 
@@ -41,6 +44,23 @@ async def update_user_profile_image(
     return await update_user_profile_picture(user, profile_picture)
 
 
+@router.post("/profile_image_upload", response_model=ImageUpload)
+async def create_profile_image_upload(
+    upload_request: ImageUploadRequest,
+    user: TokenUser = Depends(current_token_user),
+) -> ImageUpload:
+    """Presigned url to upload profile image directly to S3, confirm it afterwards"""
+    return await create_image_upload(profile_picture_prefix(user.id), upload_request)
+
+
+@router.post("/profile_image_upload/confirm")
+async def confirm_profile_image_upload(
+    upload: ImageUploadConfirm,
+    user: TokenUser = Depends(current_token_user),
+) -> str:
+    return await confirm_profile_picture_upload(user.id, upload.key)
+
+
 @router.get("/is_exists")
 async def check_user_exists(
     email: str | None = Query(None), 
@@ -48,11 +68,9 @@ async def check_user_exists(
 ) -> dict:
     response = {}
     if email:
-        user_email = await get_user_by_email(email=email)
-        response["is_exists_by_email"] = user_email is not None
+        response["is_exists_by_email"] = await is_email_taken(email=email)
     if username:
-        user_username = await get_user_by_username(username=username)
-        response["is_exists_by_username"] = user_username is not None
+        response["is_exists_by_username"] = await is_username_taken(username=username)
     return response
 
 
@@ -19,6 +19,7 @@ class UserRead(schemas.BaseUser[int]):
     subscription_type: SubscriptionType
     phone_number: PhoneNumber | None
     profile_picture_url: str | None
+    profile_picture_thumbnails: dict[str, str] | None = None
 
 
 class UserCreate(schemas.BaseUserCreate):
@@ -1,12 +1,18 @@
 from fastapi import HTTPException, UploadFile
-from sqlalchemy import select
+from redis.exceptions import RedisError
+from sqlalchemy import literal, select
 from typing import Optional
+from uuid import UUID
 
 from user.models import User
 from user.schemas import UserRead, UserUpdate
-from s3_storage import s3_client, s3_settings
+from s3_storage import s3_client, s3_settings, FileTooLargeError, confirm_image_upload, replace_image
 from logger import db_query_logger as logger
 from db import async_session_maker
+from auth.sessions import session_registry
+from images.thumbnails import delete_thumbnails
+from images.tasks import create_user_thumbnails
+from user.existence import BloomFilter, username_filter, email_filter, add_user_to_filters
 
 
 async def get_user_by_username(username: str) -> Optional[User]:
@@ -23,6 +29,29 @@ async def get_user_by_email(email: str) -> Optional[User]:
         return user
     
 
+async def _user_exists(bloom_filter: BloomFilter, column, value: str) -> bool:
+    try:
+        might_exist = await bloom_filter.might_contain(value)
+    except RedisError as e:
+        logger.error("Existence filter check failed: %s", e)
+        might_exist = None
+    if might_exist is False:
+        return False
+    async with async_session_maker() as session:
+        query = select(literal(1)).where(column == value).limit(1)
+        return (await session.execute(query)).scalar() is not None
+
+
+async def is_username_taken(username: str) -> bool:
+    """Check username without loading the user, the database is queried only on filter hits"""
+    return await _user_exists(username_filter, User.username, username)
+
+
+async def is_email_taken(email: str) -> bool:
+    """Check email without loading the user, the database is queried only on filter hits"""
+    return await _user_exists(email_filter, User.email, email)
+
+
 async def delete_user(user: User):
     async with async_session_maker() as session:
         stmt = select(User).where(User.id == user.id)
@@ -31,7 +60,8 @@ async def delete_user(user: User):
         await session.refresh(db_user)
         await session.delete(db_user)
         await session.commit()
-        logger.info(f"User {db_user} deleted")
+        await session_registry.revoke_user(user.id)
+        logger.info("User %s deleted", db_user)
     
 
 async def update_user(user: User, updated_user: UserUpdate) -> UserRead:
@@ -40,11 +70,21 @@ async def update_user(user: User, updated_user: UserUpdate) -> UserRead:
         db_user = (await session.execute(query)).unique().scalar_one_or_none()
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
+        old_picture_url, old_thumbnails = db_user.profile_picture_url, db_user.profile_picture_thumbnails
         for key, value in updated_user.model_dump().items():
             setattr(db_user, key, value)
+        picture_changed = db_user.profile_picture_url != old_picture_url
+        if picture_changed:
+            db_user.profile_picture_thumbnails = None
         session.add(db_user)
         await session.commit()
         await session.refresh(db_user)
+        await session_registry.user_changed(user.id)
+        await add_user_to_filters(db_user)
+        if picture_changed:
+            await delete_thumbnails(old_thumbnails)
+            if db_user.profile_picture_url:
+                create_user_thumbnails.delay(str(user.id), db_user.profile_picture_url)
         return db_user
 
 
@@ -56,16 +96,52 @@ async def update_user_profile_picture(user: User, profile_picture: UploadFile |
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
         if profile_picture:
+            s3_key = f"profile-pictures/{user.username}/{profile_picture.filename}"
+            try:
+                picture_url = await s3_client.upload_stream(
+                    object_name=s3_key,
+                    source=profile_picture,
+                    content_type=profile_picture.content_type,
+                )
+            except FileTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            if picture_url is None:
+                raise HTTPException(status_code=400, detail="Profile picture is empty")
+            # the old picture is deleted only after the new one is stored
             if db_user.profile_picture_url and s3_settings.S3_PUBLIC_DOMAIN in db_user.profile_picture_url:
                 delete_path = '/'.join(db_user.profile_picture_url.split('/')[3:])
-                await s3_client.delete_file(delete_path)
-            s3_key = f"profile-pictures/{user.username}/{profile_picture.filename}"
-            picture_url = await s3_client.upload_file(
-                object_name=s3_key,
-                file_data=profile_picture.file,
-            )
+                if delete_path != s3_key:
+                    await s3_client.delete_file(delete_path)
+            await delete_thumbnails(db_user.profile_picture_thumbnails)
             db_user.profile_picture_url = picture_url
+            db_user.profile_picture_thumbnails = None
         session.add(db_user)
         await session.commit()
         await session.refresh(db_user)
+        await session_registry.user_changed(user.id)
+        if profile_picture:
+            create_user_thumbnails.delay(str(user.id), db_user.profile_picture_url)
         return db_user.profile_picture_url
+
+
+def profile_picture_prefix(user_id: UUID) -> str:
+    return f"profile-pictures/{user_id}"
+
+
+async def confirm_profile_picture_upload(user_id: UUID, key: str) -> str:
+    """Record profile picture uploaded directly to S3"""
+    picture_url = await confirm_image_upload(profile_picture_prefix(user_id), key)
+    async with async_session_maker() as session:
+        db_user = await session.get(User, user_id)
+        if not db_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        old_picture_url, old_thumbnails = db_user.profile_picture_url, db_user.profile_picture_thumbnails
+        db_user.profile_picture_url = picture_url
+        db_user.profile_picture_thumbnails = None
+        await session.commit()
+    await session_registry.user_changed(user_id)
+    await replace_image(old_picture_url, picture_url)
+    await delete_thumbnails(old_thumbnails)
+    create_user_thumbnails.delay(str(user_id), picture_url)
+    logger.info("User %s profile picture is set to %s", user_id, key)
+    return picture_url
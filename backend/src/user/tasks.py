@@ -0,0 +1,14 @@
+from user.existence import rebuild_existence_filters
+from tasks_celery import celery_app
+from worker_runtime import run_async
+from logger import celery_logger as logger
+
+
+@celery_app.task
+def rebuild_existence_filters_task():
+    count = run_async(rebuild_existence_filters())
+    if count is None:
+        logger.info("User existence filters are being rebuilt by another process")
+    else:
+        logger.info("Rebuilt user existence filters from %s users", count)
+    return count
@@ -1,6 +1,10 @@
 from sqladmin import ModelView
+from starlette.requests import Request
 
 from vacancy.models import Vacancy
+from vacancy.service import get_vacancy_cache_keys
+from vacancy.scheduler import schedule_expiration, unschedule_expiration
+from cache import cache, make_key
 
 
 class VacancyAdmin(ModelView, model=Vacancy):
@@ -70,3 +74,24 @@ class VacancyAdmin(ModelView, model=Vacancy):
             ('phd', 'PhD')
         ],
     }
+
+    async def on_model_change(self, data: dict, model: Vacancy, is_created: bool, request: Request) -> None:
+        # owner before the change, the schedule and cache keys include it
+        request.state.vacancy_owner_id = None if is_created else model.user_id
+
+    async def after_model_change(self, data: dict, model: Vacancy, is_created: bool, request: Request) -> None:
+        previous_owner_id = request.state.vacancy_owner_id
+        if previous_owner_id is not None and previous_owner_id != model.user_id:
+            await cache.invalidate(make_key("vacancy", previous_owner_id, model.id))
+            await unschedule_expiration(model.id, previous_owner_id)
+        await cache.invalidate(make_key("vacancy", model.user_id, model.id))
+        await schedule_expiration(model.id, model.user_id, model.expiration_date)
+
+    async def on_model_delete(self, model: Vacancy, request: Request) -> None:
+        # resumes are deleted with the vacancy, so their keys are collected before
+        request.state.vacancy_cache_keys = await get_vacancy_cache_keys(model.id)
+        request.state.vacancy_ids = (model.id, model.user_id)
+
+    async def after_model_delete(self, model: Vacancy, request: Request) -> None:
+        await cache.invalidate(*request.state.vacancy_cache_keys)
+        await unschedule_expiration(*request.state.vacancy_ids)
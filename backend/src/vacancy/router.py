@@ -1,49 +1,75 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from starlette import status
 
-from user.models import User
-from vacancy.schemas import VacancyCreate, VacancyRead, VacancyUpdate
+from vacancy.schemas import VacancyCreate, VacancyRead, VacancyUpdate, VacancyStats
 from logger import logger
+from config import settings
 
-from auth.base_config import current_user
+from auth.base_config import current_token_user
+from auth.sessions import TokenUser
 from vacancy.service import (
     get_vacancies_by_user_id, get_vacancy_by_id, 
-    create_vacancy, delete_vacancy_by_id, update_vacancy
+    create_vacancy, delete_vacancy_by_id, update_vacancy,
+    get_vacancies_stats
 )
 
+vacancy_settings = settings.vacancy
 router = APIRouter()
 
 
 @router.get("/", response_model=list[VacancyRead])
-async def read_user_vacancies(user: User = Depends(current_user)):
+async def read_user_vacancies(user: TokenUser = Depends(current_token_user)):
     """Get all user vacancies"""
-    logger.info(f"Get all user vacancies for user {user}")
+    logger.info("Get all user vacancies for user %s", user)
     return await get_vacancies_by_user_id(user.id)
 
 
+@router.get("/stats", response_model=list[VacancyStats])
+async def read_user_vacancies_stats(
+        vacancy_id: list[int] | None = Query(None, max_length=vacancy_settings.STATS_MAX_VACANCIES),
+        user: TokenUser = Depends(current_token_user)
+):
+    """
+    Get resume stats for user vacancies.
+
+    If vacancy_id is None - get stats for ALL user vacancies.
+    If vacancy_id is NOT None - get stats for every passed vacancy_id
+    """
+    logger.info("Get stats for user vacancies %s for user %s", vacancy_id, user)
+    return await get_vacancies_stats(user.id, vacancy_id)
+
+
+@router.get("/{vacancy_id}/stats", response_model=VacancyStats)
+async def read_user_vacancy_stats(vacancy_id: int, user: TokenUser = Depends(current_token_user)):
+    """Get resume stats for vacancy by id"""
+    logger.info("Get stats for user vacancy with id %s for user %s", vacancy_id, user)
+    stats = await get_vacancies_stats(user.id, [vacancy_id])
+    return stats[0]
+
+
 @router.get("/{vacancy_id}", response_model=VacancyRead)
-async def read_user_vacancy_by_id(vacancy_id: int, user: User = Depends(current_user)):
+async def read_user_vacancy_by_id(vacancy_id: int, user: TokenUser = Depends(current_token_user)):
     """Get vacancy by id"""
-    logger.info(f"Get user vacancy with id {vacancy_id} for user {user}")
+    logger.info("Get user vacancy with id %s for user %s", vacancy_id, user)
     return await get_vacancy_by_id(vacancy_id, user.id)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=VacancyRead)
-async def create_user_vacancy(new_vacancy: VacancyCreate, user: User = Depends(current_user)):
+async def create_user_vacancy(new_vacancy: VacancyCreate, user: TokenUser = Depends(current_token_user)):
     """Create a new vacancy for current user"""
-    logger.info(f"Create new user vacancy for user {user}")
+    logger.info("Create new user vacancy for user %s", user)
     return await create_vacancy(new_vacancy, user.id)
 
 
 @router.delete("/{vacancy_id}")
-async def delete_user_vacancy(vacancy_id: int, user: User = Depends(current_user)) -> dict[str, str]:
+async def delete_user_vacancy(vacancy_id: int, user: TokenUser = Depends(current_token_user)) -> dict[str, str]:
     """Delete vacancy."""
-    logger.info(f"Delete user vacancy with id {vacancy_id} for user {user}") 
+    logger.info("Delete user vacancy with id %s for user %s", vacancy_id, user) 
     return await delete_vacancy_by_id(vacancy_id, user.id)
 
 
 @router.put("/", response_model=VacancyRead)
-async def update_user_vacancy(updated_vacancy: VacancyUpdate, user: User = Depends(current_user)):
+async def update_user_vacancy(updated_vacancy: VacancyUpdate, user: TokenUser = Depends(current_token_user)):
     """Update vacancy."""
-    logger.info(f"Update user vacancy with id {updated_vacancy.id} for user {user}")
+    logger.info("Update user vacancy with id %s for user %s", updated_vacancy.id, user)
     return await update_vacancy(updated_vacancy, user.id)
\ No newline at end of file
@@ -0,0 +1,118 @@
+from datetime import datetime, UTC
+from uuid import UUID
+
+from redis.exceptions import RedisError
+
+from redis_ import redis_connection
+from logger import logger
+from config import settings
+
+
+vacancy_settings = settings.vacancy
+
+PROCESSING_KEY = f"{vacancy_settings.EXPIRATION_SCHEDULE_KEY}:processing"
+# expiration score of every claimed member, to put it back on the schedule
+PROCESSING_EXPIRED_KEY = f"{PROCESSING_KEY}:expired"
+
+# Atomically moves the due members from the schedule to the processing set,
+# so every expiration is claimed by one worker and stays there until acknowledged.
+# Claims older than the timeout (the worker died before notifying) go back on the
+# schedule first, unless the vacancy was scheduled again meanwhile.
+CLAIM_DUE_SCRIPT = redis_connection.register_script("""
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for i = 1, #stale do
+    local expired = redis.call('HGET', KEYS[3], stale[i])
+    if expired then
+        redis.call('ZADD', KEYS[1], 'NX', expired, stale[i])
+    end
+    redis.call('ZREM', KEYS[2], stale[i])
+    redis.call('HDEL', KEYS[3], stale[i])
+end
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[1], due[i])
+    redis.call('ZADD', KEYS[2], ARGV[1] + ARGV[3], due[i])
+    redis.call('HSET', KEYS[3], due[i], due[i + 1])
+end
+return due
+""")
+
+
+def _member(vacancy_id: int, user_id: UUID) -> str:
+    return f"{user_id}:{vacancy_id}"
+
+
+def _score(expiration_date: datetime) -> float:
+    # expiration_date is stored as naive UTC
+    return expiration_date.replace(tzinfo=UTC).timestamp()
+
+
+async def schedule_expirations(vacancies: list[tuple[int, UUID, datetime]]):
+    """Add (vacancy_id, user_id, expiration_date) items to the expiration schedule"""
+    if not vacancies:
+        return
+    await redis_connection.zadd(
+        vacancy_settings.EXPIRATION_SCHEDULE_KEY,
+        {_member(vacancy_id, user_id): _score(expiration_date) for vacancy_id, user_id, expiration_date in vacancies},
+    )
+
+
+async def schedule_expiration(vacancy_id: int, user_id: UUID, expiration_date: datetime):
+    """
+    Add vacancy to the expiration schedule or move it to a new expiration_date.
+
+    Called after the change of the vacancy is committed, so a Redis failure
+    is only logged: the periodic reconciliation puts the vacancy on the schedule.
+    """
+    try:
+        await schedule_expirations([(vacancy_id, user_id, expiration_date)])
+    except RedisError as e:
+        logger.error("Scheduling expiration of vacancy %s failed: %s", vacancy_id, e)
+
+
+async def unschedule_expiration(vacancy_id: int, user_id: UUID):
+    """Remove vacancy from the expiration schedule and from claimed expirations, failures are logged"""
+    member = _member(vacancy_id, user_id)
+    try:
+        async with redis_connection.pipeline(transaction=True) as pipe:
+            pipe.zrem(vacancy_settings.EXPIRATION_SCHEDULE_KEY, member)
+            pipe.zrem(PROCESSING_KEY, member)
+            pipe.hdel(PROCESSING_EXPIRED_KEY, member)
+            await pipe.execute()
+    except RedisError as e:
+        logger.error("Unscheduling expiration of vacancy %s failed: %s", vacancy_id, e)
+
+
+async def claim_due_expirations(limit: int = vacancy_settings.EXPIRATION_BATCH_SIZE) -> list[dict]:
+    """
+    Claim up to limit vacancies expired by now.
+
+    Claimed vacancies stay in the processing set until ack_expirations(),
+    if that does not happen within EXPIRATION_CLAIM_TIMEOUT, a later claim
+    puts them back on the schedule. Every expiration is reported at least once.
+    """
+    now = datetime.now(UTC).timestamp()
+    due = await CLAIM_DUE_SCRIPT(
+        keys=[vacancy_settings.EXPIRATION_SCHEDULE_KEY, PROCESSING_KEY, PROCESSING_EXPIRED_KEY],
+        args=[now, limit, vacancy_settings.EXPIRATION_CLAIM_TIMEOUT],
+    )
+    expirations = []
+    for member, score in zip(due[::2], due[1::2]):
+        user_id, vacancy_id = member.decode("utf-8").split(":")
+        expirations.append({
+            "id": int(vacancy_id),
+            "user_id": UUID(user_id),
+            "expired": datetime.fromtimestamp(float(score), UTC).replace(tzinfo=None),
+        })
+    return expirations
+
+
+async def ack_expirations(vacancies: list[dict]):
+    """Drop claimed expirations that have been reported"""
+    if not vacancies:
+        return
+    members = [_member(vacancy["id"], vacancy["user_id"]) for vacancy in vacancies]
+    async with redis_connection.pipeline(transaction=True) as pipe:
+        pipe.zrem(PROCESSING_KEY, *members)
+        pipe.hdel(PROCESSING_EXPIRED_KEY, *members)
+        await pipe.execute()
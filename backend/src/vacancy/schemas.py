@@ -3,6 +3,7 @@ from datetime import datetime
 from pydantic import BaseModel, Field, UUID4
 
 from vacancy.models import WorkFormat, Experience, EducationDegree, EmploymentType
+from resume.models import ResumeStatus
 
 
 class VacancyCreate(BaseModel):
@@ -36,4 +37,18 @@ class VacancyRead(BaseModel):
 
 
 class VacancyUpdate(VacancyRead):
-    pass
\ No newline at end of file
+    pass
+
+
+class SalaryBucket(BaseModel):
+    min_salary: int
+    max_salary: int
+    count: int
+
+
+class VacancyStats(BaseModel):
+    vacancy_id: int
+    total: int
+    stage_counts: dict[ResumeStatus, int]
+    average_rating: float | None
+    salary_histogram: list[SalaryBucket]
\ No newline at end of file
@@ -1,27 +1,62 @@
+from collections import defaultdict
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, UTC
 from uuid import UUID
 
 from db import async_session_maker
+from cache import cache, make_key
+from vacancy.scheduler import schedule_expiration, schedule_expirations, unschedule_expiration
 from vacancy.models import Vacancy
-from vacancy.schemas import VacancyCreate, VacancyRead, VacancyUpdate
+from vacancy.schemas import VacancyCreate, VacancyRead, VacancyUpdate, VacancyStats, SalaryBucket
+from resume.models import Resume, ResumeStatus
+from config import settings
 from logger import logger
 
 
+vacancy_settings = settings.vacancy
+
+
+async def _get_vacancy(session: AsyncSession, vacancy_id: int, user_id: UUID) -> Vacancy:
+    """Get a vacancy model by vacancy_id and user_id within session"""
+    vacancy = await session.get(Vacancy, vacancy_id)
+
+    if not vacancy:
+        logger.warning("Vacancy with id %s not found for user %s", vacancy_id, user_id)
+        raise HTTPException(status_code=404, detail="Vacancy not found")
+    if vacancy.user_id != user_id:
+        logger.warning("Vacancy with id %s not found for user %s", vacancy_id, user_id)
+        raise HTTPException(status_code=403, detail="Not enough permissions to read this vacancy")
+
+    return vacancy
+
+
 async def get_vacancy_by_id(vacancy_id: int, user_id: UUID) -> VacancyRead:
-    """Get a vacancy by vacancy_id and user_id"""
-    async with async_session_maker() as session:
-        vacancy = await session.get(Vacancy, vacancy_id)
+    """Get a vacancy by vacancy_id and user_id (cached)"""
+    async def load_vacancy() -> VacancyRead:
+        async with async_session_maker() as session:
+            vacancy = await _get_vacancy(session, vacancy_id, user_id)
+            return VacancyRead.model_validate(vacancy, from_attributes=True)
 
-        if not vacancy:
-            logger.warning(f"Vacancy with id {vacancy_id} not found for user {user_id}")
-            raise HTTPException(status_code=404, detail="Vacancy not found")
-        if vacancy.user_id != user_id:
-            logger.warning(f"Vacancy with id {vacancy_id} not found for user {user_id}")
-            raise HTTPException(status_code=403, detail="Not enough permissions to read this vacancy")
+    return await cache.get_or_load(make_key("vacancy", user_id, vacancy_id), VacancyRead, load_vacancy)
 
-        return vacancy
+
+async def _get_vacancy_cache_keys(session: AsyncSession, vacancy: Vacancy) -> list[str]:
+    """Cache keys of vacancy and its resumes, collect them before the vacancy is deleted"""
+    query = select(Resume.id).where(Resume.vacancy_id == vacancy.id)
+    resume_ids = (await session.execute(query)).scalars().all()
+    return [
+        make_key("vacancy", vacancy.user_id, vacancy.id),
+        *[make_key("resume", vacancy.user_id, resume_id) for resume_id in resume_ids],
+    ]
+
+
+async def get_vacancy_cache_keys(vacancy_id: int) -> list[str]:
+    """Cache keys of vacancy and its resumes, for changes made outside this service (admin panel)"""
+    async with async_session_maker() as session:
+        vacancy = await session.get(Vacancy, vacancy_id)
+        return await _get_vacancy_cache_keys(session, vacancy) if vacancy else []
 
 
 async def get_vacancies_by_user_id(user_id: UUID) -> list[VacancyRead]:
@@ -41,30 +76,37 @@ async def create_vacancy(new_vacancy: VacancyCreate, user_id: UUID):
         vacancy = Vacancy(**new_vacancy)
         session.add(vacancy)
         await session.commit()
+        await schedule_expiration(vacancy.id, user_id, vacancy.expiration_date)
         return vacancy
 
 
 async def delete_vacancy_by_id(vacancy_id: int, user_id: UUID):
     """Delete vacancy with vacancy_id and user_id"""
     async with async_session_maker() as session:
-        vacancy = await get_vacancy_by_id(vacancy_id, user_id)
+        vacancy = await _get_vacancy(session, vacancy_id, user_id)
+        cache_keys = await _get_vacancy_cache_keys(session, vacancy)
         await session.delete(vacancy)
         await session.commit()
+        await cache.invalidate(*cache_keys)
+        await unschedule_expiration(vacancy.id, user_id)
         return {"status": f"Vacancy with id {vacancy.id} deleted successfully"}
     
 
 async def delete_vacancy_without_checking(vacancy_id: int):
     async with async_session_maker() as session:
         vacancy = await session.get(Vacancy, vacancy_id)
+        cache_keys = await _get_vacancy_cache_keys(session, vacancy)
         await session.delete(vacancy)
         await session.commit()
+        await cache.invalidate(*cache_keys)
+        await unschedule_expiration(vacancy.id, vacancy.user_id)
         return {"status": f"Vacancy with id {vacancy.id} deleted successfully"}
 
 
 async def update_vacancy(updated_vacancy: VacancyUpdate, user_id: UUID) -> VacancyRead:
     """Update vacancy with updated_vacancy and user_id"""
     async with async_session_maker() as session:
-        vacancy = await get_vacancy_by_id(updated_vacancy.id, user_id)
+        vacancy = await _get_vacancy(session, updated_vacancy.id, user_id)
         updated_data = updated_vacancy.model_dump(exclude_unset=True)
         
         for key, value in updated_data.items():
@@ -78,14 +120,100 @@ async def update_vacancy(updated_vacancy: VacancyUpdate, user_id: UUID) -> Vacan
         session.add(vacancy)
         await session.commit()
         await session.refresh(vacancy)
+        await cache.invalidate(make_key("vacancy", user_id, vacancy.id))
+        if "expiration_date" in updated_data:
+            await schedule_expiration(vacancy.id, user_id, vacancy.expiration_date)
         return vacancy
 
 
-async def get_expired_vacancies() -> list[VacancyRead]:
-    """Get all expired vacancies"""
+async def get_vacancies_stats(user_id: UUID, vacancy_ids: list[int] | None = None) -> list[VacancyStats]:
+    """
+    Get resume stats (count per stage, average rating, expected salary histogram)
+    for user vacancies with a single GROUP BY over resume.
+
+    If vacancy_ids is None - get stats for ALL user vacancies.
+    """
+    bucket_size = vacancy_settings.STATS_SALARY_BUCKET_SIZE
+    # bucket size is rendered inline so SELECT and GROUP BY expressions are identical
+    salary_bucket = (Resume.expected_salary // literal(bucket_size, literal_execute=True)).label("salary_bucket")
+    async with async_session_maker() as session:
+        query = (
+            select(
+                Vacancy.id,
+                Resume.resume_status,
+                salary_bucket,
+                func.count(Resume.id),
+                func.sum(Resume.rating),
+                func.count(Resume.rating),
+            )
+            .select_from(Vacancy)
+            .outerjoin(Resume, Resume.vacancy_id == Vacancy.id)
+            .where(Vacancy.user_id == user_id)
+            .group_by(Vacancy.id, Resume.resume_status, salary_bucket)
+        )
+        if vacancy_ids is not None:
+            query = query.where(Vacancy.id.in_(vacancy_ids))
+        rows = (await session.execute(query)).all()
+
+    stats = {}
+    for vacancy_id, resume_status, bucket, count, rating_sum, rating_count in rows:
+        vacancy_stats = stats.setdefault(vacancy_id, {
+            "total": 0,
+            "stage_counts": {stage: 0 for stage in ResumeStatus},
+            "rating_sum": 0,
+            "rating_count": 0,
+            "histogram": defaultdict(int),
+        })
+        if not count:
+            # vacancy without resumes
+            continue
+        vacancy_stats["total"] += count
+        vacancy_stats["stage_counts"][resume_status] += count
+        vacancy_stats["rating_sum"] += rating_sum or 0
+        vacancy_stats["rating_count"] += rating_count
+        if bucket is not None:
+            vacancy_stats["histogram"][bucket] += count
+
+    if vacancy_ids is not None and len(stats) != len(set(vacancy_ids)):
+        logger.warning("Vacancies %s not found for user %s", set(vacancy_ids) - stats.keys(), user_id)
+        raise HTTPException(status_code=404, detail="Vacancy not found")
+
+    return [
+        VacancyStats(
+            vacancy_id=vacancy_id,
+            total=vacancy_stats["total"],
+            stage_counts=vacancy_stats["stage_counts"],
+            average_rating=(
+                vacancy_stats["rating_sum"] / vacancy_stats["rating_count"]
+                if vacancy_stats["rating_count"] else None
+            ),
+            salary_histogram=[
+                SalaryBucket(
+                    min_salary=bucket * bucket_size,
+                    max_salary=(bucket + 1) * bucket_size - 1,
+                    count=count,
+                )
+                for bucket, count in sorted(vacancy_stats["histogram"].items())
+            ],
+        )
+        for vacancy_id, vacancy_stats in sorted(stats.items())
+    ]
+
+
+async def schedule_pending_expirations() -> int:
+    """
+    Put all not yet expired vacancies on the expiration schedule.
+
+    Run periodically, it repairs schedule writes lost to Redis failures;
+    scheduling again only sets the score a vacancy already has.
+    """
     async with async_session_maker() as session:
         current_time = datetime.now(UTC).replace(tzinfo=None)
-        query = select(Vacancy.__table__.columns).where(Vacancy.expiration_date <= current_time)
-        sql_response = await session.execute(query)
-        vacancies = sql_response.mappings().all()
-        return vacancies
\ No newline at end of file
+        query = select(Vacancy.id, Vacancy.user_id, Vacancy.expiration_date).where(
+            Vacancy.expiration_date > current_time
+        )
+        vacancies = [tuple(vacancy) for vacancy in (await session.execute(query)).all()]
+    batch_size = vacancy_settings.EXPIRATION_BATCH_SIZE
+    for start in range(0, len(vacancies), batch_size):
+        await schedule_expirations(vacancies[start:start + batch_size])
+    return len(vacancies)
\ No newline at end of file
@@ -1,41 +1,74 @@
 import json
-import asyncio
+from collections import defaultdict
 
-from vacancy.service import get_expired_vacancies
-from vacancy.models import Vacancy
+from redis.exceptions import RedisError
+
+from vacancy.service import schedule_pending_expirations
+from vacancy.scheduler import claim_due_expirations, ack_expirations
 from tasks_celery import celery_app
+from worker_runtime import run_async
 from logger import celery_logger as logger
-from redis_ import redis_connection
+from sse import publish_event
+from config import settings
+
+
+vacancy_settings = settings.vacancy
 
 
 @celery_app.task
 def check_expired_vacancies():
-    loop = asyncio.get_event_loop()
-    expired_vacancies = loop.run_until_complete(get_expired_vacancies())
-    logger.info(f"Found {len(expired_vacancies)} expired vacancies")
-    
+    expired_vacancies = run_async(process_due_expirations())
+    logger.info("Found %s expired vacancies", len(expired_vacancies))
+
     serialized_expired_vacancies = [
-        {"id": vacancy.id, "expired": vacancy.expiration_date}
+        {"id": vacancy["id"], "expired": vacancy["expired"]}
         for vacancy in expired_vacancies
     ]
-    
-    if expired_vacancies:
-        loop.run_until_complete(notify_expiration(expired_vacancies))
-        return serialized_expired_vacancies
-    else:
+
+    if not expired_vacancies:
         logger.info("No expired vacancies found")
-        return serialized_expired_vacancies
+    return serialized_expired_vacancies
+
+
+@celery_app.task
+def reconcile_expiration_schedule():
+    """Put vacancies missing on the expiration schedule (created before it or when Redis failed) on it"""
+    scheduled = run_async(schedule_pending_expirations())
+    logger.info("Reconciled expiration schedule of %s vacancies", scheduled)
+    return scheduled
+
 
+async def process_due_expirations() -> list[dict]:
+    """Claim all due vacancies on the expiration schedule and notify their owners"""
+    expired_vacancies = []
+    while True:
+        due = await claim_due_expirations()
+        if due:
+            await notify_expiration(due)
+            expired_vacancies.extend(due)
+        if len(due) < vacancy_settings.EXPIRATION_BATCH_SIZE:
+            return expired_vacancies
 
-async def notify_expiration(vacancies: list[Vacancy]):
-    logger.info(f"Vacancies {vacancies} expired")
 
-    vacancies_id = [vacancy.id for vacancy in vacancies]
+async def notify_expiration(vacancies: list[dict]):
+    logger.info("Vacancies %s expired", [vacancy['id'] for vacancy in vacancies])
 
-    event_data = json.dumps({
-        "data": json.dumps(vacancies_id),  # Serialize vacancy IDs list to JSON
-        "event": "vacancy_expiration"
-    })
+    # every user gets only the ids of own vacancies
+    user_vacancies = defaultdict(list)
+    for vacancy in vacancies:
+        user_vacancies[vacancy["user_id"]].append(vacancy)
 
-    await redis_connection.set("event_vacancy_expiration", event_data)
-    logger.info(f"Event {event_data} published")
\ No newline at end of file
+    for user_id, vacancies in user_vacancies.items():
+        vacancies_id = [vacancy["id"] for vacancy in vacancies]
+        try:
+            event_id = await publish_event(
+                user_id,
+                event="vacancy_expiration",
+                data=json.dumps(vacancies_id),  # Serialize vacancy IDs list to JSON
+            )
+        except RedisError as e:
+            # not acknowledged, the claim goes back on the schedule after EXPIRATION_CLAIM_TIMEOUT
+            logger.error("Publishing expiration of vacancies %s for user %s failed: %s", vacancies_id, user_id, e)
+            continue
+        await ack_expirations(vacancies)
+        logger.info("Event %s with vacancies %s published for user %s", event_id, vacancies_id, user_id)
\ No newline at end of file
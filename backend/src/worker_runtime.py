@@ -0,0 +1,78 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Coroutine, TypeVar
+
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from db import engine
+from redis_ import redis_connection
+from s3_storage import s3_client
+from logger import celery_logger as logger, stop_listener
+from metrics import mark_process_dead
+from memory import start_memory_sampler, stop_memory_sampler
+
+
+ResultT = TypeVar("ResultT")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_shutdown_hooks: list[Callable[[], Awaitable[Any]]] = []
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Event loop of the current worker process, shared by all its tasks"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_async(coro: Coroutine[Any, Any, ResultT]) -> ResultT:
+    """Run coroutine of a celery task on the worker event loop"""
+    return get_loop().run_until_complete(coro)
+
+
+def on_shutdown(hook: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+    """Register coroutine function to be awaited when the worker process exits"""
+    _shutdown_hooks.append(hook)
+    return hook
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """
+    Connections inherited through fork belong to the parent process.
+    Forget them without closing, so the child opens its own connections
+    on its own event loop and keeps them for the next tasks.
+    """
+    engine.sync_engine.dispose(close=False)
+    redis_connection.connection_pool.reset()
+    get_loop().run_until_complete(s3_client.open())
+    start_memory_sampler()
+    logger.info("Worker process runtime initialized")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Await shutdown hooks, close database and Redis connections and the loop"""
+    if _loop is None or _loop.is_closed():
+        return
+
+    async def close():
+        for hook in reversed(_shutdown_hooks):
+            try:
+                await hook()
+            except Exception as e:
+                logger.error("Worker shutdown hook %s failed: %s", hook.__name__, e)
+        await s3_client.close()
+        await engine.dispose()
+        await redis_connection.aclose()
+
+    try:
+        _loop.run_until_complete(close())
+    finally:
+        _loop.close()
+    stop_memory_sampler()
+    logger.info("Worker process runtime closed")
+    mark_process_dead()
+    # the process exits without running atexit hooks
+    stop_listener()